@@ -0,0 +1,287 @@
+import asyncio
+import functools
+import os
+import signal
+import subprocess
+import tempfile
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import cpu_count
+from converter import _init_render_worker, _render_chunk
+
+
+def _resolve_pages(pages, chunk):
+    """
+    Settle the page futures of a render chunk once the chunk is done.
+
+    Args:
+        pages (dict): The futures of the chunk's pages, by page number.
+        chunk (asyncio.Future): The finished chunk, holding its EncodeResult list.
+    """
+    if chunk.cancelled():
+        for future in pages.values():
+            future.cancel()
+        return
+    error = chunk.exception()
+    renditions = {number: [] for number in pages}
+    if error is None:
+        for result in chunk.result():
+            renditions[result.page_number].append(result)
+    for number, future in pages.items():
+        if future.done():
+            continue
+        if error is not None:
+            future.set_exception(error)
+            # Mark it retrieved; the job itself raises the error for callers that never wait on pages.
+            future.exception()
+        else:
+            future.set_result(renditions[number])
+
+
+class ConversionJob:
+    def __init__(self, converter):
+        """
+        A handle on one deck being converted by an AsyncConverter.
+
+        Await the job for the deck's EncodeResult list, await ``page(n)`` for
+        a single page, or iterate with ``async for`` to receive each page's
+        results as soon as the chunk of pages holding it is written.
+
+        Args:
+            converter (PPTConverter): The converter for the deck.
+        """
+        self.converter = converter
+        self._pages = {}
+        self._planned = asyncio.get_running_loop().create_future()
+        self._task = None
+
+    def _set_pages(self, futures):
+        self._pages = futures
+        if not self._planned.done():
+            self._planned.set_result(None)
+
+    def _fail(self, error):
+        if not self._planned.done():
+            if isinstance(error, asyncio.CancelledError):
+                self._planned.cancel()
+            else:
+                self._planned.set_exception(error)
+                # Mark it retrieved; callers that never wait on pages see the error from the job itself.
+                self._planned.exception()
+
+    async def pages(self):
+        """
+        Wait until the deck is converted and its render work is planned.
+
+        Returns:
+            list: The page numbers that will be rendered, which excludes pages reused by incremental mode
+                and is empty when the slides came from the cache.
+        """
+        await asyncio.shield(self._planned)
+        return sorted(self._pages)
+
+    async def page(self, page_number):
+        """
+        Wait for one page to be rendered and written.
+
+        Args:
+            page_number (int): The 1-based page number.
+
+        Returns:
+            list: EncodeResult tuples for each rendition of the page, or None if the page is not being rendered.
+        """
+        await asyncio.shield(self._planned)
+        future = self._pages.get(page_number)
+        if future is None:
+            return None
+        return await asyncio.shield(future)
+
+    async def __aiter__(self):
+        await asyncio.shield(self._planned)
+        for future in asyncio.as_completed([asyncio.shield(f) for f in self._pages.values()]):
+            yield await future
+
+    def cancel(self):
+        """
+        Cancel the conversion.
+
+        A running soffice process is killed along with its process group and
+        pages that have not started rendering are dropped. Pages already
+        rendering in the executor finish, since a worker cannot be interrupted
+        mid-page.
+        """
+        self._task.cancel()
+
+    def done(self):
+        return self._task.done()
+
+    def __await__(self):
+        return self._task.__await__()
+
+
+class AsyncConverter:
+    def __init__(self, max_concurrent=4, render_workers=None, mp_context=None):
+        """
+        Run PPTConverter conversions from asyncio code without blocking the event loop.
+
+        soffice runs as an asyncio subprocess, rasterization runs on a process
+        pool shared by every conversion, and the blocking bookkeeping around
+        them (hashing, fingerprinting, manifests) runs on the loop's default
+        thread pool. A semaphore shared across requests limits how many decks
+        convert at once; further requests wait their turn.
+
+        Args:
+            max_concurrent (int, optional): Decks converted at once. Defaults to 4.
+            render_workers (int, optional): Processes in the shared render pool. Defaults to the CPU count.
+            mp_context (multiprocessing.context.BaseContext, optional): The start method for render processes.
+                Use 'forkserver' or 'spawn' when the service runs other threads. Defaults to None, the platform
+                default.
+        """
+        self.max_concurrent = max(1, max_concurrent)
+        self.render_workers = render_workers or cpu_count()
+        self._limit = asyncio.Semaphore(self.max_concurrent)
+        self._executor = ProcessPoolExecutor(max_workers=self.render_workers, mp_context=mp_context,
+                                             initializer=_init_render_worker)
+
+    async def ppt_to_pdf(self, converter):
+        """
+        Convert a deck to PDF without blocking the event loop.
+
+        The one-shot soffice process gets its own process group and user
+        profile, so concurrent calls do not interfere and cancelling the call
+        kills it and any helpers it started instead of leaving them running.
+        With an office pool or under the converter's watchdog the conversion
+        runs on a thread; it cannot be interrupted, so a cancelled call
+        returns at once while the pooled worker or the watchdog finishes the
+        document or gives up on it at its timeout.
+
+        Args:
+            converter (PPTConverter): The converter for the deck.
+
+        Raises:
+            subprocess.CalledProcessError: If the conversion process fails.
+            Exception: For unexpected errors during the conversion.
+        """
+        try:
+            if await asyncio.to_thread(converter.use_cached_pdf):
+                return
+            start = time.perf_counter()
+            if converter.watchdog is not None:
+                await asyncio.to_thread(converter.watchdog.convert, converter.ppt_path, converter.pdf_path,
+                                        office_pool=converter.office_pool, metrics=converter.metrics,
+                                        deck=converter.deck)
+            elif converter.office_pool is not None:
+                await asyncio.to_thread(converter.office_pool.convert, converter.ppt_path, converter.pdf_path)
+            else:
+                # Concurrent conversions each get a private profile; see PPTConverter.soffice_command.
+                with tempfile.TemporaryDirectory(prefix='soffice-profile-') as profile_dir:
+                    command = converter.soffice_command(profile_dir)
+                    process = await asyncio.create_subprocess_exec(*command, start_new_session=True)
+                    try:
+                        returncode = await process.wait()
+                    except asyncio.CancelledError:
+                        try:
+                            os.killpg(process.pid, signal.SIGKILL)
+                        except ProcessLookupError:
+                            pass
+                        await process.wait()
+                        raise
+                if returncode != 0:
+                    raise subprocess.CalledProcessError(returncode, command)
+            converter.metrics.observe('soffice', (time.perf_counter() - start) * 1000.0, deck=converter.deck)
+            await asyncio.to_thread(converter.store_pdf_in_cache)
+        except asyncio.CancelledError:
+            print(f"Cancelled converting {converter.ppt_path} to PDF")
+            raise
+        except subprocess.CalledProcessError as e:
+            print(f"Error occurred while converting PPT to PDF: {e}")
+            raise
+        except Exception as e:
+            print(f"An unexpected error occurred: {e}")
+            raise
+
+    async def _render(self, converter, job):
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        plan = await asyncio.to_thread(converter.plan_render, self.render_workers)
+        if plan is None:
+            job._set_pages({})
+            return converter.page_stats
+        _, tasks = plan
+        # Chunks run as planned so each worker keeps its document open across pages; page futures
+        # resolve when the chunk holding the page finishes.
+        futures = {}
+        chunks = []
+        for task in tasks:
+            pages = {number: loop.create_future() for number in range(task.first_page, task.last_page + 1)}
+            futures.update(pages)
+            chunk = loop.run_in_executor(self._executor, _render_chunk, task)
+            chunk.add_done_callback(functools.partial(_resolve_pages, pages))
+            chunks.append(chunk)
+        job._set_pages(futures)
+        try:
+            results = await asyncio.gather(*chunks)
+        except BaseException:
+            for chunk in chunks:
+                chunk.cancel()
+            converter.discard_render()
+            raise
+        await asyncio.to_thread(converter.finish_render, [result for chunk in results for result in chunk])
+        converter.metrics.observe('render_stage', (time.perf_counter() - start) * 1000.0, deck=converter.deck)
+        return converter.page_stats
+
+    async def _run(self, converter, job):
+        try:
+            async with self._limit:
+                await self.ppt_to_pdf(converter)
+                if not os.path.isfile(converter.pdf_path):
+                    raise FileNotFoundError(converter.pdf_path)
+                return await self._render(converter, job)
+        except BaseException as e:
+            job._fail(e)
+            raise
+        finally:
+            await asyncio.to_thread(converter.metrics.flush)
+
+    def submit(self, converter):
+        """
+        Start converting a deck and return a handle on it at once.
+
+        Args:
+            converter (PPTConverter): The converter for the deck. ``profile_dir`` and ``num_processes`` are
+                ignored; rendering always uses the shared pool.
+
+        Returns:
+            ConversionJob: The job; await it for the EncodeResult list of every page rendered.
+        """
+        job = ConversionJob(converter)
+        job._task = asyncio.ensure_future(self._run(converter, job))
+        return job
+
+    async def convert(self, converter):
+        """
+        Convert a deck and wait for it to finish.
+
+        Args:
+            converter (PPTConverter): The converter for the deck.
+
+        Returns:
+            list: EncodeResult tuples for every rendition of every page rendered.
+
+        Raises:
+            Exception: For errors during conversion or rendering.
+        """
+        return await self.submit(converter)
+
+    async def close(self):
+        """
+        Shut down the shared render pool, dropping render work that has not started.
+        """
+        await asyncio.to_thread(self._executor.shutdown, True, cancel_futures=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
@@ -0,0 +1,303 @@
+"""
+Reproducible benchmarks for each stage of the conversion pipeline.
+
+Synthetic PDFs are generated offline with PyMuPDF, so runs do not depend on
+local decks. Each case runs in a fresh process so its peak RSS is its own,
+once to warm up and once measured, and every case is repeated in several
+passes over the suite; the median throughput is reported along with the
+spread between passes. Results are written as JSON and can be compared
+against a previous run:
+
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --compare results.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # noqa: E402
+
+from encoders import ImageEncoder  # noqa: E402
+from renderers import RENDERERS, get_renderer  # noqa: E402
+from utils import FileUtils  # noqa: E402
+
+# (name, pages, width_pt, height_pt, kind)
+FIXTURES = [
+    ('vector-16x9-20p', 20, 720, 405, 'vector'),
+    ('image-16x9-20p', 20, 720, 405, 'image'),
+    ('vector-4x3-100p', 100, 720, 540, 'vector'),
+    ('vector-a3-10p', 10, 842, 1191, 'vector'),
+]
+
+
+def make_synthetic_pdf(path, pages, width, height, kind, seed=0):
+    """
+    Write a deterministic synthetic PDF.
+
+    Args:
+        path (str): The output path.
+        pages (int): The number of pages.
+        width (float): The page width in points.
+        height (float): The page height in points.
+        kind (str): 'vector' for text and shapes, 'image' for a full-bleed photo-like image per page.
+        seed (int, optional): The random seed. Defaults to 0.
+    """
+    rng = random.Random(seed)
+    document = fitz.open()
+    for number in range(pages):
+        page = document.new_page(width=width, height=height)
+        page.insert_text((36, 60), f"Synthetic slide {number + 1}", fontsize=32)
+        if kind == 'image':
+            side = 512
+            noise = rng.randbytes(side * side * 3)
+            pixmap = fitz.Pixmap(fitz.csRGB, side, side, noise, False)
+            page.insert_image(fitz.Rect(0, 80, width, height), pixmap=pixmap)
+        else:
+            for _ in range(60):
+                x, y = rng.uniform(0, width), rng.uniform(80, height)
+                rect = fitz.Rect(x, y, x + rng.uniform(10, 120), y + rng.uniform(10, 80))
+                page.draw_rect(rect, color=(rng.random(), rng.random(), rng.random()),
+                               fill=(rng.random(), rng.random(), rng.random()))
+            for line in range(8):
+                page.insert_text((36, 110 + line * 24), "The quick brown fox jumps over the lazy dog " * 2,
+                                 fontsize=12)
+    document.save(path, deflate=True)
+    document.close()
+
+
+def _summarize(latencies_ms, items, subprocesses=False):
+    """
+    Summarize the latencies of one run.
+
+    ``peak_rss_kb`` is the high-water mark of this process. Stages that work
+    in subprocesses (soffice, pdftoppm behind pdf2image) also report
+    ``children_peak_rss_kb``, the largest finished child, since their memory
+    never shows up in this process.
+    """
+    latencies = sorted(latencies_ms)
+    total_s = sum(latencies) / 1000.0
+
+    def percentile(p):
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(round(p / 100.0 * (len(latencies) - 1))))]
+
+    summary = {
+        'items': items,
+        'total_s': round(total_s, 4),
+        'per_sec': round(items / total_s, 2) if total_s else None,
+        'p50_ms': percentile(50),
+        'p90_ms': percentile(90),
+        'p99_ms': percentile(99),
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+    if subprocesses:
+        summary['children_peak_rss_kb'] = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return summary
+
+
+def bench_page_count(pdf_path, repeat=20):
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        FileUtils.get_pdf_page_count(pdf_path)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+    return _summarize(latencies, repeat)
+
+
+def bench_rasterize(pdf_path, backend, dpi):
+    renderer = get_renderer(backend, pdf_path, dpi=dpi)
+    latencies = []
+    try:
+        for page_number in range(1, renderer.page_count + 1):
+            start = time.perf_counter()
+            renderer.render_page(page_number)
+            latencies.append((time.perf_counter() - start) * 1000.0)
+    finally:
+        renderer.close()
+    return _summarize(latencies, len(latencies), subprocesses=backend == 'pdf2image')
+
+
+def bench_encode(pdf_path, image_format, dpi, pages=5):
+    renderer = get_renderer('pymupdf', pdf_path, dpi=dpi)
+    try:
+        images = [renderer.render_page(n) for n in range(1, min(pages, renderer.page_count) + 1)]
+    finally:
+        renderer.close()
+    encoder = ImageEncoder(image_format)
+    latencies, total_bytes = [], 0
+    for image in images:
+        start = time.perf_counter()
+        total_bytes += len(encoder.encode(image))
+        latencies.append((time.perf_counter() - start) * 1000.0)
+    result = _summarize(latencies, len(latencies))
+    result['bytes_per_page'] = total_bytes // max(1, len(images))
+    return result
+
+
+def bench_soffice(pptx_path):
+    workdir = tempfile.mkdtemp(prefix='bench-soffice-')
+    try:
+        start = time.perf_counter()
+        subprocess.run(['soffice', '--headless', f'-env:UserInstallation=file://{workdir}/profile',
+                        '--convert-to', 'pdf', pptx_path, '--outdir', workdir],
+                       check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return _summarize([(time.perf_counter() - start) * 1000.0], 1, subprocesses=True)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _run_case(case):
+    _, _, _, function, args = case
+    # The first run pays for imports, font loading and a cold page cache; it is not counted.
+    function(*args)
+    return function(*args)
+
+
+def _aggregate(case, runs):
+    """
+    Combine the repeated runs of a case into one result around its median throughput.
+
+    ``per_sec_spread`` is the gap between the slowest and fastest run relative
+    to the median, a measure of how noisy the case is on this machine.
+    """
+    stage, fixture, params, _, _ = case
+    runs = sorted(runs, key=lambda run: run['per_sec'] or 0)
+    result = dict(runs[len(runs) // 2])
+    rates = [run['per_sec'] for run in runs if run['per_sec']]
+    result['runs'] = len(runs)
+    result['per_sec_runs'] = rates
+    result['per_sec_spread'] = round((rates[-1] - rates[0]) / result['per_sec'], 4) if result['per_sec'] else None
+    result['peak_rss_kb'] = max(run['peak_rss_kb'] for run in runs)
+    if 'children_peak_rss_kb' in result:
+        result['children_peak_rss_kb'] = max(run['children_peak_rss_kb'] for run in runs)
+    return {'stage': stage, 'fixture': fixture, 'params': params, **result}
+
+
+def build_cases(workdir, dpi, backends, formats, pptx_paths):
+    cases = []
+    for name, pages, width, height, kind in FIXTURES:
+        pdf_path = os.path.join(workdir, f"{name}.pdf")
+        make_synthetic_pdf(pdf_path, pages, width, height, kind)
+        cases.append(('page_count', name, {}, bench_page_count, (pdf_path,)))
+        for backend in backends:
+            cases.append(('rasterize', name, {'backend': backend, 'dpi': dpi}, bench_rasterize,
+                          (pdf_path, backend, dpi)))
+        for image_format in formats:
+            cases.append(('encode', name, {'format': image_format, 'dpi': dpi}, bench_encode,
+                          (pdf_path, image_format, dpi)))
+    if pptx_paths and shutil.which('soffice'):
+        for pptx_path in pptx_paths:
+            cases.append(('soffice', os.path.basename(pptx_path), {}, bench_soffice, (os.path.abspath(pptx_path),)))
+    elif pptx_paths:
+        print("soffice not found; skipping the soffice stage.", file=sys.stderr)
+    return cases
+
+
+def compare(results, baseline, threshold):
+    """
+    Report cases whose median throughput dropped by more than their noise against a baseline run.
+
+    A drop counts when it exceeds ``threshold`` and every pass of the new run
+    was slower than every pass of the baseline, so a case whose throughput
+    varies by 30% from pass to pass is not flagged for a 15% dip, while a
+    consistent slowdown is flagged however noisy the case is.
+
+    Returns:
+        list: Human-readable regression descriptions.
+    """
+    def key(result):
+        return result['stage'], result['fixture'], json.dumps(result['params'], sort_keys=True)
+
+    previous = {key(result): result for result in baseline['results']}
+    regressions = []
+    for result in results['results']:
+        old = previous.get(key(result))
+        if not old or not old.get('per_sec') or not result.get('per_sec'):
+            continue
+        change = result['per_sec'] / old['per_sec'] - 1
+        fastest_new = max(result.get('per_sec_runs') or [result['per_sec']])
+        slowest_old = min(old.get('per_sec_runs') or [old['per_sec']])
+        if change < -threshold and fastest_new < slowest_old:
+            regressions.append(f"{result['stage']} {result['fixture']} {result['params']}: "
+                               f"{old['per_sec']} -> {result['per_sec']} per sec ({change:+.1%}; fastest pass "
+                               f"{fastest_new} < slowest baseline pass {slowest_old})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark each stage of the PPTX to image pipeline.")
+    parser.add_argument("--dpi", type=int, default=150, help="Rendering resolution (default: 150)")
+    parser.add_argument("--backend", action="append", choices=sorted(RENDERERS), dest="backends",
+                        help="Rasterization backend to measure; repeatable (default: all installed)")
+    parser.add_argument("--format", action="append", choices=sorted(ImageEncoder.FORMATS), dest="formats",
+                        help="Encoder format to measure; repeatable (default: all)")
+    parser.add_argument("--pptx", action="append", default=[], help="PPTX fixture for the soffice stage")
+    parser.add_argument("--output", help="Write JSON results to this file instead of stdout")
+    parser.add_argument("--compare", help="Baseline JSON results to check for regressions")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="Passes over the suite; each case reports its median over the passes (default: 5)")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Smallest drop in median throughput counted as a regression; drops where the "
+                             "passes of both runs overlap are ignored too (default: 0.10)")
+    args = parser.parse_args()
+
+    backends = args.backends or [name for name in sorted(RENDERERS)
+                                 if name != 'pdf2image' or shutil.which('pdftoppm')]
+    formats = args.formats or sorted(ImageEncoder.FORMATS)
+
+    workdir = tempfile.mkdtemp(prefix='ppt-img-conv-bench-')
+    try:
+        cases = build_cases(workdir, args.dpi, backends, formats, args.pptx)
+        context = multiprocessing.get_context('spawn')
+        runs = [[] for _ in cases]
+        # Passes over the whole suite rather than back-to-back repeats, so the spread of each case includes
+        # drift in the machine's speed over the run and not only jitter.
+        for _ in range(max(1, args.repeat)):
+            for case, case_runs in zip(cases, runs):
+                # A fresh process per case keeps peak RSS attributable to that case alone.
+                with context.Pool(processes=1) as pool:
+                    case_runs.append(pool.apply(_run_case, (case,)))
+        case_results = [_aggregate(case, case_runs) for case, case_runs in zip(cases, runs)]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    results = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'pymupdf': fitz.VersionBind,
+        },
+        'results': case_results,
+    }
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+
+from utils import FileUtils
+
+
+class ConversionCache:
+    INDEX_FILE = 'index.json'
+    LOCK_FILE = '.lock'
+    PDF_NAME = 'deck.pdf'
+    SLIDES_DIR = 'slides'
+
+    def __init__(self, root, max_bytes=10 * 1024 ** 3):
+        """
+        Initialize a content-addressed cache of converted decks.
+
+        Entries are keyed by a hash of the PPTX bytes plus the render
+        settings and hold the intermediate PDF and the rendered slides. The
+        least recently used entries are evicted once the cache grows past
+        ``max_bytes``. The index is updated under a lock file, so several
+        processes (sharded workers, the daemon and the CLI) can share one
+        cache, and entries are only evicted while nobody is reading one.
+
+        Args:
+            root (str): The cache directory.
+            max_bytes (int, optional): The size cap in bytes. Defaults to 10 GiB.
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        FileUtils.create_directory_if_not_exists(os.path.join(root, 'entries'))
+
+    @contextlib.contextmanager
+    def _locked(self, shared=False):
+        # flock locks belong to the open file, so each holder opens its own and threads exclude each other too.
+        with open(os.path.join(self.root, self.LOCK_FILE), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    @staticmethod
+    def make_key(ppt_path, settings):
+        """
+        Compute the cache key for a deck and its render settings.
+
+        Args:
+            ppt_path (str): The path to the PowerPoint file.
+            settings (dict): The render settings that affect the output, e.g. backend, zoom and format.
+
+        Returns:
+            str: The hex digest identifying the entry.
+        """
+        digest = hashlib.sha256()
+        with open(ppt_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        digest.update(json.dumps(settings, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.root, 'entries', key)
+
+    def _load_index(self):
+        try:
+            with open(os.path.join(self.root, self.INDEX_FILE)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self, index):
+        index_path = os.path.join(self.root, self.INDEX_FILE)
+        tmp_path = f"{index_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp_path, index_path)
+
+    def _touch(self, key):
+        with self._locked():
+            index = self._load_index()
+            if key in index:
+                index[key]['last_access'] = time.time()
+                self._save_index(index)
+
+    def has_pdf(self, key):
+        """
+        Check whether the cache holds the PDF for a key.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            bool: True if the PDF is cached, False otherwise.
+        """
+        return os.path.isfile(os.path.join(self._entry_dir(key), self.PDF_NAME))
+
+    def has_slides(self, key):
+        """
+        Check whether the cache holds the rendered slides for a key.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            bool: True if the slides are cached, False otherwise.
+        """
+        return os.path.isdir(os.path.join(self._entry_dir(key), self.SLIDES_DIR))
+
+    def materialize_pdf(self, key, pdf_path):
+        """
+        Place the cached PDF for a key at ``pdf_path``.
+
+        Args:
+            key (str): The cache key.
+            pdf_path (str): The destination path.
+
+        Raises:
+            FileNotFoundError: If the entry was evicted since it was checked.
+        """
+        with self._locked(shared=True):
+            FileUtils.link_or_copy(os.path.join(self._entry_dir(key), self.PDF_NAME), pdf_path)
+        self._touch(key)
+
+    def materialize_slides(self, key, output_dir):
+        """
+        Place the cached slides for a key into ``output_dir``.
+
+        Args:
+            key (str): The cache key.
+            output_dir (str): The destination directory.
+
+        Returns:
+            list: The paths of the slide files placed, relative to output_dir.
+
+        Raises:
+            FileNotFoundError: If the entry was evicted since it was checked.
+        """
+        slides_dir = os.path.join(self._entry_dir(key), self.SLIDES_DIR)
+        names = []
+        # Eviction waits for the shared lock, so the entry cannot disappear halfway through.
+        with self._locked(shared=True):
+            if not os.path.isdir(slides_dir):
+                raise FileNotFoundError(slides_dir)
+            for dirpath, _, filenames in os.walk(slides_dir):
+                relative_dir = os.path.relpath(dirpath, slides_dir)
+                FileUtils.create_directory_if_not_exists(os.path.join(output_dir, relative_dir))
+                for filename in filenames:
+                    name = os.path.normpath(os.path.join(relative_dir, filename))
+                    FileUtils.link_or_copy(os.path.join(dirpath, filename), os.path.join(output_dir, name))
+                    names.append(name)
+        self._touch(key)
+        return sorted(names)
+
+    def store(self, key, pdf_path=None, slide_paths=(), base_dir=None):
+        """
+        Add the PDF and/or rendered slides for a key and evict old entries.
+
+        Files are staged in a temporary directory and moved into place with a
+        rename, so concurrent readers never see a half-written entry.
+
+        Args:
+            key (str): The cache key.
+            pdf_path (str, optional): The converted PDF. Defaults to None.
+            slide_paths (iterable, optional): The rendered slide files. Defaults to ().
+            base_dir (str, optional): The directory slide paths are stored relative to, keeping
+                subdirectories. Defaults to None, which stores them by file name.
+        """
+        entry_dir = self._entry_dir(key)
+        FileUtils.create_directory_if_not_exists(entry_dir)
+        if pdf_path is not None and not self.has_pdf(key):
+            tmp_pdf = os.path.join(entry_dir, f".{uuid.uuid4().hex}.tmp")
+            FileUtils.link_or_copy(pdf_path, tmp_pdf)
+            os.replace(tmp_pdf, os.path.join(entry_dir, self.PDF_NAME))
+        slide_paths = list(slide_paths)
+        if slide_paths and not self.has_slides(key):
+            tmp_dir = os.path.join(entry_dir, f".{uuid.uuid4().hex}.tmp")
+            os.makedirs(tmp_dir)
+            for path in slide_paths:
+                name = os.path.relpath(path, base_dir) if base_dir else os.path.basename(path)
+                FileUtils.create_directory_if_not_exists(os.path.dirname(os.path.join(tmp_dir, name)))
+                FileUtils.link_or_copy(path, os.path.join(tmp_dir, name))
+            try:
+                os.rename(tmp_dir, os.path.join(entry_dir, self.SLIDES_DIR))
+            except OSError:
+                # Another process stored the same slides first.
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        size = sum(os.path.getsize(os.path.join(dirpath, name))
+                   for dirpath, _, names in os.walk(entry_dir) for name in names)
+        with self._locked():
+            index = self._load_index()
+            index[key] = {'size': size, 'last_access': time.time()}
+            self._evict(index)
+            self._save_index(index)
+
+    def _evict(self, index):
+        total = sum(entry['size'] for entry in index.values())
+        for key in sorted(index, key=lambda k: index[k]['last_access']):
+            if total <= self.max_bytes:
+                break
+            total -= index.pop(key)['size']
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
@@ -1,12 +1,278 @@
+import collections
+import contextlib
+import math
 import os
+import posixpath
+import queue
 import subprocess
+import tempfile
+import threading
+import time
 
+from collections import namedtuple
 from multiprocessing import Pool, cpu_count
-from pdf2image import convert_from_path
+from encoders import EncoderStage, EncodeResult, ImageEncoder, OutputSpec, StreamingPNGWriter, derive_renditions
+from metrics import Metrics, profile_to
+from document import TEXT_INDEX_FORMATS, DocumentSession, load_text_index, save_text_index
+from fingerprint import (DUPLICATES_NAME, MANIFEST_NAME, find_duplicate_pages, find_near_duplicates,
+                         load_duplicate_report, load_manifest, perceptual_hash, plan_incremental_render,
+                         save_duplicate_report, save_manifest)
+from preview import extract_preview, read_deck_preview
+from renderers import get_renderer
+from scheduler import COPIES_PER_PAGE, plan_memory, plan_page_chunks
+from shared_ring import PixmapRing, SharedPixmap
+from slidepack import PACK_NAME, PackWriter, open_pack
 from utils import FileUtils
 
+# Renderers opened by this thread, keyed by (backend, pdf_path, dpi, zoom) and
+# the file's identity, so each pool worker parses a document once instead of
+# once per page. Long-lived workers keep only the most recently used few open.
+# The cache is per thread because decks rendered serially on several threads
+# of one process (DeckPipeline with render_concurrency > 1) must not close
+# each other's documents.
+_worker_local = threading.local()
+_MAX_WORKER_RENDERERS = 4
+
+
+def _worker_renderers():
+    renderers = getattr(_worker_local, 'renderers', None)
+    if renderers is None:
+        renderers = _worker_local.renderers = {}
+    return renderers
+
+
+def _get_worker_renderer(backend, pdf_path, dpi, zoom):
+    renderers = _worker_renderers()
+    stat = os.stat(pdf_path)
+    key = (backend, pdf_path, dpi, zoom, stat.st_mtime_ns, stat.st_size)
+    renderer = renderers.pop(key, None)
+    if renderer is None:
+        renderer = get_renderer(backend, pdf_path, dpi=dpi, zoom=zoom)
+        while len(renderers) >= _MAX_WORKER_RENDERERS:
+            renderers.pop(next(iter(renderers))).close()
+    renderers[key] = renderer
+    return renderer
+
+
+def _close_worker_renderers():
+    renderers = _worker_renderers()
+    while renderers:
+        _, renderer = renderers.popitem()
+        renderer.close()
+
+
+def _init_render_worker():
+    # A forked worker inherits the parent's cache; document handles must not be shared across processes.
+    _worker_renderers().clear()
+
+
+def _render_page_bytes(task):
+    """
+    Render and encode one page in a pool worker, returning the bytes to the parent.
+
+    Args:
+        task (tuple): ``(backend, pdf_path, dpi, zoom, encoder, page_number)``.
+
+    Returns:
+        tuple: ``(page_number, encoded_bytes)``.
+    """
+    backend, pdf_path, dpi, zoom, encoder, page_number = task
+    renderer = _get_worker_renderer(backend, pdf_path, dpi, zoom)
+    return page_number, encoder.encode(renderer.render_page(page_number))
+
+
+# The parent's pixmap ring, attached once per worker started by _init_ring_worker.
+_worker_ring = None
+
+
+def _init_ring_worker(name, slots, slot_bytes):
+    global _worker_ring
+    _init_render_worker()
+    _worker_ring = PixmapRing(slots, slot_bytes, name=name)
+
+
+def _render_page_to_slot(task):
+    """
+    Render one page in a pool worker straight into a slot of the parent's pixmap ring.
+
+    Args:
+        task (tuple): ``(backend, pdf_path, dpi, zoom, page_number, slot)``.
+
+    Returns:
+        tuple: ``(page_number, slot, width, height)``.
+    """
+    backend, pdf_path, dpi, zoom, page_number, slot = task
+    renderer = _get_worker_renderer(backend, pdf_path, dpi, zoom)
+    if hasattr(renderer, 'render_pixmap'):
+        pixmap = renderer.render_pixmap(page_number)
+        width, height = pixmap.width, pixmap.height
+        _worker_ring.write(slot, pixmap.samples_mv)
+    else:
+        image = renderer.render_page(page_number).convert('RGB')
+        width, height = image.size
+        _worker_ring.write(slot, image.tobytes())
+    return page_number, slot, width, height
+
+
+# One unit of work for a render pool worker: a contiguous page range plus the
+# plain settings needed to render it. page_budget/band_rows are set when a
+# memory budget forces oversized pages to be rendered in bands. perceptual_hash
+# and extract_text attach a perceptual hash and the page text to its results.
+# packed returns encoded pages in the results, named by their pack entry,
+# instead of writing them to output_dir.
+_ChunkTask = namedtuple('_ChunkTask', [
+    'backend', 'pdf_path', 'dpi', 'zoom', 'outputs', 'encode_threads', 'max_pending', 'output_dir',
+    'first_page', 'last_page', 'page_budget', 'band_rows', 'perceptual_hash', 'extract_text', 'packed',
+], defaults=(False, False, False))
+
+# Longest edge, in pixels, of the thumbnail rendered to hash a banded page.
+_PHASH_RENDER_SIZE = 64
+
+
+def _task_output_path(task, spec, page_number):
+    filename = PPTConverter.get_padded_filename("slide", page_number, 4, spec.encoder.extension)
+    if task.packed:
+        return posixpath.join(spec.name, filename)
+    return os.path.join(task.output_dir, spec.name, filename)
+
+
+def _render_banded_page(renderer, task, page_number):
+    """
+    Render an oversized page without ever holding it whole in memory.
+
+    Full-size PNG outputs are streamed band by band into the encoder; smaller
+    outputs are rendered directly at their own, much lower, zoom.
+
+    Returns:
+        list: EncodeResult tuples for every rendition of the page.
+    """
+    width, height = renderer.page_pixel_size(page_number)
+    results = []
+    for spec in task.outputs:
+        path = _task_output_path(task, spec, page_number)
+        start = time.perf_counter()
+        if spec.max_size is None and spec.encoder.image_format == 'png':
+            target = path
+            if task.packed:
+                # A packed page is streamed through a scratch file on local disk rather than held decoded.
+                fd, target = tempfile.mkstemp(suffix='.png')
+                os.close(fd)
+            writer = StreamingPNGWriter(target, width, height, spec.encoder.compress_level)
+            for band in renderer.render_bands(page_number, task.band_rows):
+                writer.write_rows(band)
+            bytes_written = writer.close()
+            data = None
+            if task.packed:
+                with open(target, 'rb') as f:
+                    data = f.read()
+                os.remove(target)
+            results.append(EncodeResult(page_number, path, bytes_written, (time.perf_counter() - start) * 1000.0,
+                                        data=data))
+        else:
+            if spec.max_size is None:
+                print(f"Page {page_number} exceeds the memory budget but {spec.encoder.image_format} output "
+                      f"cannot be streamed; rendering it whole.")
+            scale = min(1.0, spec.max_size / max(width, height)) if spec.max_size else 1.0
+            image = renderer.render_page(page_number, zoom=renderer.zoom * scale)
+            render_ms = (time.perf_counter() - start) * 1000.0
+            if task.packed:
+                start = time.perf_counter()
+                data = spec.encoder.encode(image)
+                results.append(EncodeResult(page_number, path, len(data), (time.perf_counter() - start) * 1000.0,
+                                            render_ms, data=data))
+                continue
+            bytes_written, encode_ms = spec.encoder.save(image, path)
+            results.append(EncodeResult(page_number, path, bytes_written, encode_ms, render_ms))
+        if not task.packed:
+            print(f"Saved {path}")
+    return results
+
+
+def _iter_chunk_pages(renderer, task, banded):
+    """
+    Rasterize the pages of a chunk in order.
+
+    Yields:
+        tuple: ``(page_number, image, text, render_ms)``. image is None for pages that exceed the memory
+        budget and must be rendered in bands; text is None unless the task extracts text and the backend can.
+    """
+    if not hasattr(renderer, 'render_bands'):
+        # Backends without in-process rendering pay a process and a parse per call, so render
+        # several pages per call, in groups no larger than the encoder backlog.
+        group = max(1, task.max_pending or 4)
+        for first in range(task.first_page, task.last_page + 1, group):
+            start = time.perf_counter()
+            images = list(renderer.render_range(first, min(first + group - 1, task.last_page)))
+            render_ms = (time.perf_counter() - start) * 1000.0 / max(1, len(images))
+            for page_number, image in images:
+                yield page_number, image, None, render_ms
+            del images
+        return
+    for page_number in range(task.first_page, task.last_page + 1):
+        if banded:
+            width, height = renderer.page_pixel_size(page_number)
+            if width * height * 3 * COPIES_PER_PAGE > task.page_budget:
+                yield page_number, None, renderer.page_text(page_number) if task.extract_text else None, None
+                continue
+        start = time.perf_counter()
+        if task.extract_text:
+            image, text = renderer.render_page_with_text(page_number)
+        else:
+            image, text = renderer.render_page(page_number), None
+        yield page_number, image, text, (time.perf_counter() - start) * 1000.0
+
+
+def _render_chunk(task):
+    """
+    Render a contiguous range of pages in a pool worker.
+
+    The task carries only plain settings, so nothing heavier than a short
+    tuple is pickled per chunk, and the worker keeps its document open
+    across every chunk it is given. Each page is rasterized once; smaller
+    outputs are downscaled from it and every rendition is encoded on threads
+    while the next page renders. Pages too large for the worker's share of
+    the memory budget are rendered in bands instead.
+
+    Args:
+        task (_ChunkTask): The page range and render settings.
+
+    Returns:
+        list: EncodeResult tuples for every rendition of the pages in the chunk.
+    """
+    renderer = _get_worker_renderer(task.backend, task.pdf_path, task.dpi, task.zoom)
+    banded = task.band_rows is not None and hasattr(renderer, 'render_bands')
+    results = []
+    phashes, texts = {}, {}
+    with EncoderStage(task.outputs[0].encoder, max_workers=task.encode_threads,
+                      max_pending=task.max_pending, in_memory=task.packed) as stage:
+        for page_number, image, text, render_ms in _iter_chunk_pages(renderer, task, banded):
+            if text is not None:
+                texts[page_number] = text
+            if image is None:
+                results.extend(_render_banded_page(renderer, task, page_number))
+                if task.perceptual_hash:
+                    width, height = renderer.page_pixel_size(page_number)
+                    zoom = renderer.zoom * _PHASH_RENDER_SIZE / max(width, height)
+                    phashes[page_number] = perceptual_hash(renderer.render_page(page_number, zoom=zoom))
+                continue
+            if task.perceptual_hash:
+                phashes[page_number] = perceptual_hash(image)
+            for spec, rendition in derive_renditions(image, task.outputs):
+                stage.submit(page_number, rendition, _task_output_path(task, spec, page_number), spec.encoder,
+                             render_ms=render_ms)
+            del image, rendition
+        results.extend(stage.results())
+    if phashes or texts:
+        results = [result._replace(phash=phashes.get(result.page_number), text=texts.get(result.page_number))
+                   for result in results]
+    return results
+
+
 class PPTConverter:
-    def __init__(self, ppt_path, output_dir, num_processes=None):
+    def __init__(self, ppt_path, output_dir, num_processes=None, office_pool=None, backend='pymupdf', dpi=200,
+                 zoom=None, cache=None, incremental=True, encoder=None, encode_threads=2, outputs=None, metrics=None,
+                 profile_dir=None, memory_budget=None, render_pool=None, journal=None, dedupe=True,
+                 near_duplicate_distance=None, text_index=None, packed=False, watchdog=None):
         """
         Initialize PPTConverter with paths and multiprocessing parameters.
 
@@ -14,23 +280,105 @@ class PPTConverter:
             ppt_path (str): The path to the PowerPoint file.
             output_dir (str): The directory where PNG images will be saved.
             num_processes (int, optional): The number of processes to use for multiprocessing. Defaults to None.
+            office_pool (OfficePool, optional): A pool of warm LibreOffice workers used by ppt_to_pdf. Defaults to None,
+                which starts a fresh soffice process per conversion.
+            backend (str, optional): The rendering backend, 'pymupdf' or 'pdf2image'. Defaults to 'pymupdf'.
+            dpi (int, optional): The rendering resolution. Defaults to 200.
+            zoom (float, optional): A scale factor relative to 72 DPI. Overrides dpi when given. Defaults to None.
+            cache (ConversionCache, optional): A cache of converted PDFs and slides for unchanged decks.
+                Defaults to None.
+            incremental (bool, optional): Re-render only pages whose content changed since the last run into
+                output_dir, as recorded in its page manifest. Defaults to True.
+            encoder (ImageEncoder, optional): The output format and encoding options. Defaults to PNG.
+            encode_threads (int, optional): Encoding threads per render process. Defaults to 2.
+            outputs (list, optional): OutputSpec tuples for several sizes/formats per page, each written to its own
+                subdirectory of output_dir. Defaults to a single full-size output in output_dir using encoder.
+            metrics (Metrics, optional): Receives stage timers and counters labelled with the deck name.
+                Defaults to a Metrics without sinks.
+            profile_dir (str, optional): Run both stages under cProfile and write ``<deck>-<stage>.prof`` files
+                here. Rendering is done in this process while profiling. Defaults to None.
+            memory_budget (int, optional): Bytes available for rendered pages across all render processes. Limits
+                the pages in flight from their estimated pixmap size and renders pages that do not fit in
+                horizontal bands streamed into the encoder. Defaults to None (unbounded).
+            render_pool (multiprocessing.pool.Pool, optional): A long-lived pool, started with
+                ``_init_render_worker``, used for every deck instead of starting a pool per deck. Size
+                num_processes to match it. Defaults to None.
+            journal (RunJournal, optional): Records the deck's progress page by page, and skips pages it
+                records as already written for the same source file and settings. Defaults to None.
+            dedupe (bool, optional): Render and encode each distinct page once; pages identical to an earlier
+                page get hard links to its images. Defaults to True.
+            near_duplicate_distance (int, optional): Also hash each rendered page perceptually and report page
+                pairs at most this many bits apart in ``.slides-duplicates.json``. Defaults to None (off).
+            text_index (str, optional): Extract each page's text and title while rendering it and write a
+                searchable ``slides-index.json`` or ``slides-index.sqlite`` to output_dir: 'json' or 'sqlite'.
+                Defaults to None (off).
+            packed (bool, optional): Append every encoded page to a single ``slides.pack`` in output_dir instead
+                of writing one file per slide; see ``slidepack.PackReader``. Defaults to False.
+            watchdog (SofficeWatchdog, optional): Supervises ppt_to_pdf with timeouts, retries and quarantine.
+                Defaults to None, which runs soffice without a time limit.
         """
         self.ppt_path = ppt_path
         self.output_dir = output_dir
         self.num_processes = num_processes or cpu_count()
+        self.office_pool = office_pool
+        self.backend = backend
+        self.dpi = dpi
+        self.zoom = zoom
+        self.cache = cache
+        self._cache_key = None
+        self.incremental = incremental
+        self.encoder = encoder or ImageEncoder()
+        self.encode_threads = encode_threads
+        self.outputs = list(outputs) if outputs else [OutputSpec('', None, self.encoder)]
+        self.page_stats = []
+        self.metrics = metrics or Metrics()
+        self.profile_dir = profile_dir
+        self.memory_budget = memory_budget
+        self.render_pool = render_pool
+        self.journal = journal
+        self.dedupe = dedupe
+        self.near_duplicate_distance = near_duplicate_distance
+        self.text_index = text_index
+        self.packed = packed
+        self.watchdog = watchdog
+        self._pack = None
+        self._previous_pack = None
+        self._pack_moves = {}
+        self._duplicates = {}
+        self.deck = os.path.splitext(os.path.basename(ppt_path))[0]
         self.pdf_path = ppt_path.rsplit('.', 1)[0] + '.pdf'
 
+    def _profiled(self, stage):
+        if self.profile_dir is None:
+            return contextlib.nullcontext()
+        FileUtils.create_directory_if_not_exists(self.profile_dir)
+        return profile_to(os.path.join(self.profile_dir, f"{self.deck}-{stage}.prof"))
+
     def ppt_to_pdf(self):
         """
         Convert PowerPoint file (.pptx) to PDF using LibreOffice.
 
+        Uses the office pool when one was given, otherwise starts a one-shot
+        ``soffice --headless`` process. Both run under the watchdog when one
+        was given.
+
         Raises:
             subprocess.CalledProcessError: If the conversion process fails.
             Exception: For unexpected errors during the conversion.
         """
         try:
-            command = ['soffice', '--headless', '--convert-to', 'pdf', self.ppt_path, '--outdir', os.path.dirname(self.pdf_path)]
-            subprocess.run(command, check=True)
+            if self.use_cached_pdf():
+                return
+            with self._profiled('ppt_to_pdf'), self.metrics.timer('soffice', deck=self.deck):
+                if self.watchdog is not None:
+                    self.watchdog.convert(self.ppt_path, self.pdf_path, office_pool=self.office_pool,
+                                          metrics=self.metrics, deck=self.deck)
+                elif self.office_pool is not None:
+                    self.office_pool.convert(self.ppt_path, self.pdf_path)
+                else:
+                    with tempfile.TemporaryDirectory(prefix='soffice-profile-') as profile_dir:
+                        subprocess.run(self.soffice_command(profile_dir), check=True)
+            self.store_pdf_in_cache()
         except subprocess.CalledProcessError as e:
             print(f"Error occurred while converting PPT to PDF: {e}")
             raise
@@ -38,8 +386,84 @@ class PPTConverter:
             print(f"An unexpected error occurred: {e}")
             raise
 
+    def soffice_command(self, profile_dir=None):
+        """
+        Build the one-shot LibreOffice command that converts this deck.
+
+        Args:
+            profile_dir (str, optional): A private user profile for this invocation. One-shot soffice processes
+                sharing the default profile hand their document to whichever started first, which may exit
+                without converting it, so concurrent conversions each need their own. Defaults to None.
+
+        Returns:
+            list: The command and its arguments.
+        """
+        command = ['soffice', '--headless']
+        if profile_dir is not None:
+            command.append(f'-env:UserInstallation=file://{os.path.abspath(profile_dir)}')
+        return command + ['--convert-to', 'pdf', self.ppt_path, '--outdir', os.path.dirname(self.pdf_path)]
+
+    def use_cached_pdf(self):
+        """
+        Place the cached PDF for this deck at pdf_path, if the cache has one.
+
+        Returns:
+            bool: True if the cached PDF was used, False otherwise.
+        """
+        if self.cache is None or not self.cache.has_pdf(self.cache_key):
+            return False
+        try:
+            self.cache.materialize_pdf(self.cache_key, self.pdf_path)
+        except FileNotFoundError:
+            # Another process evicted the entry after the check.
+            return False
+        self.metrics.incr('cache_hits', deck=self.deck, stage='pdf')
+        print(f"Using cached PDF for {self.ppt_path}")
+        return True
+
+    def store_pdf_in_cache(self):
+        """
+        Add a freshly converted PDF to the cache, if caching is enabled.
+        """
+        if self.cache is not None and FileUtils.check_file_exists(self.pdf_path):
+            self.cache.store(self.cache_key, pdf_path=self.pdf_path)
+
+    def preview(self, extract=False, with_media=True):
+        """
+        Get a quick preview of the deck from the PPTX container, without LibreOffice or rendering.
+
+        Reads the thumbnail PowerPoint saved with the deck, the slide count
+        and the embedded media directly from the zip, which takes
+        milliseconds. Call ``ppt_to_pdf`` and ``process_pdf_pages`` only when
+        full slide renders are needed.
+
+        Args:
+            extract (bool, optional): Write the thumbnail and media files to ``<output_dir>/preview``.
+                Defaults to False.
+            with_media (bool, optional): Include the embedded media. Defaults to True.
+
+        Returns:
+            tuple: ``(DeckPreview, paths)``, where paths lists the files written when extracting.
+
+        Raises:
+            zipfile.BadZipFile: If the deck is not a PPTX container.
+        """
+        try:
+            with self.metrics.timer('preview', deck=self.deck):
+                deck_preview = read_deck_preview(self.ppt_path, with_media=with_media)
+                paths = []
+                if extract:
+                    paths = extract_preview(self.ppt_path, os.path.join(self.output_dir, 'preview'),
+                                            preview=deck_preview, with_media=with_media)
+            print(f"Preview of {self.ppt_path}: {deck_preview.slide_count} slides, "
+                  f"{'a' if deck_preview.thumbnail else 'no'} thumbnail, {len(deck_preview.media)} media files")
+            return deck_preview, paths
+        except Exception as e:
+            print(f"Error occurred while reading the preview of {self.ppt_path}: {e}")
+            raise
+
     @staticmethod
-    def get_padded_filename(base_name, number, total_digits):
+    def get_padded_filename(base_name, number, total_digits, extension='.png'):
         """
         Generate a filename with zero-padded numbers.
 
@@ -47,15 +471,16 @@ class PPTConverter:
             base_name (str): The base name for the file.
             number (int): The number to be padded and included in the filename.
             total_digits (int): The total number of digits for padding.
+            extension (str, optional): The file extension, including the dot. Defaults to '.png'.
 
         Returns:
             str: The padded filename.
         """
-        return f"{base_name}-{number:0{total_digits}}.png"
+        return f"{base_name}-{number:0{total_digits}}{extension}"
 
     def convert_page_to_png(self, page_info):
         """
-        Convert a single page of the PDF to a PNG image.
+        Convert a single page of the PDF to an image in the configured format.
 
         Args:
             page_info (tuple): A tuple containing the PDF path, page number, and output directory.
@@ -65,46 +490,631 @@ class PPTConverter:
         """
         pdf_path, page_number, output_dir = page_info
         try:
-            images = convert_from_path(pdf_path, first_page=page_number, last_page=page_number)
-            image_filename = self.get_padded_filename("slide", page_number, 4)  # Assuming 4-digit padding
+            renderer = _get_worker_renderer(self.backend, pdf_path, self.dpi, self.zoom)
+            image_filename = self.get_padded_filename("slide", page_number, 4, self.encoder.extension)
             image_path = os.path.join(output_dir, image_filename)
-            images[0].save(image_path, 'JPEG')
+            self.encoder.save(renderer.render_page(page_number), image_path)
             print(f"Saved {image_path}")
         except Exception as e:
             print(f"Error occurred while converting page {page_number} to PNG: {e}")
             raise
 
-    def process_pdf_pages(self):
+    @property
+    def effective_zoom(self):
+        """
+        float: The rendering scale factor relative to 72 DPI.
+        """
+        return self.zoom if self.zoom is not None else self.dpi / 72.0
+
+    @property
+    def render_settings(self):
+        """
+        dict: The settings that determine the rendered output, used in cache keys.
+        """
+        return {
+            'backend': self.backend,
+            'zoom': self.effective_zoom,
+            'outputs': [{'name': spec.name, 'max_size': spec.max_size, **spec.encoder.settings}
+                        for spec in self.outputs],
+        }
+
+    @property
+    def output_settings(self):
+        """
+        dict: The render settings plus the options that change what else is written to output_dir, used in
+        cache keys and to decide whether the output of an earlier run is complete.
+        """
+        settings = self.render_settings
+        if self.text_index:
+            # The text index is stored with the slides, so output with and without one must differ.
+            settings = dict(settings, text_index=self.text_index)
+        if self.packed:
+            settings = dict(settings, packed=True)
+        return settings
+
+    @property
+    def cache_key(self):
         """
-        Convert all pages of a PDF to PNG images, using multiprocessing if necessary.
+        str: The cache key for this deck and its output settings, computed once.
+        """
+        if self._cache_key is None:
+            self._cache_key = self.cache.make_key(self.ppt_path, self.output_settings)
+        return self._cache_key
+
+    def iter_pages(self, ordered=True, max_in_flight=None, encoder=None):
+        """
+        Render the PDF and yield encoded pages as they become ready, without touching output_dir.
+
+        At most ``max_in_flight`` pages are rendering, encoded or waiting to
+        be consumed at any time, so memory stays bounded however large the
+        deck is and however slowly the caller drains the generator.
+
+        Args:
+            ordered (bool, optional): Yield pages in page order rather than completion order. Defaults to True.
+            max_in_flight (int, optional): The maximum number of pages held at once. Defaults to twice the
+                number of render processes.
+            encoder (ImageEncoder, optional): The encoder for each page. Defaults to the converter's encoder.
+
+        Yields:
+            tuple: ``(page_number, encoded_bytes)`` for every page.
+
+        Raises:
+            Exception: For errors while rendering or encoding a page.
+        """
+        num_pages, page_width, page_height = FileUtils.get_pdf_layout(self.pdf_path)
+        workers, _ = plan_page_chunks(num_pages, page_width, page_height, self.effective_zoom, self.num_processes)
+        tasks = [(self.backend, self.pdf_path, self.dpi, self.zoom, encoder or self.encoder, page_number)
+                 for page_number in range(1, num_pages + 1)]
+
+        if workers <= 1:
+            # A renderer of its own: the generator may be resumed between other work on this thread.
+            renderer = get_renderer(self.backend, self.pdf_path, dpi=self.dpi, zoom=self.zoom)
+            try:
+                for _, _, _, _, page_encoder, page_number in tasks:
+                    yield page_number, page_encoder.encode(renderer.render_page(page_number))
+            finally:
+                renderer.close()
+            return
+
+        max_in_flight = max(1, max_in_flight or 2 * workers)
+        completed = queue.Queue()
+        with Pool(processes=workers, initializer=_init_render_worker) as pool:
+            submitted = yielded = 0
+            buffered = {}
+            while yielded < num_pages:
+                while submitted < num_pages and submitted - yielded < max_in_flight:
+                    pool.apply_async(_render_page_bytes, (tasks[submitted],),
+                                     callback=completed.put, error_callback=completed.put)
+                    submitted += 1
+                result = completed.get()
+                if isinstance(result, BaseException):
+                    print(f"Error occurred while streaming PDF pages: {result}")
+                    raise result
+                if not ordered:
+                    yielded += 1
+                    yield result
+                    continue
+                page_number, data = result
+                buffered[page_number] = data
+                while yielded + 1 in buffered:
+                    yielded += 1
+                    yield yielded, buffered.pop(yielded)
+
+    def iter_pixmaps(self, ordered=True, slots=None):
+        """
+        Render the PDF and yield raw pixmaps for consumption in this process, without touching output_dir.
+
+        Render workers write each page into a slot of a shared memory ring
+        and send back only its size, so pages reach the caller without being
+        pickled or copied. A yielded page is valid until the generator is
+        resumed: its slot is then recycled for another page and its pixels
+        are released, so keep ``pixmap.image()`` or a copy of the bytes to
+        hold on to a page. Workers only render while a slot is free, so a
+        slow consumer holds back rendering instead of piling up pages.
+
+        Args:
+            ordered (bool, optional): Yield pages in page order rather than completion order. Defaults to True.
+            slots (int, optional): The number of pages rendered or waiting at once. Defaults to twice the number
+                of render processes, reduced to fit the memory budget when one is set.
+
+        Yields:
+            SharedPixmap: Every page, with packed RGB rows in ``pixels``.
+
+        Raises:
+            Exception: For errors while rendering a page.
+        """
+        with DocumentSession(self.pdf_path) as session:
+            num_pages, page_width, page_height = session.layout()
+        workers, _ = plan_page_chunks(num_pages, page_width, page_height, self.effective_zoom, self.num_processes)
+
+        if workers <= 1:
+            renderer = get_renderer(self.backend, self.pdf_path, dpi=self.dpi, zoom=self.zoom)
+            try:
+                for page_number in range(1, num_pages + 1):
+                    if hasattr(renderer, 'render_pixmap'):
+                        pixmap = renderer.render_pixmap(page_number)
+                        size, pixels = (pixmap.width, pixmap.height), pixmap.samples_mv
+                    else:
+                        image = renderer.render_page(page_number).convert('RGB')
+                        size, pixels = image.size, memoryview(image.tobytes())
+                    page = SharedPixmap(page_number, *size, pixels.toreadonly(), on_release=lambda: None)
+                    try:
+                        yield page
+                    finally:
+                        page.release()
+            finally:
+                renderer.close()
+            return
+
+        # Page rectangles round outward to whole pixels, so allow for a partial pixel on each edge.
+        slot_bytes = ((math.ceil(page_width * self.effective_zoom) + 2)
+                      * (math.ceil(page_height * self.effective_zoom) + 2) * 3)
+        slots = max(1, slots or 2 * workers)
+        if self.memory_budget:
+            slots = max(1, min(slots, self.memory_budget // slot_bytes))
+        ring = PixmapRing(slots, slot_bytes)
+        try:
+            completed = queue.Queue()
+            free = collections.deque(range(slots))
+            with Pool(processes=workers, initializer=_init_ring_worker,
+                      initargs=(ring.name, slots, slot_bytes)) as pool:
+                submitted = yielded = 0
+                buffered = {}
+                while yielded < num_pages:
+                    while submitted < num_pages and free:
+                        submitted += 1
+                        pool.apply_async(_render_page_to_slot,
+                                         ((self.backend, self.pdf_path, self.dpi, self.zoom, submitted,
+                                           free.popleft()),),
+                                         callback=completed.put, error_callback=completed.put)
+                    result = completed.get()
+                    if isinstance(result, BaseException):
+                        print(f"Error occurred while streaming PDF pages: {result}")
+                        raise result
+                    buffered[result[0]] = result
+                    ready = [result[0]] if not ordered else []
+                    while ordered and yielded + len(ready) + 1 in buffered:
+                        ready.append(yielded + len(ready) + 1)
+                    for page_number in ready:
+                        _, slot, width, height = buffered.pop(page_number)
+                        page = SharedPixmap(page_number, width, height, ring.view(slot, width * height * 3),
+                                            on_release=lambda slot=slot: free.append(slot))
+                        yielded += 1
+                        try:
+                            yield page
+                        finally:
+                            page.release()
+        finally:
+            ring.close()
+
+    def _slide_path(self, page_number, spec=None):
+        spec = spec or self.outputs[0]
+        filename = self.get_padded_filename("slide", page_number, 4, spec.encoder.extension)
+        return os.path.join(self.output_dir, spec.name, filename)
+
+    def _slide_paths(self, page_number):
+        return [self._slide_path(page_number, spec) for spec in self.outputs]
+
+    def _pack_name(self, page_number, spec):
+        return posixpath.join(spec.name, self.get_padded_filename("slide", page_number, 4, spec.encoder.extension))
+
+    def _has_slides(self, page_number):
+        """
+        Check that every rendition of a page from an earlier run is still in place, as files or in the pack.
+        """
+        if self.packed:
+            return self._previous_pack is not None and all(
+                self._pack_name(page_number, spec) in self._previous_pack for spec in self.outputs)
+        return all(map(os.path.isfile, self._slide_paths(page_number)))
+
+    def _apply_page_moves(self, moves):
+        """
+        Reuse existing slide images for pages that moved to a new number.
+
+        Every source is linked to a temporary name before any destination is
+        written, so a chain of renumberings never overwrites a slide that is
+        still needed as the source of another move.
+
+        Args:
+            moves (dict): A mapping of new page number to the old page number whose image it reuses.
+        """
+        staged = []
+        for new_number, old_number in moves.items():
+            for spec in self.outputs:
+                target = self._slide_path(new_number, spec)
+                tmp_path = f"{target}.reuse.tmp"
+                FileUtils.link_or_copy(self._slide_path(old_number, spec), tmp_path)
+                staged.append((tmp_path, target))
+        for tmp_path, target in staged:
+            os.replace(tmp_path, target)
+
+    def _remove_stale_slides(self, num_pages):
+        """
+        Remove slide images numbered beyond the current page count or left in another format.
+
+        Args:
+            num_pages (int): The number of pages in the current PDF.
+        """
+        extensions = {extension for _, extension in ImageEncoder.FORMATS.values()}
+        for spec in self.outputs:
+            spec_dir = os.path.join(self.output_dir, spec.name)
+            if not os.path.isdir(spec_dir):
+                continue
+            for name in os.listdir(spec_dir):
+                stem, extension = os.path.splitext(name)
+                number = stem[len("slide-"):]
+                if not (stem.startswith("slide-") and number.isdigit() and extension in extensions):
+                    continue
+                if int(number) > num_pages or extension != spec.encoder.extension:
+                    os.remove(os.path.join(spec_dir, name))
+
+    def _record_page_stats(self):
+        rendered = set()
+        for result in self.page_stats:
+            if result.page_number not in rendered and result.render_ms is not None:
+                rendered.add(result.page_number)
+                self.metrics.observe('render', result.render_ms, deck=self.deck)
+            self.metrics.observe('encode', result.encode_ms, deck=self.deck)
+            self.metrics.incr('bytes_written', result.bytes_written, deck=self.deck)
+        self.metrics.incr('pages_rendered', len(rendered), deck=self.deck)
+
+    def process_pdf_pages(self, outputs=None):
+        """
+        Convert all pages of a PDF to images, using multiprocessing if necessary.
+
+        The document is split into contiguous page chunks sized from the page
+        count, page dimensions and available cores; small or cheap documents
+        are rendered serially in this process. In incremental mode only pages
+        that are new or changed since the last run are rendered; moved pages
+        reuse their previous images and images of deleted pages are removed.
+        Afterwards ``page_stats`` holds an EncodeResult with the bytes written
+        and encode time for every page rendered.
+
+        Args:
+            outputs (list, optional): OutputSpec tuples replacing the converter's outputs. Each page is
+                rasterized once at full size and smaller outputs are downscaled from it. Defaults to None.
 
         Raises:
             Exception: For errors during the page processing.
         """
+        if outputs:
+            self.outputs = list(outputs)
+            self._cache_key = None
+        if self.journal is not None:
+            self.journal.start_deck(self.ppt_path, self.output_settings)
+        with self._profiled('process_pdf_pages'), self.metrics.timer('render_stage', deck=self.deck):
+            self._process_pdf_pages()
+        if self.journal is not None:
+            self.journal.finish_deck(self.ppt_path)
+
+    def plan_render(self, cores=None):
+        """
+        Prepare output_dir and plan the render work for the PDF.
+
+        Handles everything before rasterization: cache hits, page counting,
+        incremental fingerprinting with reuse of moved pages, chunking and the
+        memory plan. The PDF is opened once here, in a DocumentSession, for
+        its layout, metadata and fingerprints. Run the returned tasks with ``_render_chunk`` (in any
+        process) and pass all their results to ``finish_render``.
+
+        Args:
+            cores (int, optional): The processes available for rendering. Defaults to num_processes.
+
+        Returns:
+            tuple: ``(workers, tasks)``, or None when the slides were served from the cache.
+        """
+        for spec in self.outputs if not self.packed else [OutputSpec('', None, self.encoder)]:
+            FileUtils.create_directory_if_not_exists(os.path.join(self.output_dir, spec.name))
+
+        if self.cache is not None and self.cache.has_slides(self.cache_key):
+            try:
+                self._use_cached_slides()
+                return None
+            except FileNotFoundError:
+                # Another process evicted the entry after the check; render as usual.
+                pass
+
+        with DocumentSession(self.pdf_path) as session:
+            with self.metrics.timer('pdf_layout', deck=self.deck):
+                num_pages, page_width, page_height = session.layout()
+            print(f"Number of pages in {self.pdf_path}: {num_pages}")
+            self._num_pages = num_pages
+            self._metadata = session.metadata
+
+            self._fingerprints = None
+            if self.incremental or self.dedupe or self.near_duplicate_distance is not None or self.text_index:
+                with self.metrics.timer('fingerprint', deck=self.deck):
+                    self._fingerprints = session.fingerprints()
+
+        self._previous_pack = open_pack(self.output_dir) if self.packed else None
+        self._pack_moves = {}
+        pages = None
+        if self.incremental:
+            pages, moves = plan_incremental_render(load_manifest(self.output_dir), self.render_settings,
+                                                   self._fingerprints, self._has_slides)
+            if self.packed:
+                # Moved pages are copied from the previous pack while the new one is finished.
+                self._pack_moves = moves
+            else:
+                # Record the layout the moves leave behind first, so a run that fails before finish_render
+                # does not leave the old manifest describing renumbered slides; pages still to be
+                # rendered are unknown until then.
+                remaining = set(pages)
+                save_manifest(self.output_dir, self.render_settings,
+                              [None if n in remaining else fingerprint
+                               for n, fingerprint in enumerate(self._fingerprints, start=1)])
+                self._apply_page_moves(moves)
+                self._remove_stale_slides(num_pages)
+            self.metrics.incr('pages_skipped', num_pages - len(pages), deck=self.deck)
+            print(f"Rendering {len(pages)} of {num_pages} pages ({len(moves)} reused from new positions)")
+
+        if self.journal is not None:
+            done = self.journal.done_pages(self.ppt_path, self.output_settings)
+            candidates = pages if pages is not None else range(1, num_pages + 1)
+            pages = [n for n in candidates if not self._journaled(n, done)]
+            if len(pages) < len(candidates):
+                print(f"Skipping {len(candidates) - len(pages)} pages already written by an earlier run")
+
+        self._duplicates = {}
+        if self.dedupe:
+            candidates = pages if pages is not None else range(1, num_pages + 1)
+            duplicates = find_duplicate_pages(self._fingerprints)
+            self._duplicates = {n: duplicates[n] for n in candidates if n in duplicates}
+            pages = [n for n in candidates if n not in self._duplicates]
+            if self._duplicates:
+                print(f"Reusing images for {len(self._duplicates)} pages identical to an earlier page")
+
+        workers, chunks = plan_page_chunks(num_pages, page_width, page_height, self.effective_zoom,
+                                           cores or self.num_processes, pages=pages)
+        workers, max_pending, page_budget, band_rows = plan_memory(
+            round(page_width * self.effective_zoom), round(page_height * self.effective_zoom), workers,
+            2 * self.encode_threads, self.memory_budget)
+        tasks = [_ChunkTask(self.backend, self.pdf_path, self.dpi, self.zoom, self.outputs, self.encode_threads,
+                            max_pending, self.output_dir, first, last, page_budget, band_rows,
+                            self.near_duplicate_distance is not None, self.text_index is not None, self.packed)
+                 for first, last in chunks]
+        if self.packed:
+            self._pack = PackWriter(os.path.join(self.output_dir, PACK_NAME))
+        return workers, tasks
+
+    def _use_cached_slides(self):
+        """
+        Place the cached slides for this deck in output_dir, replacing what another version of the deck left.
+
+        The page manifest and duplicate report travel with the slides, so a
+        later incremental run compares against the slides actually in place;
+        entries stored without a manifest get one from the PDF. Slides
+        numbered beyond the cached deck are removed.
+        """
+        names = self.cache.materialize_slides(self.cache_key, self.output_dir)
+        manifest = load_manifest(self.output_dir) if MANIFEST_NAME in names else None
+        if manifest is not None:
+            num_pages = len(manifest['pages'])
+        else:
+            with DocumentSession(self.pdf_path) as session:
+                num_pages = session.layout()[0]
+                if self.incremental:
+                    save_manifest(self.output_dir, self.render_settings, session.fingerprints())
+            if not self.incremental and os.path.exists(os.path.join(self.output_dir, MANIFEST_NAME)):
+                os.remove(os.path.join(self.output_dir, MANIFEST_NAME))
+        if DUPLICATES_NAME not in names and os.path.exists(os.path.join(self.output_dir, DUPLICATES_NAME)):
+            os.remove(os.path.join(self.output_dir, DUPLICATES_NAME))
+        if self.packed:
+            self._remove_stale_slides(0)
+        else:
+            self._remove_stale_slides(num_pages)
+            if PACK_NAME not in names and os.path.exists(os.path.join(self.output_dir, PACK_NAME)):
+                os.remove(os.path.join(self.output_dir, PACK_NAME))
+        self.metrics.incr('cache_hits', deck=self.deck, stage='slides')
+        print(f"Using {len(names)} cached slides for {self.ppt_path}")
+
+    def _journaled(self, page_number, done):
+        if page_number not in done:
+            return False
+        if self._fingerprints is not None and done[page_number] != self._fingerprints[page_number - 1]:
+            return False
+        return self._has_slides(page_number)
+
+    def _journal_results(self, results):
+        if self.journal is not None:
+            self.journal.record_pages(self.ppt_path, {
+                result.page_number: self._fingerprints[result.page_number - 1] if self._fingerprints else None
+                for result in results})
+
+    def _pack_results(self, results):
+        """
+        Append the encoded pages carried by results to the pack being written.
+
+        Returns:
+            list: The results without their data.
+        """
+        packed = []
+        for result in results:
+            if result.data is not None:
+                self._pack.add(result.path, result.data)
+                result = result._replace(data=None)
+            packed.append(result)
+        return packed
+
+    def _copy_reused_pages(self):
+        """
+        Copy the pages that were not rendered again from the previous pack, following page moves.
+        """
+        rendered = {result.page_number for result in self.page_stats}
+        for page_number in range(1, self._num_pages + 1):
+            if page_number in rendered or page_number in self._duplicates:
+                continue
+            source = self._pack_moves.get(page_number, page_number)
+            for spec in self.outputs:
+                view = self._previous_pack.view(self._pack_name(source, spec))
+                try:
+                    self._pack.add(self._pack_name(page_number, spec), view)
+                finally:
+                    view.release()
+
+    def _finish_pack(self):
+        """
+        Move the new pack into place and drop per-slide files left by an unpacked run.
+        """
+        size = self._pack.close()
+        self._pack = None
+        if self._previous_pack is not None:
+            self._previous_pack.close()
+            self._previous_pack = None
+        self._remove_stale_slides(0)
+        print(f"Saved {self._num_pages} pages to {os.path.join(self.output_dir, PACK_NAME)} ({size} bytes)")
+
+    def discard_render(self):
+        """
+        Drop a partly written pack after the planned render work failed.
+        """
+        if self._pack is not None:
+            self._pack.abort()
+            self._pack = None
+        if self._previous_pack is not None:
+            self._previous_pack.close()
+            self._previous_pack = None
+
+    def _link_duplicates(self):
+        staged = []
+        for page_number, source in sorted(self._duplicates.items()):
+            for spec in self.outputs:
+                if self.packed:
+                    self._pack.alias(self._pack_name(page_number, spec), self._pack_name(source, spec))
+                    continue
+                target = self._slide_path(page_number, spec)
+                tmp_path = f"{target}.dedupe.tmp"
+                FileUtils.link_or_copy(self._slide_path(source, spec), tmp_path)
+                staged.append((tmp_path, target))
+        for tmp_path, target in staged:
+            os.replace(tmp_path, target)
+        if self._duplicates:
+            self.metrics.incr('pages_deduplicated', len(self._duplicates), deck=self.deck)
+
+    def _save_duplicate_report(self):
+        exact = find_duplicate_pages(self._fingerprints)
+        near, phashes = [], {}
+        if self.near_duplicate_distance is not None:
+            fingerprints = set(self._fingerprints)
+            previous = load_duplicate_report(self.output_dir) or {}
+            phashes = {fp: value for fp, value in previous.get('phashes', {}).items() if fp in fingerprints}
+            phashes.update({self._fingerprints[result.page_number - 1]: result.phash
+                            for result in self.page_stats if result.phash is not None})
+            page_hashes = {n: phashes[fp] for n, fp in enumerate(self._fingerprints, start=1)
+                           if fp in phashes and n not in exact}
+            near = find_near_duplicates(page_hashes, self.near_duplicate_distance)
+            if near:
+                print(f"Found {len(near)} near-duplicate page pairs in {self.ppt_path}")
+        save_duplicate_report(self.output_dir, exact, near, phashes)
+
+    def _save_text_index(self):
+        texts = load_text_index(self.output_dir)
+        texts.update({self._fingerprints[result.page_number - 1]: result.text
+                      for result in self.page_stats if result.text is not None})
+        missing = [n for n, fp in enumerate(self._fingerprints, start=1) if fp not in texts]
+        if missing:
+            # Pages reused from an earlier run without an index, or rendered by a backend that cannot extract text.
+            with DocumentSession(self.pdf_path) as session:
+                for page_number in missing:
+                    texts[self._fingerprints[page_number - 1]] = session.page_text(page_number)
+        pages = [{'page': n, 'fingerprint': fp, **texts[fp]} for n, fp in enumerate(self._fingerprints, start=1)]
+        for index_format, name in TEXT_INDEX_FORMATS.items():
+            if index_format != self.text_index and os.path.exists(os.path.join(self.output_dir, name)):
+                os.remove(os.path.join(self.output_dir, name))
+        return save_text_index(self.output_dir, self.text_index, self.deck, self._metadata, pages)
+
+    def finish_render(self, page_stats):
+        """
+        Record the results of the planned render work and update the manifest and cache.
+
+        Pages found identical to an earlier page are linked to its images here.
+
+        Args:
+            page_stats (iterable): The EncodeResult tuples returned by every task.
+        """
+        self.page_stats = sorted(self._pack_results(page_stats) if self.packed else page_stats)
+        if self.packed:
+            self._copy_reused_pages()
+        self._link_duplicates()
+        if self.packed:
+            self._finish_pack()
+            # Packed pages only count as written once the pack holding them is in place.
+            self._journal_results(self.page_stats)
+        elif os.path.exists(os.path.join(self.output_dir, PACK_NAME)):
+            os.remove(os.path.join(self.output_dir, PACK_NAME))
+        if self._duplicates and self.journal is not None:
+            self.journal.record_pages(self.ppt_path, {n: self._fingerprints[n - 1] for n in self._duplicates})
+        self._record_page_stats()
+        if self.dedupe or self.near_duplicate_distance is not None:
+            self._save_duplicate_report()
+        extra_paths = []
+        if self.text_index:
+            with self.metrics.timer('text_index', deck=self.deck):
+                extra_paths.append(self._save_text_index())
+
+        # The manifest and duplicate report describe these slides, so cache hits restore them too.
+        if self.incremental:
+            save_manifest(self.output_dir, self.render_settings, self._fingerprints)
+            extra_paths.append(os.path.join(self.output_dir, MANIFEST_NAME))
+        if self.dedupe or self.near_duplicate_distance is not None:
+            extra_paths.append(os.path.join(self.output_dir, DUPLICATES_NAME))
+
+        if self.cache is not None:
+            if self.packed:
+                slide_paths = [os.path.join(self.output_dir, PACK_NAME)] + extra_paths
+            else:
+                slide_paths = [path for i in range(1, self._num_pages + 1) for path in self._slide_paths(i)]
+                slide_paths += extra_paths
+            self.cache.store(self.cache_key, pdf_path=self.pdf_path, slide_paths=slide_paths,
+                             base_dir=self.output_dir)
+
+    def _process_pdf_pages(self):
         try:
-            # Get the number of pages
-            num_pages = FileUtils.get_pdf_page_count(self.pdf_path)
-            
-            # Prepare data for processing
-            page_infos = [(self.pdf_path, i + 1, self.output_dir) for i in range(num_pages)]
-
-            if num_pages > 100:
-                # Use multiprocessing for a large number of pages
-                with Pool(processes=self.num_processes) as pool:
-                    pool.map(self.convert_page_to_png, page_infos)
+            plan = self.plan_render(cores=1 if self.profile_dir is not None else None)
+            if plan is None:
+                return
+            workers, tasks = plan
+
+            page_stats = []
+            if self.render_pool is not None and self.profile_dir is None:
+                for results in self.render_pool.imap_unordered(_render_chunk, tasks):
+                    page_stats.extend(self._chunk_done(results))
+            elif workers > 1:
+                with Pool(processes=workers, initializer=_init_render_worker) as pool:
+                    for results in pool.imap_unordered(_render_chunk, tasks):
+                        page_stats.extend(self._chunk_done(results))
             else:
-                # Use a single process for a smaller number of pages
-                for page_info in page_infos:
-                    self.convert_page_to_png(page_info)
+                try:
+                    for task in tasks:
+                        page_stats.extend(self._chunk_done(_render_chunk(task)))
+                finally:
+                    _close_worker_renderers()
+            self.finish_render(page_stats)
         except Exception as e:
             print(f"Error occurred while processing PDF pages: {e}")
+            self.discard_render()
             raise
 
-
+    def _chunk_done(self, results):
+        # Pack pages as chunks arrive so encoded bytes are not held until the end; they are journaled
+        # when the pack is finished.
+        if self.packed:
+            return self._pack_results(results)
+        self._journal_results(results)
+        return results
 
 if __name__ == "__main__":
+    import argparse
     import time
+
+    parser = argparse.ArgumentParser(description="Render the pages of an already converted PDF and report the time taken. "
+                                                 "See benchmarks/run_benchmarks.py for per-stage measurements.")
+    parser.add_argument("pdf_path", help="Path to the PDF file")
+    parser.add_argument("output_dir", help="Directory where the images will be saved")
+    args = parser.parse_args()
+
     st = time.time()
-    conv = PPTConverter("/home/hash/Desktop/ppt-png-conv/filepath/Learning_Python.pdf", "images/")
+    FileUtils.create_directory_if_not_exists(args.output_dir)
+    conv = PPTConverter(args.pdf_path, args.output_dir)
     conv.process_pdf_pages()
-    print(f"total time taken: {time.time() - st}")
\ No newline at end of file
+    print(f"total time taken: {time.time() - st}")
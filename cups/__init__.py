@@ -9,8 +9,10 @@ Modules:
 - printer: Manages printer configuration and setup.
 - config: Contains configuration-related functions.
 - cups-utils: Provides utility functions for the package.
+- print_queue: Prints files in batches and hands the resulting PDFs on.
 """
 
 from .installer import is_package_installed, install_packages
 from .printer import configure_cups_pdf, add_cups_pdf_printer, restart_cups
-from .config import needs_setup, update_timestamp
+from .cups_utils import needs_setup, update_timestamp
+from .print_queue import PrintQueue, read_outfile
@@ -0,0 +1,310 @@
+import ctypes
+import ctypes.util
+import getpass
+import os
+import re
+import select
+import shutil
+import struct
+import subprocess
+import time
+import uuid
+
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+CUPS_PDF_CONFIG = '/etc/cups/cups-pdf.conf'
+# cups-pdf's built-in output directory when the configuration does not set one.
+DEFAULT_OUTFILE = '/var/spool/cups-pdf/${USER}'
+
+PrintJob = namedtuple('PrintJob', ['source', 'token', 'job_id', 'submitted'])
+PrintJob.__doc__ = """A submitted file, the token in its job title, the CUPS job ID (or None) and its submit time
+on the monotonic clock."""
+
+
+def read_outfile(config_file=CUPS_PDF_CONFIG):
+    """
+    Get the directory cups-pdf writes its PDFs to.
+
+    Reads the ``Out`` directive of the cups-pdf configuration; ``Outfile``, as
+    written by ``printer.configure_cups_pdf``, is accepted too. ``${HOME}``,
+    ``${USER}`` and ``~`` are expanded for the current user.
+
+    Args:
+        config_file (str): Path to the cups-pdf configuration file.
+
+    Returns:
+        str: The output directory.
+    """
+    outfile = DEFAULT_OUTFILE
+    try:
+        with open(config_file) as f:
+            for line in f:
+                parts = line.strip().split(None, 1)
+                if len(parts) == 2 and parts[0] in ('Out', 'Outfile'):
+                    outfile = parts[1]
+    except FileNotFoundError:
+        print(f"Configuration file {config_file} does not exist; assuming {DEFAULT_OUTFILE}.")
+    except OSError as e:
+        print(f"Error reading CUPS-PDF configuration: {e}")
+        raise
+    outfile = outfile.replace('${USER}', getpass.getuser()).replace('${HOME}', os.path.expanduser('~'))
+    return os.path.expanduser(outfile)
+
+
+class DirectoryWatcher:
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    _EVENT = struct.Struct('iIII')
+
+    def __init__(self, directory, poll_interval=1.0):
+        """
+        Report files as they are finished in a directory.
+
+        Uses Linux inotify for close-after-write and rename-into events, so
+        waiting costs nothing until a file lands. Where inotify is not
+        available the directory is scanned every ``poll_interval`` seconds
+        and a file is reported once its size stops changing.
+
+        Args:
+            directory (str): The directory to watch.
+            poll_interval (float, optional): Seconds between scans when inotify is unavailable. Defaults to 1.0.
+        """
+        self.directory = directory
+        self.poll_interval = poll_interval
+        self._fd = None
+        self._sizes = {}
+        self._reported = set()
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd < 0:
+                raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+            if libc.inotify_add_watch(fd, os.fsencode(directory), self.IN_CLOSE_WRITE | self.IN_MOVED_TO) < 0:
+                errno = ctypes.get_errno()
+                os.close(fd)
+                raise OSError(errno, os.strerror(errno), directory)
+            self._fd = fd
+        except (OSError, AttributeError) as e:
+            print(f"inotify unavailable ({e}); scanning {directory} every {poll_interval:g}s instead")
+            self._reported = set(os.listdir(directory))
+
+    def wait(self, timeout=None):
+        """
+        Wait for finished files.
+
+        Args:
+            timeout (float, optional): The longest wait in seconds. Defaults to None (wait for a file).
+
+        Returns:
+            list: Names of files finished since the last call; empty if the timeout passed first.
+        """
+        if self._fd is None:
+            return self._scan(timeout)
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        names, offset = [], 0
+        while offset < len(data):
+            _, _, _, length = self._EVENT.unpack_from(data, offset)
+            offset += self._EVENT.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if name:
+                names.append(os.fsdecode(name))
+        return names
+
+    def _scan(self, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            finished = []
+            sizes = {}
+            for entry in os.scandir(self.directory):
+                if entry.name in self._reported or not entry.is_file():
+                    continue
+                sizes[entry.name] = entry.stat().st_size
+                if self._sizes.get(entry.name) == sizes[entry.name]:
+                    finished.append(entry.name)
+            self._sizes = sizes
+            self._reported.update(finished)
+            if finished:
+                return finished
+            if deadline is not None and time.monotonic() >= deadline:
+                return []
+            time.sleep(self.poll_interval if deadline is None
+                       else max(0.0, min(self.poll_interval, deadline - time.monotonic())))
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+def render_printed_pdf(source, pdf_path, output_root=None, **converter_options):
+    """
+    Move a printed PDF into the output root and render its pages.
+
+    The PDF becomes ``<output_root>/<name>.pdf`` rather than a sibling of the
+    source, which would overwrite the source when a PDF was printed.
+
+    Args:
+        source (str): The file that was printed.
+        pdf_path (str): The PDF cups-pdf produced for it.
+        output_root (str, optional): The directory receiving ``<name>.pdf`` and ``<name>/slide-NNNN.png``.
+            Defaults to ``images`` beside the source.
+        **converter_options: Extra keyword arguments forwarded to PPTConverter (backend, dpi, ...).
+
+    Returns:
+        PPTConverter: The converter, with per-page results in ``page_stats``.
+    """
+    from converter import PPTConverter
+
+    name = os.path.splitext(os.path.basename(source))[0]
+    output_root = output_root or os.path.join(os.path.dirname(os.path.abspath(source)), 'images')
+    converter = PPTConverter(source, os.path.join(output_root, name), **converter_options)
+    converter.pdf_path = os.path.join(output_root, f"{name}.pdf")
+    os.makedirs(converter.output_dir, exist_ok=True)
+    shutil.move(pdf_path, converter.pdf_path)
+    converter.process_pdf_pages()
+    return converter
+
+
+class PrintQueue:
+    def __init__(self, outfile_dir=None, config_file=CUPS_PDF_CONFIG, printer='CUPS-PDF', max_in_flight=4,
+                 job_timeout=300, lp_command='lp', render_workers=1):
+        """
+        Print many files to CUPS-PDF and act on each PDF as soon as it lands.
+
+        At most ``max_in_flight`` jobs are queued in CUPS at once. Each job is
+        titled with a unique token, which cups-pdf carries into the output
+        file name, so PDFs are matched to their source files however the
+        spooler orders them; the CUPS job ID reported by ``lp`` is kept for
+        cancelling jobs that never produce a PDF.
+
+        Args:
+            outfile_dir (str, optional): The cups-pdf output directory. Defaults to the one in config_file.
+            config_file (str, optional): The cups-pdf configuration file. Defaults to /etc/cups/cups-pdf.conf.
+            printer (str, optional): The CUPS queue name. Defaults to 'CUPS-PDF'.
+            max_in_flight (int, optional): Jobs submitted but not yet landed. Defaults to 4.
+            job_timeout (float, optional): Seconds a job may take to land before it is cancelled. Defaults to 300.
+            lp_command (str, optional): The ``lp`` executable. Defaults to 'lp'.
+            render_workers (int, optional): PDFs handled at once while printing continues. Defaults to 1.
+        """
+        self.outfile_dir = outfile_dir or read_outfile(config_file)
+        self.printer = printer
+        self.max_in_flight = max(1, max_in_flight)
+        self.job_timeout = job_timeout
+        self.lp_command = lp_command
+        self.render_workers = max(1, render_workers)
+
+    @staticmethod
+    def _title(source, token):
+        # cups-pdf replaces unusual characters in titles, so keep the title plain.
+        return f"{token}-{re.sub(r'[^A-Za-z0-9_-]+', '_', os.path.splitext(os.path.basename(source))[0])}"
+
+    def submit(self, source):
+        """
+        Queue one file on the printer.
+
+        Args:
+            source (str): The file to print.
+
+        Returns:
+            PrintJob: The submitted job.
+
+        Raises:
+            subprocess.CalledProcessError: If ``lp`` fails.
+        """
+        token = f"pq{uuid.uuid4().hex[:12]}"
+        try:
+            completed = subprocess.run([self.lp_command, '-d', self.printer, '-t', self._title(source, token),
+                                        source], check=True, capture_output=True, text=True)
+        except subprocess.CalledProcessError as e:
+            print(f"Error printing file {source}: {e.stderr.strip() or e}")
+            raise
+        match = re.search(r'request id is (\S+)', completed.stdout)
+        job = PrintJob(source, token, match.group(1) if match else None, time.monotonic())
+        print(f"Sent '{source}' to {self.printer} as job {job.job_id or token}")
+        return job
+
+    def _cancel(self, job):
+        if job.job_id is None:
+            return
+        try:
+            subprocess.run(['cancel', job.job_id], capture_output=True, check=False)
+        except OSError:
+            pass
+
+    def run(self, sources, on_pdf=None, metrics=None, **converter_options):
+        """
+        Print every file and hand each finished PDF to on_pdf.
+
+        Args:
+            sources (iterable): The files to print.
+            on_pdf (callable, optional): Called as ``on_pdf(source, pdf_path)`` on a worker thread while
+                printing continues. Defaults to ``render_printed_pdf`` with converter_options.
+            metrics (Metrics, optional): Receives a ``cups_print`` timer per landed job. Defaults to None.
+            **converter_options: Extra keyword arguments for the default on_pdf.
+
+        Returns:
+            dict: A mapping of each source to on_pdf's return value, or to the exception that stopped it.
+        """
+        if on_pdf is None:
+            def on_pdf(source, pdf_path):
+                return render_printed_pdf(source, pdf_path, **converter_options)
+        os.makedirs(self.outfile_dir, exist_ok=True)
+        pending = deque(sources)
+        in_flight = {}
+        results = {}
+        futures = {}
+        # Watch before submitting, so no PDF can land unseen.
+        watcher = DirectoryWatcher(self.outfile_dir)
+        try:
+            with ThreadPoolExecutor(max_workers=self.render_workers) as executor:
+                while pending or in_flight:
+                    while pending and len(in_flight) < self.max_in_flight:
+                        source = pending.popleft()
+                        try:
+                            job = self.submit(source)
+                        except Exception as e:
+                            results[source] = e
+                            continue
+                        in_flight[job.token] = job
+                    if not in_flight:
+                        continue
+
+                    oldest = min(job.submitted for job in in_flight.values())
+                    for name in watcher.wait(max(0.0, oldest + self.job_timeout - time.monotonic())):
+                        if not name.lower().endswith('.pdf'):
+                            continue
+                        token = next((token for token in in_flight if token in name), None)
+                        if token is None:
+                            continue
+                        job = in_flight.pop(token)
+                        if metrics is not None:
+                            metrics.observe('cups_print', (time.monotonic() - job.submitted) * 1000.0)
+                        print(f"Job {job.job_id or token} landed as {name}")
+                        futures[job.source] = executor.submit(on_pdf, job.source,
+                                                              os.path.join(self.outfile_dir, name))
+
+                    now = time.monotonic()
+                    for token, job in list(in_flight.items()):
+                        if now - job.submitted > self.job_timeout:
+                            print(f"Job {job.job_id or token} for {job.source} produced no PDF within "
+                                  f"{self.job_timeout:g}s; cancelling it")
+                            self._cancel(job)
+                            del in_flight[token]
+                            results[job.source] = TimeoutError(f"No PDF for {job.source}")
+                for source, future in futures.items():
+                    try:
+                        results[source] = future.result()
+                    except Exception as e:
+                        print(f"Error occurred while processing printed PDF of {source}: {e}")
+                        results[source] = e
+        finally:
+            watcher.close()
+        return results
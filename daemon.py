@@ -0,0 +1,365 @@
+import json
+import mimetypes
+import os
+import queue
+import shutil
+import signal
+import threading
+import time
+import uuid
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import Pool, cpu_count
+from urllib.parse import parse_qs, unquote, urlsplit
+from converter import PPTConverter, _init_render_worker
+from utils import FileUtils
+
+INPUT_EXTENSIONS = ('.pptx', '.pdf')
+
+
+def _init_daemon_worker():
+    # Ctrl-C stops the daemon from its main thread; workers that raise KeyboardInterrupt mid-page
+    # would only be replaced by the pool and block shutdown.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _init_render_worker()
+
+
+class ConversionDaemon:
+    def __init__(self, work_dir, office_pool=None, render_processes=None, concurrency=2, queue_size=16,
+                 job_ttl=3600, **converter_options):
+        """
+        Initialize a long-running converter that keeps its workers warm between jobs.
+
+        Submitted files are queued and converted by a fixed set of job
+        threads. All jobs share one render process pool, started once, and
+        the optional office pool, so a small deck costs only its own
+        conversion work rather than interpreter, library and soffice startup.
+
+        Args:
+            work_dir (str): The directory holding each job's upload and rendered pages.
+            office_pool (OfficePool, optional): Warm LibreOffice workers for PPTX jobs. Defaults to None,
+                which starts soffice per job.
+            render_processes (int, optional): Processes in the shared render pool. Defaults to the CPU count.
+            concurrency (int, optional): Jobs converted at once. Defaults to 2.
+            queue_size (int, optional): Jobs that may wait for a job thread before submissions are refused.
+                Defaults to 16.
+            job_ttl (float, optional): Seconds a finished job's files are kept. Defaults to 3600.
+            **converter_options: Extra keyword arguments forwarded to PPTConverter (backend, dpi, cache, ...).
+        """
+        self.work_dir = work_dir
+        self.office_pool = office_pool
+        self.render_processes = render_processes or cpu_count()
+        self.concurrency = max(1, concurrency)
+        self.job_ttl = job_ttl
+        self.converter_options = converter_options
+        self.jobs = {}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=queue_size)
+        FileUtils.create_directory_if_not_exists(work_dir)
+        # Start the render pool before any threads, so its workers fork from a single-threaded process.
+        self.render_pool = Pool(processes=self.render_processes, initializer=_init_daemon_worker)
+        self._threads = [threading.Thread(target=self._work, daemon=True) for _ in range(self.concurrency)]
+        for thread in self._threads:
+            thread.start()
+
+    def _job_dir(self, job_id):
+        return os.path.join(self.work_dir, job_id)
+
+    def submit(self, filename, stream, length):
+        """
+        Store an uploaded deck and queue it for conversion.
+
+        Args:
+            filename (str): The original file name; its extension selects PPTX or PDF handling.
+            stream (file): A binary stream the upload is read from.
+            length (int): The number of bytes to read from stream.
+
+        Returns:
+            dict: The new job's status.
+
+        Raises:
+            ValueError: If the file is neither a PPTX nor a PDF.
+            queue.Full: If the job queue is full.
+        """
+        extension = os.path.splitext(filename)[1].lower()
+        if extension not in INPUT_EXTENSIONS:
+            raise ValueError(f"Unsupported file type {extension!r}; expected one of {INPUT_EXTENSIONS}")
+        self._prune()
+        job_id = uuid.uuid4().hex
+        job_dir = self._job_dir(job_id)
+        FileUtils.create_directory_if_not_exists(job_dir)
+        input_path = os.path.join(job_dir, f"input{extension}")
+        try:
+            with open(input_path, 'wb') as f:
+                remaining = length
+                while remaining > 0:
+                    block = stream.read(min(remaining, 1024 * 1024))
+                    if not block:
+                        raise ValueError(f"Upload ended after {length - remaining} of {length} bytes")
+                    f.write(block)
+                    remaining -= len(block)
+            job = {'id': job_id, 'filename': filename, 'status': 'queued', 'error': None, 'pages': [],
+                   'submitted': time.time(), 'finished': None}
+            with self._lock:
+                self.jobs[job_id] = job
+            self._queue.put_nowait(job_id)
+        except BaseException:
+            with self._lock:
+                self.jobs.pop(job_id, None)
+            shutil.rmtree(job_dir, ignore_errors=True)
+            raise
+        return self.status(job_id)
+
+    def status(self, job_id):
+        """
+        Get a copy of a job's status.
+
+        Args:
+            job_id (str): The job ID.
+
+        Returns:
+            dict: The status, or None if the job does not exist.
+        """
+        with self._lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def page_path(self, job_id, name):
+        """
+        Resolve a rendered page of a finished job to its file.
+
+        Args:
+            job_id (str): The job ID.
+            name (str): The page's path as listed in the job status.
+
+        Returns:
+            str: The file path, or None if the job has no such page.
+        """
+        job = self.status(job_id)
+        if job is None or name not in job['pages']:
+            return None
+        return os.path.join(self._job_dir(job_id), 'images', name)
+
+    def delete(self, job_id):
+        """
+        Forget a finished job and remove its files.
+
+        Args:
+            job_id (str): The job ID.
+
+        Returns:
+            bool: True if the job was removed, False if it does not exist or is still running.
+        """
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None or job['finished'] is None:
+                return False
+            del self.jobs[job_id]
+        shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
+        return True
+
+    def _prune(self):
+        cutoff = time.time() - self.job_ttl
+        with self._lock:
+            expired = [job_id for job_id, job in self.jobs.items()
+                       if job['finished'] is not None and job['finished'] < cutoff]
+        for job_id in expired:
+            self.delete(job_id)
+
+    def _set(self, job_id, **fields):
+        with self._lock:
+            self.jobs[job_id].update(fields)
+
+    def _work(self):
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                break
+            job = self.status(job_id)
+            output_dir = os.path.join(self._job_dir(job_id), 'images')
+            input_path = os.path.join(self._job_dir(job_id), 'input' + os.path.splitext(job['filename'])[1].lower())
+            converter = PPTConverter(input_path, output_dir, num_processes=self.render_processes,
+                                     office_pool=self.office_pool, render_pool=self.render_pool,
+                                     **self.converter_options)
+            try:
+                if input_path != converter.pdf_path:
+                    self._set(job_id, status='converting')
+                    converter.ppt_to_pdf()
+                    if not FileUtils.check_file_exists(converter.pdf_path):
+                        raise FileNotFoundError(converter.pdf_path)
+                self._set(job_id, status='rendering')
+                converter.process_pdf_pages()
+                pages = sorted(os.path.relpath(os.path.join(dirpath, name), output_dir).replace(os.sep, '/')
+                               for dirpath, _, names in os.walk(output_dir)
+                               for name in names if not name.startswith('.'))
+                self._set(job_id, status='done', pages=pages, finished=time.time())
+            except Exception as e:
+                print(f"Error occurred while processing job {job_id}: {e}")
+                self._set(job_id, status='failed', error=str(e), finished=time.time())
+            finally:
+                converter.metrics.flush()
+
+    def close(self):
+        """
+        Finish queued jobs, then stop the job threads and the render pool.
+        """
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self.render_pool.close()
+        self.render_pool.join()
+
+
+class _DaemonRequestHandler(BaseHTTPRequestHandler):
+    daemon = None
+    max_upload_bytes = 512 * 1024 * 1024
+
+    def _send_json(self, code, body, headers=()):
+        data = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _route(self):
+        parts = [unquote(part) for part in urlsplit(self.path).path.strip('/').split('/')]
+        return parts if parts != [''] else []
+
+    def do_POST(self):
+        if self._route() != ['jobs']:
+            return self._send_json(404, {'error': 'not found'})
+        query = parse_qs(urlsplit(self.path).query)
+        filename = query.get('filename', [''])[0]
+        length = int(self.headers.get('Content-Length') or 0)
+        if length <= 0:
+            return self._send_json(411, {'error': 'Content-Length with the file size is required'})
+        if length > self.max_upload_bytes:
+            return self._send_json(413, {'error': f'upload larger than {self.max_upload_bytes} bytes'})
+        try:
+            job = self.daemon.submit(filename, self.rfile, length)
+        except ValueError as e:
+            self.close_connection = True
+            return self._send_json(400, {'error': str(e)})
+        except queue.Full:
+            return self._send_json(503, {'error': 'job queue is full'}, [('Retry-After', '5')])
+        self._send_json(202, job, [('Location', f"/jobs/{job['id']}")])
+
+    def do_GET(self):
+        route = self._route()
+        if route == ['health']:
+            return self._send_json(200, {'status': 'ok', 'queued': self.daemon._queue.qsize()})
+        if len(route) == 2 and route[0] == 'jobs':
+            job = self.daemon.status(route[1])
+            return self._send_json(200, job) if job else self._send_json(404, {'error': 'unknown job'})
+        if len(route) >= 4 and route[0] == 'jobs' and route[2] == 'pages':
+            path = self.daemon.page_path(route[1], '/'.join(route[3:]))
+            if path is None or not os.path.isfile(path):
+                return self._send_json(404, {'error': 'unknown page'})
+            with open(path, 'rb') as f:
+                self.send_response(200)
+                self.send_header('Content-Type', mimetypes.guess_type(path)[0] or 'application/octet-stream')
+                self.send_header('Content-Length', str(os.fstat(f.fileno()).st_size))
+                self.end_headers()
+                shutil.copyfileobj(f, self.wfile)
+            return
+        self._send_json(404, {'error': 'not found'})
+
+    def do_DELETE(self):
+        route = self._route()
+        if len(route) != 2 or route[0] != 'jobs':
+            return self._send_json(404, {'error': 'not found'})
+        if self.daemon.delete(route[1]):
+            return self._send_json(200, {'id': route[1], 'deleted': True})
+        if self.daemon.status(route[1]) is None:
+            return self._send_json(404, {'error': 'unknown job'})
+        self._send_json(409, {'error': 'job is still running'})
+
+
+def serve(daemon, host='127.0.0.1', port=8765, max_upload_bytes=None):
+    """
+    Serve the daemon's HTTP API until interrupted or sent SIGTERM.
+
+    Endpoints:
+        ``POST /jobs?filename=deck.pptx`` with the file as the request body queues a job (202).
+        ``GET /jobs/<id>`` returns its status and, once done, the list of rendered pages.
+        ``GET /jobs/<id>/pages/<page>`` returns a rendered page.
+        ``DELETE /jobs/<id>`` removes a finished job and its files.
+        ``GET /health`` reports liveness and the queue length.
+
+    Args:
+        daemon (ConversionDaemon): The daemon serving the jobs.
+        host (str, optional): The address to bind. Defaults to '127.0.0.1'.
+        port (int, optional): The port to bind. Defaults to 8765.
+        max_upload_bytes (int, optional): The largest accepted upload. Defaults to 512 MiB.
+    """
+    handler = type('DaemonRequestHandler', (_DaemonRequestHandler,), {
+        'daemon': daemon,
+        'max_upload_bytes': max_upload_bytes or _DaemonRequestHandler.max_upload_bytes,
+    })
+    with ThreadingHTTPServer((host, port), handler) as server:
+        if threading.current_thread() is threading.main_thread():
+            # Stop cleanly under service managers, which send SIGTERM rather than SIGINT.
+            signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.shutdown).start())
+        print(f"Serving conversions on http://{host}:{server.server_port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from cache import ConversionCache
+    from encoders import ImageEncoder
+    from office_pool import OfficePool
+    from renderers import RENDERERS
+
+    parser = argparse.ArgumentParser(description="Run a local HTTP daemon that converts PPTX and PDF files to images.")
+    parser.add_argument("work_dir", help="Directory for uploaded files and rendered pages")
+    parser.add_argument("--host", default='127.0.0.1', help="Address to bind (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="Port to bind (default: 8765)")
+    parser.add_argument("--jobs", type=int, default=2, help="Jobs converted at once (default: 2)")
+    parser.add_argument("--queue-size", type=int, default=16,
+                        help="Jobs waiting before submissions get 503 (default: 16)")
+    parser.add_argument("--job-ttl", type=float, default=3600,
+                        help="Seconds finished jobs are kept (default: 3600)")
+    parser.add_argument("--max-upload-mb", type=int, default=512, help="Largest accepted upload (default: 512)")
+    parser.add_argument("--render-processes", type=int, help="Size of the shared render pool (default: CPU count)")
+    parser.add_argument("--office-workers", type=int, default=1,
+                        help="Number of warm LibreOffice workers to keep running (0 starts soffice per job)")
+    parser.add_argument("--office-max-jobs", type=int, default=200,
+                        help="Conversions after which a warm LibreOffice worker is restarted")
+    parser.add_argument("--backend", choices=sorted(RENDERERS), default='pymupdf',
+                        help="Rasterization backend (default: pymupdf)")
+    parser.add_argument("--dpi", type=int, default=200, help="Rendering resolution in DPI (default: 200)")
+    parser.add_argument("--format", choices=sorted(ImageEncoder.FORMATS), default='png',
+                        help="Output image format (default: png)")
+    parser.add_argument("--quality", type=int, default=90, help="JPEG/WebP quality (default: 90)")
+    parser.add_argument("--cache-dir", help="Directory of a conversion cache used to skip unchanged decks")
+    parser.add_argument("--cache-max-mb", type=int, default=10240,
+                        help="Size cap of the conversion cache in MiB before LRU eviction (default: 10240)")
+    args = parser.parse_args()
+
+    options = dict(backend=args.backend, dpi=args.dpi, encoder=ImageEncoder(args.format, quality=args.quality))
+    if args.cache_dir:
+        options['cache'] = ConversionCache(args.cache_dir, max_bytes=args.cache_max_mb * 1024 * 1024)
+    office_pool = None
+    if args.office_workers > 0 and OfficePool.is_available():
+        office_pool = OfficePool(size=args.office_workers, max_jobs_per_worker=args.office_max_jobs)
+    elif args.office_workers > 0:
+        print("LibreOffice UNO bindings not available; starting soffice per job.")
+
+    conversion_daemon = ConversionDaemon(args.work_dir, office_pool=office_pool,
+                                         render_processes=args.render_processes, concurrency=args.jobs,
+                                         queue_size=args.queue_size, job_ttl=args.job_ttl, **options)
+    try:
+        serve(conversion_daemon, host=args.host, port=args.port, max_upload_bytes=args.max_upload_mb * 1024 * 1024)
+    finally:
+        conversion_daemon.close()
+        if office_pool is not None:
+            office_pool.close()
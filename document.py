@@ -0,0 +1,201 @@
+import json
+import os
+import sqlite3
+import uuid
+
+import fitz
+
+from fingerprint import fingerprint_document
+
+TEXT_INDEX_FORMATS = {
+    'json': 'slides-index.json',
+    'sqlite': 'slides-index.sqlite',
+}
+
+
+def page_text(textpage):
+    """
+    Get a page's text and its likely title from a PyMuPDF text page.
+
+    The title is the run of lines set in the largest font on the page, taken
+    from the first block that uses it, which is what slide titles look like
+    once exported to PDF.
+
+    Args:
+        textpage (fitz.TextPage): The page's extracted text.
+
+    Returns:
+        dict: ``{'title': str, 'text': str}``.
+    """
+    title_size, title_lines = 0.0, []
+    for block in textpage.extractDICT()['blocks']:
+        if block.get('type') != 0:
+            continue
+        block_lines = []
+        for line in block['lines']:
+            text = ''.join(span['text'] for span in line['spans']).strip()
+            if text:
+                block_lines.append((max(span['size'] for span in line['spans']), text))
+        if not block_lines:
+            continue
+        size = max(size for size, _ in block_lines)
+        if size > title_size + 0.5:
+            title_size = size
+            title_lines = [text for line_size, text in block_lines if line_size >= size - 0.5]
+    return {'title': ' '.join(title_lines), 'text': textpage.extractText().strip()}
+
+
+class DocumentSession:
+    def __init__(self, pdf_path):
+        """
+        Open a PDF once and answer every question the converter asks of it.
+
+        Page count, page sizes, metadata, fingerprints and text all come from
+        the same open document instead of each call site parsing the file
+        again. Results are computed on first use and kept.
+
+        Args:
+            pdf_path (str): The path to the PDF file.
+        """
+        self.pdf_path = pdf_path
+        self.document = fitz.open(pdf_path)
+        self._layout = None
+        self._fingerprints = None
+
+    @property
+    def page_count(self):
+        return self.document.page_count
+
+    @property
+    def metadata(self):
+        """
+        dict: The document's title, author and other information entries that are set.
+        """
+        return {key: value for key, value in (self.document.metadata or {}).items()
+                if value and key not in ('format', 'encryption')}
+
+    def layout(self):
+        """
+        Get the number of pages and the largest page size.
+
+        Returns:
+            tuple: ``(page_count, width, height)`` with sizes in PDF points.
+        """
+        if self._layout is None:
+            width = height = 0.0
+            for page in self.document:
+                width = max(width, page.rect.width)
+                height = max(height, page.rect.height)
+            self._layout = (self.document.page_count, width, height)
+        return self._layout
+
+    def fingerprints(self):
+        """
+        Get the content fingerprint of every page, as ``fingerprint.fingerprint_pages`` computes it.
+
+        Returns:
+            list: One hex digest per page, in page order.
+        """
+        if self._fingerprints is None:
+            self._fingerprints = fingerprint_document(self.document)
+        return self._fingerprints
+
+    def page_text(self, page_number):
+        """
+        Extract a page's text and title.
+
+        Args:
+            page_number (int): The 1-based page number.
+
+        Returns:
+            dict: ``{'title': str, 'text': str}``.
+        """
+        return page_text(self.document.load_page(page_number - 1).get_textpage())
+
+    def close(self):
+        self.document.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def load_text_index(output_dir):
+    """
+    Load the page texts of a previous run, keyed by page fingerprint.
+
+    Args:
+        output_dir (str): The directory holding the rendered slides.
+
+    Returns:
+        dict: A mapping of fingerprint to ``{'title': str, 'text': str}``; empty if there is no readable index.
+    """
+    entries = {}
+    json_path = os.path.join(output_dir, TEXT_INDEX_FORMATS['json'])
+    sqlite_path = os.path.join(output_dir, TEXT_INDEX_FORMATS['sqlite'])
+    try:
+        if os.path.isfile(json_path):
+            with open(json_path) as f:
+                for page in json.load(f)['pages']:
+                    if page.get('fingerprint'):
+                        entries[page['fingerprint']] = {'title': page['title'], 'text': page['text']}
+        elif os.path.isfile(sqlite_path):
+            with sqlite3.connect(sqlite_path) as connection:
+                for fingerprint, title, text in connection.execute('SELECT fingerprint, title, text FROM pages'):
+                    if fingerprint:
+                        entries[fingerprint] = {'title': title, 'text': text}
+    except (OSError, ValueError, KeyError, sqlite3.Error):
+        return {}
+    return entries
+
+
+def save_text_index(output_dir, index_format, deck, metadata, pages):
+    """
+    Atomically write the searchable page text index next to the slides.
+
+    The SQLite index has a ``pages`` table and, where SQLite supports it, an
+    FTS5 table ``pages_fts`` for full-text search over titles and text.
+
+    Args:
+        output_dir (str): The directory holding the rendered slides.
+        index_format (str): 'json' or 'sqlite'.
+        deck (str): The deck name.
+        metadata (dict): The document metadata.
+        pages (list): Dicts with ``page``, ``title``, ``text`` and ``fingerprint`` keys, in page order.
+
+    Returns:
+        str: The path of the index.
+
+    Raises:
+        ValueError: If the format is unknown.
+    """
+    if index_format not in TEXT_INDEX_FORMATS:
+        raise ValueError(f"Unknown text index format {index_format!r}; expected one of {sorted(TEXT_INDEX_FORMATS)}")
+    index_path = os.path.join(output_dir, TEXT_INDEX_FORMATS[index_format])
+    tmp_path = f"{index_path}.{uuid.uuid4().hex}.tmp"
+    if index_format == 'json':
+        with open(tmp_path, 'w') as f:
+            json.dump({'deck': deck, 'metadata': metadata, 'pages': pages}, f, ensure_ascii=False,
+                      separators=(',', ':'))
+    else:
+        connection = sqlite3.connect(tmp_path)
+        try:
+            with connection:
+                connection.execute('CREATE TABLE deck (key TEXT PRIMARY KEY, value TEXT)')
+                connection.executemany('INSERT INTO deck VALUES (?, ?)',
+                                       [('name', deck)] + [(key, str(value)) for key, value in metadata.items()])
+                connection.execute('CREATE TABLE pages (page INTEGER PRIMARY KEY, title TEXT, text TEXT, '
+                                   'fingerprint TEXT)')
+                connection.executemany('INSERT INTO pages VALUES (:page, :title, :text, :fingerprint)', pages)
+                try:
+                    connection.execute("CREATE VIRTUAL TABLE pages_fts USING fts5(title, text, content='pages', "
+                                       "content_rowid='page')")
+                    connection.execute("INSERT INTO pages_fts(pages_fts) VALUES ('rebuild')")
+                except sqlite3.OperationalError:
+                    pass
+        finally:
+            connection.close()
+    os.replace(tmp_path, index_path)
+    return index_path
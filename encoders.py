@@ -0,0 +1,312 @@
+import io
+import os
+import struct
+import threading
+import time
+import zlib
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+EncodeResult = namedtuple('EncodeResult', [
+    'page_number', 'path', 'bytes_written', 'encode_ms', 'render_ms', 'phash', 'text', 'data',
+], defaults=(None, None, None, None))
+
+# One rendition of every page: written to ``output_dir/<name>``, scaled so
+# its longest edge is at most ``max_size`` pixels (None keeps the rendered
+# size) and encoded with ``encoder``. An empty name writes into output_dir.
+OutputSpec = namedtuple('OutputSpec', ['name', 'max_size', 'encoder'])
+
+
+def parse_output_spec(text):
+    """
+    Parse an output specification of the form ``name:max_px:format``.
+
+    Args:
+        text (str): For example ``'preview:1024:jpeg'``; a max_px of 0 keeps the rendered size.
+
+    Returns:
+        OutputSpec: The parsed specification.
+
+    Raises:
+        ValueError: If the text is malformed.
+    """
+    try:
+        name, max_size, image_format = text.split(':')
+        max_size = int(max_size)
+    except ValueError:
+        raise ValueError(f"Invalid output {text!r}; expected name:max_px:format")
+    return OutputSpec(name, max_size or None, ImageEncoder(image_format))
+
+
+def derive_renditions(image, outputs):
+    """
+    Scale one rendered page into every requested output size.
+
+    Outputs are produced from largest to smallest, each downscaled from the
+    previous one, so every rendition after the first works on an already
+    reduced image.
+
+    Args:
+        image (PIL.Image.Image): The page rendered at full resolution.
+        outputs (list): OutputSpec tuples.
+
+    Yields:
+        tuple: ``(OutputSpec, PIL.Image.Image)`` for every output.
+    """
+    def target(spec):
+        return spec.max_size or max(image.size)
+
+    source = image
+    for spec in sorted(outputs, key=target, reverse=True):
+        scale = target(spec) / max(source.size)
+        if scale < 1:
+            size = (max(1, round(source.width * scale)), max(1, round(source.height * scale)))
+            source = source.resize(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+        yield spec, source
+
+
+class ImageEncoder:
+    FORMATS = {
+        'png': ('PNG', '.png'),
+        'jpeg': ('JPEG', '.jpg'),
+        'webp': ('WEBP', '.webp'),
+    }
+
+    def __init__(self, image_format='png', quality=90, compress_level=6, optimize=False):
+        """
+        Initialize an encoder that turns rendered pages into image bytes.
+
+        Args:
+            image_format (str, optional): 'png', 'jpeg' or 'webp'. Defaults to 'png'.
+            quality (int, optional): The JPEG/WebP quality, 1-100. Defaults to 90.
+            compress_level (int, optional): The PNG zlib level, 0-9. Lower is faster and larger. Defaults to 6.
+            optimize (bool, optional): Spend extra CPU for smaller PNG/JPEG output. Defaults to False.
+
+        Raises:
+            ValueError: If the format is not supported.
+        """
+        image_format = image_format.lower()
+        if image_format == 'jpg':
+            image_format = 'jpeg'
+        if image_format not in self.FORMATS:
+            raise ValueError(f"Unsupported image format {image_format!r}; expected one of {sorted(self.FORMATS)}")
+        self.image_format = image_format
+        self.quality = quality
+        self.compress_level = compress_level
+        self.optimize = optimize
+
+    @property
+    def pil_format(self):
+        return self.FORMATS[self.image_format][0]
+
+    @property
+    def extension(self):
+        return self.FORMATS[self.image_format][1]
+
+    @property
+    def settings(self):
+        """
+        dict: The options that affect the encoded bytes, used in cache keys and manifests.
+        """
+        if self.image_format == 'png':
+            return {'format': 'png', 'compress_level': self.compress_level, 'optimize': self.optimize}
+        return {'format': self.image_format, 'quality': self.quality, 'optimize': self.optimize}
+
+    def _save_options(self):
+        if self.image_format == 'png':
+            return {'compress_level': self.compress_level, 'optimize': self.optimize}
+        if self.image_format == 'jpeg':
+            return {'quality': self.quality, 'optimize': self.optimize}
+        return {'quality': self.quality, 'method': 6 if self.optimize else 4}
+
+    def encode(self, image):
+        """
+        Encode an image to bytes.
+
+        Args:
+            image (PIL.Image.Image): The rendered page.
+
+        Returns:
+            bytes: The encoded image.
+        """
+        buffer = io.BytesIO()
+        image.save(buffer, self.pil_format, **self._save_options())
+        return buffer.getvalue()
+
+    def save(self, image, path):
+        """
+        Encode an image into a file.
+
+        The file is written beside the target and renamed into place, so a
+        slide hard-linked from the cache is replaced, never truncated.
+
+        Args:
+            image (PIL.Image.Image): The rendered page.
+            path (str): The destination path.
+
+        Returns:
+            tuple: ``(bytes_written, encode_ms)``.
+        """
+        start = time.perf_counter()
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        image.save(tmp_path, self.pil_format, **self._save_options())
+        os.replace(tmp_path, path)
+        return os.path.getsize(path), (time.perf_counter() - start) * 1000.0
+
+
+class StreamingPNGWriter:
+    IDAT_SIZE = 256 * 1024
+
+    def __init__(self, path, width, height, compress_level=6):
+        """
+        Write an RGB PNG incrementally from bands of rows.
+
+        Rows are deflated as they arrive and flushed in IDAT chunks, so the
+        full image never has to exist in memory. The file is written beside
+        the target and renamed into place on close.
+
+        Args:
+            path (str): The destination path.
+            width (int): The image width in pixels.
+            height (int): The image height in pixels.
+            compress_level (int, optional): The zlib level, 0-9. Defaults to 6.
+        """
+        self.path = path
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+        self._tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        self._file = open(self._tmp_path, 'wb')
+        self._compressor = zlib.compressobj(compress_level)
+        self._pending = bytearray()
+        self._file.write(b'\x89PNG\r\n\x1a\n')
+        self._write_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+
+    def _write_chunk(self, chunk_type, data):
+        self._file.write(struct.pack('>I', len(data)))
+        self._file.write(chunk_type)
+        self._file.write(data)
+        self._file.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(chunk_type)) & 0xffffffff))
+
+    def write_rows(self, band):
+        """
+        Append packed RGB rows.
+
+        Args:
+            band (bytes): One or more rows of ``width * 3`` bytes each.
+        """
+        row_bytes = self.width * 3
+        for start in range(0, len(band), row_bytes):
+            # Filter type 0 (None) per row keeps compression streaming and deterministic.
+            self._pending += self._compressor.compress(b'\x00' + band[start:start + row_bytes])
+            self.rows_written += 1
+        if len(self._pending) >= self.IDAT_SIZE:
+            self._write_chunk(b'IDAT', bytes(self._pending))
+            self._pending.clear()
+
+    def close(self):
+        """
+        Finish the image and move it into place.
+
+        Returns:
+            int: The number of bytes written.
+
+        Raises:
+            ValueError: If fewer or more rows were written than the image height.
+        """
+        try:
+            if self.rows_written != self.height:
+                raise ValueError(f"Expected {self.height} rows for {self.path}, got {self.rows_written}")
+            self._pending += self._compressor.flush()
+            self._write_chunk(b'IDAT', bytes(self._pending))
+            self._write_chunk(b'IEND', b'')
+            self._file.close()
+            os.replace(self._tmp_path, self.path)
+        except Exception:
+            self._file.close()
+            if os.path.exists(self._tmp_path):
+                os.remove(self._tmp_path)
+            raise
+        return os.path.getsize(self.path)
+
+
+class EncoderStage:
+    def __init__(self, encoder, max_workers=2, max_pending=None, in_memory=False):
+        """
+        Initialize a thread pool that encodes pages while the next ones render.
+
+        Pillow releases the GIL while compressing, so encoding on threads
+        overlaps with rasterization in the same process. At most
+        ``max_pending`` images wait for or undergo encoding, which bounds the
+        memory held by decoded pages.
+
+        Args:
+            encoder (ImageEncoder): The encoder to use.
+            max_workers (int, optional): The number of encoding threads. Defaults to 2.
+            max_pending (int, optional): The number of images queued or encoding at once. Defaults to twice
+                max_workers.
+            in_memory (bool, optional): Return the encoded bytes in each result's ``data`` instead of writing
+                files; paths are then only names. Defaults to False.
+        """
+        self.encoder = encoder
+        self.in_memory = in_memory
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+        self._slots = threading.BoundedSemaphore(max_pending or 2 * max(1, max_workers))
+        self._futures = []
+
+    def _encode(self, page_number, image, path, encoder, render_ms):
+        try:
+            if self.in_memory:
+                start = time.perf_counter()
+                data = encoder.encode(image)
+                return EncodeResult(page_number, path, len(data), (time.perf_counter() - start) * 1000.0,
+                                    render_ms, data=data)
+            bytes_written, encode_ms = encoder.save(image, path)
+        finally:
+            self._slots.release()
+        print(f"Saved {path}")
+        return EncodeResult(page_number, path, bytes_written, encode_ms, render_ms)
+
+    def submit(self, page_number, image, path, encoder=None, render_ms=None):
+        """
+        Queue an image for encoding, blocking while too many are pending.
+
+        Args:
+            page_number (int): The 1-based page number.
+            image (PIL.Image.Image): The rendered page.
+            path (str): The destination path.
+            encoder (ImageEncoder, optional): Overrides the stage's encoder for this image. Defaults to None.
+            render_ms (float, optional): The time spent rendering the image, carried into its result. Defaults to None.
+        """
+        self._slots.acquire()
+        try:
+            self._futures.append(self._executor.submit(self._encode, page_number, image, path,
+                                                       encoder or self.encoder, render_ms))
+        except Exception:
+            self._slots.release()
+            raise
+
+    def results(self):
+        """
+        Wait for every queued image and return the per-page results.
+
+        Returns:
+            list: EncodeResult tuples in submission order.
+
+        Raises:
+            Exception: The first error raised while encoding.
+        """
+        futures, self._futures = self._futures, []
+        return [future.result() for future in futures]
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
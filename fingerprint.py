@@ -0,0 +1,264 @@
+import hashlib
+import json
+import os
+import re
+import uuid
+
+import fitz
+
+from PIL import Image
+
+_REFERENCE = re.compile(rb'(\d+) 0 R')
+_PARENT = re.compile(rb'/Parent\s+\d+ 0 R')
+
+MANIFEST_NAME = '.slides-manifest.json'
+DUPLICATES_NAME = '.slides-duplicates.json'
+
+
+class _ObjectHasher:
+    def __init__(self, document):
+        self.document = document
+        self._hashes = {}
+        self._in_progress = set()
+        # Annotations point back at their page and links at other pages; those references are not followed.
+        self._page_xrefs = {document.page_xref(n) for n in range(document.page_count)}
+
+    def hash_xref(self, xref):
+        """
+        Hash a PDF object together with everything it references.
+
+        References are replaced by the hash of the referenced object rather
+        than its object number, so a page keeps its fingerprint when another
+        slide is inserted before it and every object number shifts.
+        """
+        if xref in self._page_xrefs:
+            return b'page'
+        cached = self._hashes.get(xref)
+        if cached is not None:
+            return cached
+        if xref in self._in_progress:
+            return b'cycle'
+        self._in_progress.add(xref)
+        try:
+            source = _PARENT.sub(b'', self.document.xref_object(xref, compressed=True).encode('latin-1'))
+            digest = hashlib.sha256(_REFERENCE.sub(lambda m: self.hash_xref(int(m.group(1))).hex().encode(), source))
+            if self.document.xref_is_stream(xref):
+                digest.update(self.document.xref_stream_raw(xref) or b'')
+        finally:
+            self._in_progress.discard(xref)
+        self._hashes[xref] = digest.digest()
+        return self._hashes[xref]
+
+    def hash_key(self, page, key):
+        kind, value = self.document.xref_get_key(page.xref, key)
+        if kind == 'xref':
+            return self.hash_xref(int(value.split()[0]))
+        return hashlib.sha256(
+            _REFERENCE.sub(lambda m: self.hash_xref(int(m.group(1))).hex().encode(), value.encode('latin-1'))
+        ).digest()
+
+
+def fingerprint_pages(pdf_path):
+    """
+    Fingerprint every page of a PDF by what it draws.
+
+    A page's fingerprint covers its size, rotation, content stream, the
+    resources it references (fonts, images, forms) and its annotations with
+    their appearance streams, hashed independently of object numbering.
+
+    Args:
+        pdf_path (str): The path to the PDF file.
+
+    Returns:
+        list: One hex digest per page, in page order.
+    """
+    with fitz.open(pdf_path) as document:
+        return fingerprint_document(document)
+
+
+def fingerprint_document(document):
+    """
+    Fingerprint every page of an open PDF, as ``fingerprint_pages`` does.
+
+    Args:
+        document (fitz.Document): The open document.
+
+    Returns:
+        list: One hex digest per page, in page order.
+    """
+    hasher = _ObjectHasher(document)
+    fingerprints = []
+    for page in document:
+        digest = hashlib.sha256()
+        digest.update(f"{tuple(page.rect)}/{page.rotation}".encode())
+        digest.update(page.read_contents())
+        digest.update(hasher.hash_key(page, 'Resources'))
+        digest.update(hasher.hash_key(page, 'Annots'))
+        fingerprints.append(digest.hexdigest())
+    return fingerprints
+
+
+def load_manifest(output_dir):
+    """
+    Load the page manifest written by a previous run.
+
+    Args:
+        output_dir (str): The directory holding the rendered slides.
+
+    Returns:
+        dict: The manifest with ``settings`` and ``pages`` keys, or None if there is no readable manifest.
+    """
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_manifest(output_dir, settings, fingerprints):
+    """
+    Atomically write the page manifest for the slides in ``output_dir``.
+
+    Args:
+        output_dir (str): The directory holding the rendered slides.
+        settings (dict): The render settings the slides were produced with.
+        fingerprints (list): One fingerprint per page, in page order, or None for a page whose output
+            is not known to match.
+    """
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    tmp_path = f"{manifest_path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({'settings': settings, 'pages': fingerprints}, f)
+    os.replace(tmp_path, manifest_path)
+
+
+def plan_incremental_render(manifest, settings, fingerprints, existing):
+    """
+    Work out which pages must be rendered and which outputs can be reused.
+
+    Args:
+        manifest (dict): The previous manifest, or None.
+        settings (dict): The current render settings.
+        fingerprints (list): The current page fingerprints, in page order.
+        existing (callable): Returns True if the output for a 1-based page number from the previous run still exists.
+
+    Returns:
+        tuple: ``(to_render, moves)`` where to_render is a sorted list of 1-based page numbers and moves maps
+        each new page number to the old page number whose output can be reused for it.
+    """
+    if manifest is None or manifest.get('settings') != settings:
+        return list(range(1, len(fingerprints) + 1)), {}
+
+    old_fingerprints = manifest.get('pages', [])
+    old_pages = {}
+    for old_number, fingerprint in enumerate(old_fingerprints, start=1):
+        if fingerprint is not None and existing(old_number):
+            old_pages.setdefault(fingerprint, old_number)
+
+    to_render, moves = [], {}
+    for new_number, fingerprint in enumerate(fingerprints, start=1):
+        if (new_number <= len(old_fingerprints) and old_fingerprints[new_number - 1] == fingerprint
+                and existing(new_number)):
+            continue
+        old_number = old_pages.get(fingerprint)
+        if old_number is None:
+            to_render.append(new_number)
+        else:
+            moves[new_number] = old_number
+    return to_render, moves
+
+
+def find_duplicate_pages(fingerprints):
+    """
+    Find pages that draw exactly the same thing as an earlier page.
+
+    Args:
+        fingerprints (list): One fingerprint per page, in page order.
+
+    Returns:
+        dict: A mapping of each duplicate 1-based page number to the first page with the same fingerprint.
+    """
+    first_pages, duplicates = {}, {}
+    for page_number, fingerprint in enumerate(fingerprints, start=1):
+        if fingerprint in first_pages:
+            duplicates[page_number] = first_pages[fingerprint]
+        else:
+            first_pages[fingerprint] = page_number
+    return duplicates
+
+
+def perceptual_hash(image):
+    """
+    Compute a 64-bit difference hash (dHash) of a rendered page.
+
+    Pages that look alike, such as section dividers with different titles,
+    have hashes a small Hamming distance apart.
+
+    Args:
+        image (PIL.Image.Image): The rendered page.
+
+    Returns:
+        str: The hash as 16 hex digits.
+    """
+    pixels = list(image.resize((9, 8), Image.BILINEAR, reducing_gap=2.0).convert('L').getdata())
+    bits = 0
+    for row in range(8):
+        for column in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + column] > pixels[row * 9 + column + 1])
+    return f"{bits:016x}"
+
+
+def find_near_duplicates(hashes, max_distance):
+    """
+    Find pairs of pages whose perceptual hashes are at most ``max_distance`` bits apart.
+
+    Args:
+        hashes (dict): A mapping of 1-based page number to its perceptual hash.
+        max_distance (int): The largest Hamming distance reported.
+
+    Returns:
+        list: ``[page, other_page, distance]`` triples with page < other_page, in page order.
+    """
+    pages = sorted((page_number, int(value, 16)) for page_number, value in hashes.items())
+    pairs = []
+    for index, (page_number, value) in enumerate(pages):
+        for other_number, other_value in pages[index + 1:]:
+            distance = bin(value ^ other_value).count('1')
+            if distance <= max_distance:
+                pairs.append([page_number, other_number, distance])
+    return pairs
+
+
+def load_duplicate_report(output_dir):
+    """
+    Load the duplicate report written by a previous run.
+
+    Args:
+        output_dir (str): The directory holding the rendered slides.
+
+    Returns:
+        dict: The report with ``exact``, ``near`` and ``phashes`` keys, or None if there is no readable report.
+    """
+    try:
+        with open(os.path.join(output_dir, DUPLICATES_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_duplicate_report(output_dir, exact, near, phashes):
+    """
+    Atomically write the duplicate report for the slides in ``output_dir``.
+
+    Args:
+        output_dir (str): The directory holding the rendered slides.
+        exact (dict): A mapping of duplicate page number to the page whose images it shares.
+        near (list): ``[page, other_page, distance]`` triples of near-duplicate pages.
+        phashes (dict): Perceptual hashes keyed by page fingerprint, reused by later incremental runs.
+    """
+    report_path = os.path.join(output_dir, DUPLICATES_NAME)
+    tmp_path = f"{report_path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({'exact': {str(page): source for page, source in sorted(exact.items())}, 'near': near,
+                   'phashes': phashes}, f)
+    os.replace(tmp_path, report_path)
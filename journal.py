@@ -0,0 +1,164 @@
+import json
+import os
+import threading
+import time
+
+
+class RunJournal:
+    def __init__(self, path, resume=True):
+        """
+        Open an append-only journal of deck and page completions for a batch run.
+
+        Every record is one JSON line, flushed as soon as it is written, so a
+        crash loses at most the line being written; a truncated last line is
+        ignored when the journal is replayed. A deck's records only count while
+        its source file keeps the modification time and size, and the render
+        settings, recorded when the deck was started.
+
+        Args:
+            path (str): The journal file.
+            resume (bool, optional): Replay an existing journal so finished decks and pages can be skipped.
+                When False the journal is started afresh. Defaults to True.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self.decks = {}
+        self._partial = False
+        if resume:
+            self._replay()
+        self._file = open(path, 'a' if resume else 'w')
+        if self._partial:
+            # Start after the line a crash cut short instead of appending to it.
+            self._file.write('\n')
+
+    @staticmethod
+    def source_state(path):
+        """
+        Get the identity of a source file as recorded in the journal.
+
+        Args:
+            path (str): The file path.
+
+        Returns:
+            list: ``[mtime_ns, size]``.
+        """
+        stat = os.stat(path)
+        return [stat.st_mtime_ns, stat.st_size]
+
+    @staticmethod
+    def _normalize(settings):
+        # Compare settings as they read back from the journal, where tuples have become lists.
+        return json.loads(json.dumps(settings))
+
+    def _replay(self):
+        try:
+            with open(self.path) as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return
+        self._partial = bool(lines) and not lines[-1].endswith('\n')
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            self._apply(record)
+
+    def _apply(self, record):
+        deck = record['deck']
+        if record['event'] == 'deck_start':
+            previous = self.decks.get(deck)
+            if (previous is None or previous['source'] != record['source']
+                    or previous['settings'] != record['settings']):
+                self.decks[deck] = {'source': record['source'], 'settings': record['settings'], 'pages': {},
+                                    'done': False}
+            else:
+                previous['done'] = False
+        elif deck in self.decks:
+            if record['event'] == 'pages_done':
+                self.decks[deck]['pages'].update({int(n): fp for n, fp in record['pages'].items()})
+            elif record['event'] == 'deck_done':
+                self.decks[deck]['done'] = True
+
+    def _append(self, record):
+        record['ts'] = time.time()
+        with self._lock:
+            self._apply(record)
+            self._file.write(json.dumps(record) + '\n')
+            self._file.flush()
+            if record['event'] == 'deck_done':
+                os.fsync(self._file.fileno())
+
+    def _current(self, ppt_path, settings):
+        entry = self.decks.get(ppt_path)
+        settings = self._normalize(settings)
+        try:
+            source = self.source_state(ppt_path)
+        except OSError:
+            return None
+        if entry is None or entry['source'] != source or entry['settings'] != settings:
+            return None
+        return entry
+
+    def is_done(self, ppt_path, settings):
+        """
+        Check whether a deck finished with its current source file and the given settings.
+
+        Args:
+            ppt_path (str): The source file.
+            settings (dict): The render settings.
+
+        Returns:
+            bool: True if the deck can be skipped.
+        """
+        entry = self._current(ppt_path, settings)
+        return entry is not None and entry['done']
+
+    def done_pages(self, ppt_path, settings):
+        """
+        Get the pages of a deck already written with its current source file and the given settings.
+
+        Args:
+            ppt_path (str): The source file.
+            settings (dict): The render settings.
+
+        Returns:
+            dict: A mapping of 1-based page number to the page's fingerprint (or None).
+        """
+        entry = self._current(ppt_path, settings)
+        return dict(entry['pages']) if entry is not None else {}
+
+    def start_deck(self, ppt_path, settings):
+        """
+        Record that a deck is being processed. Earlier page records stay valid if the source is unchanged.
+
+        Args:
+            ppt_path (str): The source file.
+            settings (dict): The render settings.
+        """
+        self._append({'event': 'deck_start', 'deck': ppt_path, 'source': self.source_state(ppt_path),
+                      'settings': self._normalize(settings)})
+
+    def record_pages(self, ppt_path, pages):
+        """
+        Record that pages of a deck have been written.
+
+        Args:
+            ppt_path (str): The source file.
+            pages (dict): A mapping of 1-based page number to the page's fingerprint (or None).
+        """
+        if pages:
+            self._append({'event': 'pages_done', 'deck': ppt_path, 'pages': {str(n): fp for n, fp in pages.items()}})
+
+    def finish_deck(self, ppt_path):
+        """
+        Record that every page of a deck has been written.
+
+        Args:
+            ppt_path (str): The source file.
+        """
+        self._append({'event': 'deck_done', 'deck': ppt_path})
+
+    def close(self):
+        with self._lock:
+            self._file.close()
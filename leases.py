@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+
+
+class Lease:
+    def __init__(self, manager, key, path, token):
+        """
+        A claim on one unit of work, kept alive by its manager's heartbeat.
+
+        Args:
+            manager (LeaseManager): The manager that holds the lease.
+            key (str): The work item the lease covers.
+            path (str): The lease file.
+            token (str): The unique token written into the lease file by this claim.
+        """
+        self.manager = manager
+        self.key = key
+        self.path = path
+        self.token = token
+        self.lost = False
+
+    def is_held(self):
+        """
+        Check that the lease file still carries this claim's token.
+
+        Returns:
+            bool: False once the lease expired and another worker reclaimed it.
+        """
+        if not self.lost and self.manager._read(self.path).get('token') != self.token:
+            self.lost = True
+        return not self.lost
+
+
+class LeaseManager:
+    def __init__(self, lease_dir, ttl=120, owner=None):
+        """
+        Coordinate work between processes, possibly on several hosts, through lease files.
+
+        A worker claims an item by hard-linking a fresh file to the item's
+        lease name, which succeeds for exactly one worker even on NFS. A
+        heartbeat thread refreshes the modification time of every held lease;
+        a lease whose file has not been touched for ``ttl`` seconds belongs to
+        a dead worker and may be reclaimed. Finished items get a done marker
+        recording the source state, so no worker repeats them. Keep ``ttl``
+        well above the clock skew between hosts.
+
+        Args:
+            lease_dir (str): A directory shared by all workers.
+            ttl (float, optional): Seconds without a heartbeat after which a lease expires. Defaults to 120.
+            owner (str, optional): This worker's name in lease files. Defaults to ``<host>:<pid>``.
+        """
+        self.lease_dir = lease_dir
+        self.ttl = ttl
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+        self._held = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        os.makedirs(lease_dir, exist_ok=True)
+        self._thread = threading.Thread(target=self._heartbeat, daemon=True)
+        self._thread.start()
+
+    def _path(self, key, suffix):
+        return os.path.join(self.lease_dir, hashlib.sha1(key.encode()).hexdigest() + suffix)
+
+    @staticmethod
+    def _read(path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_new(self, path, content):
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(content, f)
+        return tmp_path
+
+    def _expired(self, path):
+        try:
+            return time.time() - os.stat(path).st_mtime > self.ttl
+        except FileNotFoundError:
+            return True
+
+    def is_done(self, key, state):
+        """
+        Check whether an item was finished by any worker with the same source state.
+
+        Args:
+            key (str): The work item.
+            state: A JSON-serializable description of the item's input, e.g. its mtime, size and settings.
+
+        Returns:
+            bool: True if the item can be skipped.
+        """
+        return self._read(self._path(key, '.done')).get('state') == json.loads(json.dumps(state))
+
+    def claim(self, key):
+        """
+        Try to claim an item, reclaiming it from a dead worker if its lease has expired.
+
+        Args:
+            key (str): The work item.
+
+        Returns:
+            Lease: The lease, or None if another live worker holds the item.
+        """
+        path = self._path(key, '.lease')
+        token = uuid.uuid4().hex
+        tmp_path = self._write_new(path, {'key': key, 'owner': self.owner, 'token': token})
+        try:
+            for _ in range(2):
+                try:
+                    os.link(tmp_path, path)
+                except FileExistsError:
+                    if not self._expired(path):
+                        return None
+                    # Move the stale lease aside; only one reclaiming worker wins the rename.
+                    stale_path = f"{path}.{token}.stale"
+                    try:
+                        os.rename(path, stale_path)
+                    except FileNotFoundError:
+                        continue
+                    if not self._expired(stale_path):
+                        # Another worker reclaimed and renewed it between our check and the rename.
+                        try:
+                            os.link(stale_path, path)
+                        except FileExistsError:
+                            pass
+                        os.remove(stale_path)
+                        return None
+                    print(f"Reclaiming {key} from expired lease of {self._read(stale_path).get('owner')}")
+                    os.remove(stale_path)
+                    continue
+                lease = Lease(self, key, path, token)
+                with self._lock:
+                    self._held[key] = lease
+                return lease
+            return None
+        finally:
+            os.remove(tmp_path)
+
+    def release(self, lease, state=None):
+        """
+        Give up a lease, marking the item done when a state is given.
+
+        Args:
+            lease (Lease): The lease to release.
+            state (optional): The item's input state; when given, a done marker is written first.
+        """
+        with self._lock:
+            self._held.pop(lease.key, None)
+        if state is not None:
+            done_path = self._path(lease.key, '.done')
+            tmp_path = self._write_new(done_path, {'key': lease.key, 'owner': self.owner, 'state': state,
+                                                   'finished': time.time()})
+            os.replace(tmp_path, done_path)
+        if lease.is_held():
+            try:
+                os.remove(lease.path)
+            except FileNotFoundError:
+                pass
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.ttl / 4):
+            with self._lock:
+                leases = list(self._held.values())
+            for lease in leases:
+                if lease.is_held():
+                    try:
+                        os.utime(lease.path)
+                    except FileNotFoundError:
+                        lease.lost = True
+                if lease.lost:
+                    print(f"Lost the lease on {lease.key}")
+
+    def close(self):
+        """
+        Stop the heartbeat. Leases still held expire after ttl.
+        """
+        self._stop.set()
+        self._thread.join()
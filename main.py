@@ -1,13 +1,81 @@
 import os
+
+from multiprocessing import cpu_count
+from cache import ConversionCache
 from converter import PPTConverter
+from encoders import ImageEncoder, parse_output_spec
+from journal import RunJournal
+from metrics import JsonLinesSink, Metrics, PrometheusTextfileSink
+from office_batch import OfficeBatchConverter
+from office_pool import OfficePool
+from office_watchdog import SofficeWatchdog
+from pipeline import DeckPipeline
+from renderers import RENDERERS
+from sharding import ShardedRun
 from utils import FileUtils
 
-def process_files_in_directory(directory):
+def iter_converters(directory, office_pool=None, num_processes=None, profile_deck=None, profile_dir=None,
+                    journal=None, **converter_options):
     """
-    Process all PPTX files in the specified directory.
+    Yield a PPTConverter for every PPTX file in the specified directory and its subdirectories.
+
+    Slides of ``<directory>/<sub>/<deck>.pptx`` go to ``<directory>/images/<sub>/<deck>``. The images
+    directory itself is not scanned.
 
     Args:
         directory (str): The path to the directory containing PPTX files.
+        office_pool (OfficePool, optional): Warm LibreOffice workers shared by all decks. Defaults to None.
+        num_processes (int, optional): Render processes per deck. Defaults to None.
+        profile_deck (str, optional): The name of a deck, without extension, to run under cProfile. Defaults to None.
+        profile_dir (str, optional): Where the profile of profile_deck is written. Defaults to the current directory.
+        journal (RunJournal, optional): Records progress; decks it records as finished are skipped.
+            Defaults to None.
+        **converter_options: Extra keyword arguments forwarded to PPTConverter (backend, dpi, ...).
+
+    Yields:
+        PPTConverter: A converter whose output directory already exists.
+    """
+    images_dir = os.path.join(directory, 'images')
+    for ppt_path in FileUtils.scan_files(directory, ('.pptx',), exclude_dirs=(images_dir,)):
+        relative_dir, filename = os.path.split(os.path.relpath(ppt_path, directory))
+        deck = os.path.splitext(filename)[0]
+        output_dir = os.path.normpath(os.path.join(images_dir, relative_dir, deck))
+
+        profiled = profile_deck is not None and deck == profile_deck
+        converter = PPTConverter(ppt_path, output_dir, num_processes=num_processes, office_pool=office_pool,
+                                 profile_dir=(profile_dir or os.getcwd()) if profiled else None, journal=journal,
+                                 **converter_options)
+        if journal is not None and journal.is_done(ppt_path, converter.output_settings):
+            print(f"Skipping {ppt_path}, finished by an earlier run")
+            continue
+
+        # Ensure output directory exists
+        FileUtils.create_directory_if_not_exists(output_dir)
+        yield converter
+
+
+def process_files_in_directory(directory, office_pool=None, render_concurrency=1, queue_size=4,
+                               office_batcher=None, **converter_options):
+    """
+    Process all PPTX files in the specified directory tree.
+
+    PPTX to PDF conversion of upcoming decks overlaps with rasterization of
+    decks that are already converted. The office stage runs one deck per
+    pool worker when an office pool is given and one deck at a time
+    otherwise.
+
+    Args:
+        directory (str): The path to the directory containing PPTX files.
+        office_pool (OfficePool, optional): Warm LibreOffice workers shared by all decks. Defaults to None.
+        render_concurrency (int, optional): Decks rasterized at once; render processes are split between them.
+            Defaults to 1.
+        queue_size (int, optional): The capacity of the queues between stages. Defaults to 4.
+        office_batcher (OfficeBatchConverter, optional): Convert decks in batched soffice invocations. Ignored
+            when an office pool is given. Defaults to None.
+        **converter_options: Extra keyword arguments forwarded to PPTConverter (backend, dpi, ...).
+
+    Returns:
+        dict: A mapping of PPTX path to the exception that stopped it, for decks that failed.
 
     Raises:
         Exception: For errors during file processing.
@@ -15,40 +83,180 @@ def process_files_in_directory(directory):
     try:
         if not os.path.isdir(directory):
             raise ValueError(f"The provided path {directory} is not a valid directory.")
-        
-        for filename in os.listdir(directory):
-            if filename.lower().endswith('.pptx'):
-                ppt_path = os.path.join(directory, filename)
-                pdf_path = ppt_path.rsplit('.', 1)[0] + '.pdf'
-                output_dir = os.path.join(directory, 'images', os.path.splitext(filename)[0])
-                
-                # Ensure output directory exists
-                FileUtils.create_directory_if_not_exists(output_dir)
-                
-                # Initialize PPTConverter
-                converter = PPTConverter(ppt_path, output_dir)
-                
-                # Convert PPTX to PDF
-                converter.ppt_to_pdf()
-                
-                # Check if PDF was created
-                if FileUtils.check_file_exists(pdf_path):
-                    # Count pages in the PDF
-                    page_count = FileUtils.get_pdf_page_count(pdf_path)
-                    print(f"Number of pages in {pdf_path}: {page_count}")
-                    
-                    # Process PDF pages
-                    converter.process_pdf_pages()
-                else:
-                    print(f"PDF file {pdf_path} does not exist.")
+
+        pipeline = DeckPipeline(
+            office_concurrency=office_pool.size if office_pool is not None else 1,
+            render_concurrency=render_concurrency,
+            queue_size=queue_size,
+            office_batcher=office_batcher if office_pool is None else None,
+        )
+        num_processes = max(1, cpu_count() // pipeline.render_concurrency)
+        converters = iter_converters(directory, office_pool=office_pool, num_processes=num_processes,
+                                     **converter_options)
+        return pipeline.run(converters)
+    except Exception as e:
+        print(f"Error occurred while processing files: {e}")
+
+def process_files_sharded(directory, lease_dir=None, lease_ttl=120, node_id=None, **converter_options):
+    """
+    Process this worker's share of the PPTX files in a directory tree shared with other workers.
+
+    Start the same command on every node (or several times on one node);
+    decks are claimed through lease files so each is rendered once, and
+    decks of a worker that died are reclaimed when its leases expire.
+
+    Args:
+        directory (str): The path to the shared directory containing PPTX files.
+        lease_dir (str, optional): The shared lease directory. Defaults to ``<directory>/images/.leases``.
+        lease_ttl (float, optional): Seconds without a heartbeat after which a lease expires. Defaults to 120.
+        node_id (str, optional): This worker's name in lease files. Defaults to ``<host>:<pid>``.
+        **converter_options: Extra keyword arguments forwarded to PPTConverter (backend, dpi, ...).
+
+    Returns:
+        dict: A mapping of PPTX path to the exception that stopped it, for decks that failed on this worker.
+
+    Raises:
+        Exception: For errors during file processing.
+    """
+    try:
+        if not os.path.isdir(directory):
+            raise ValueError(f"The provided path {directory} is not a valid directory.")
+        converter_options.pop('render_concurrency', None)
+        converter_options.pop('office_batcher', None)
+        run = ShardedRun(directory, lease_dir=lease_dir, ttl=lease_ttl, owner=node_id)
+        return run.run(iter_converters(directory, num_processes=cpu_count(), **converter_options))
     except Exception as e:
         print(f"Error occurred while processing files: {e}")
 
 if __name__ == "__main__":
     import argparse
-    
+
     parser = argparse.ArgumentParser(description="Convert PPTX files to PNG images.")
-    parser.add_argument("directory", help="Path to the directory containing PPTX files")
+    parser.add_argument("directory", help="Path to the directory tree containing PPTX files")
+    parser.add_argument("--preview", action="store_true",
+                        help="Only extract each deck's saved thumbnail and embedded media into images/<deck>/preview, "
+                             "skipping LibreOffice and rendering")
+    parser.add_argument("--office-workers", type=int, default=0,
+                        help="Number of warm LibreOffice workers to keep running (0 starts soffice per deck)")
+    parser.add_argument("--office-max-jobs", type=int, default=200,
+                        help="Conversions after which a warm LibreOffice worker is restarted")
+    parser.add_argument("--soffice-batch-size", type=int, default=1,
+                        help="Decks converted per soffice invocation when no office workers are used (default: 1)")
+    parser.add_argument("--soffice-batch-mb", type=int, default=256,
+                        help="PPTX megabytes per batched soffice invocation (default: 256)")
+    parser.add_argument("--soffice-timeout", type=float, default=120,
+                        help="Seconds any deck may take in LibreOffice before it is killed and retried (default: 120)")
+    parser.add_argument("--soffice-timeout-per-mb", type=float, default=20,
+                        help="Extra timeout seconds per MiB of PPTX (default: 20)")
+    parser.add_argument("--soffice-stall-timeout", type=float,
+                        help="Kill soffice after this many seconds without CPU progress (default: off)")
+    parser.add_argument("--soffice-retries", type=int, default=1,
+                        help="Further attempts after a failed conversion; decks failing twice are quarantined "
+                             "in images/.quarantine.json (default: 1)")
+    parser.add_argument("--soffice-speculate-after", type=float,
+                        help="Start a second soffice on a deck still converting after this many seconds "
+                             "(default: off)")
+    parser.add_argument("--no-watchdog", dest="watchdog", action="store_false",
+                        help="Run LibreOffice without timeouts, retries or quarantine")
+    parser.add_argument("--backend", choices=sorted(RENDERERS), default='pymupdf',
+                        help="Rasterization backend (default: pymupdf)")
+    parser.add_argument("--dpi", type=int, default=200, help="Rendering resolution in DPI (default: 200)")
+    parser.add_argument("--render-decks", type=int, default=1,
+                        help="Number of decks rasterized concurrently while others are converted (default: 1)")
+    parser.add_argument("--cache-dir", help="Directory of a conversion cache used to skip unchanged decks")
+    parser.add_argument("--cache-max-mb", type=int, default=10240,
+                        help="Size cap of the conversion cache in MiB before LRU eviction (default: 10240)")
+    parser.add_argument("--format", choices=sorted(ImageEncoder.FORMATS), default='png',
+                        help="Output image format (default: png)")
+    parser.add_argument("--quality", type=int, default=90, help="JPEG/WebP quality (default: 90)")
+    parser.add_argument("--png-compress-level", type=int, default=6,
+                        help="PNG zlib compression level 0-9; lower is faster and larger (default: 6)")
+    parser.add_argument("--optimize", action="store_true", help="Spend extra CPU for smaller output files")
+    parser.add_argument("--encode-threads", type=int, default=2,
+                        help="Encoding threads per render process (default: 2)")
+    parser.add_argument("--output", action="append", type=parse_output_spec, dest="outputs",
+                        help="Extra rendition as name:max_px:format written to a subdirectory, e.g. "
+                             "full:0:png, preview:1024:jpeg or thumb:256:webp; repeatable")
+    parser.add_argument("--packed", action="store_true",
+                        help="Write each deck's slides into one images/<deck>/slides.pack instead of a file per slide")
+    parser.add_argument("--memory-budget-mb", type=int,
+                        help="Memory for rendered pages across render processes; larger pages are rendered in bands")
+    parser.add_argument("--no-dedupe", dest="dedupe", action="store_false",
+                        help="Render pages identical to an earlier page again instead of hard-linking its images")
+    parser.add_argument("--near-duplicates", type=int, metavar="BITS",
+                        help="Report page pairs whose perceptual hashes differ by at most BITS bits (e.g. 6)")
+    parser.add_argument("--text-index", choices=["json", "sqlite"],
+                        help="Extract page text and titles while rendering into a searchable index next to the images")
+    parser.add_argument("--journal",
+                        help="Checkpoint journal of finished decks and pages (default: <directory>/images/.journal.jsonl)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip decks and pages the journal records as finished instead of starting afresh")
+    parser.add_argument("--shard", action="store_true",
+                        help="Share the directory with other workers started the same way, claiming decks through "
+                             "lease files; replaces the journal")
+    parser.add_argument("--lease-dir",
+                        help="Shared lease directory for --shard (default: <directory>/images/.leases)")
+    parser.add_argument("--lease-ttl", type=float, default=120,
+                        help="Seconds without a heartbeat after which another worker may reclaim a deck (default: 120)")
+    parser.add_argument("--node-id", help="This worker's name in lease files (default: <host>:<pid>)")
+    parser.add_argument("--metrics-jsonl", help="Append per-stage timers and counters to this JSON lines file")
+    parser.add_argument("--metrics-prom", help="Write aggregated metrics to this Prometheus textfile-collector file")
+    parser.add_argument("--profile-deck", help="Run the named deck (file name without extension) under cProfile")
+    parser.add_argument("--profile-dir", help="Directory for .prof files from --profile-deck (default: cwd)")
     args = parser.parse_args()
-    
-    process_files_in_directory(args.directory)
+    sinks = []
+    if args.metrics_jsonl:
+        sinks.append(JsonLinesSink(args.metrics_jsonl))
+    if args.metrics_prom:
+        sinks.append(PrometheusTextfileSink(args.metrics_prom))
+    metrics = Metrics(sinks)
+    encoder = ImageEncoder(args.format, quality=args.quality, compress_level=args.png_compress_level,
+                           optimize=args.optimize)
+    options = dict(backend=args.backend, dpi=args.dpi, render_concurrency=args.render_decks, encoder=encoder,
+                   encode_threads=args.encode_threads, outputs=args.outputs, metrics=metrics,
+                   packed=args.packed, dedupe=args.dedupe, near_duplicate_distance=args.near_duplicates, text_index=args.text_index,
+                   profile_deck=args.profile_deck, profile_dir=args.profile_dir,
+                   memory_budget=args.memory_budget_mb * 1024 * 1024 if args.memory_budget_mb else None)
+    if not os.path.isdir(args.directory):
+        parser.error(f"{args.directory} is not a directory")
+    # A preview only reads the decks; opening the journal afresh would wipe the checkpoint of a crashed run.
+    if not args.preview and not args.shard:
+        journal_path = args.journal or os.path.join(args.directory, 'images', '.journal.jsonl')
+        FileUtils.create_directory_if_not_exists(os.path.dirname(os.path.abspath(journal_path)))
+        options['journal'] = RunJournal(journal_path, resume=args.resume)
+    if not args.preview and args.watchdog:
+        FileUtils.create_directory_if_not_exists(os.path.join(args.directory, 'images'))
+        options['watchdog'] = SofficeWatchdog(
+            base_timeout=args.soffice_timeout, seconds_per_mb=args.soffice_timeout_per_mb,
+            stall_timeout=args.soffice_stall_timeout, retries=args.soffice_retries,
+            speculate_after=args.soffice_speculate_after,
+            quarantine_path=os.path.join(args.directory, 'images', '.quarantine.json'))
+    if not args.preview and args.soffice_batch_size > 1:
+        options['office_batcher'] = OfficeBatchConverter(max_files=args.soffice_batch_size,
+                                                         max_bytes=args.soffice_batch_mb * 1024 * 1024,
+                                                         watchdog=options.get('watchdog'))
+    if not args.preview and args.cache_dir:
+        options['cache'] = ConversionCache(args.cache_dir, max_bytes=args.cache_max_mb * 1024 * 1024)
+
+    try:
+        if args.preview:
+            preview_options = {key: options[key] for key in ('metrics',)}
+            for converter in iter_converters(args.directory, **preview_options):
+                try:
+                    converter.preview(extract=True)
+                except Exception as e:
+                    print(f"Skipping the preview of {converter.ppt_path}: {e}")
+        elif args.shard:
+            process_files_sharded(args.directory, lease_dir=args.lease_dir, lease_ttl=args.lease_ttl,
+                                  node_id=args.node_id, **options)
+        elif args.office_workers > 0 and OfficePool.is_available():
+            with OfficePool(size=args.office_workers, max_jobs_per_worker=args.office_max_jobs) as pool:
+                process_files_in_directory(args.directory, office_pool=pool, **options)
+        else:
+            if args.office_workers > 0:
+                print("LibreOffice UNO bindings not available; starting soffice per deck.")
+            process_files_in_directory(args.directory, **options)
+    finally:
+        if options.get('journal') is not None:
+            options['journal'].close()
+        metrics.close()
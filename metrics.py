@@ -0,0 +1,175 @@
+import contextlib
+import cProfile
+import json
+import os
+import threading
+import time
+import uuid
+
+
+class JsonLinesSink:
+    def __init__(self, path):
+        """
+        Append every metric event to a file as one JSON object per line.
+
+        Args:
+            path (str): The file to append to.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'a')
+
+    def emit(self, event):
+        with self._lock:
+            self._file.write(json.dumps(event) + '\n')
+            self._file.flush()
+
+    def flush(self):
+        pass
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class PrometheusTextfileSink:
+    def __init__(self, path, prefix='pptconv'):
+        """
+        Aggregate metric events into a node_exporter textfile-collector file.
+
+        Counters become ``<prefix>_<name>_total`` and timers become
+        ``<prefix>_<name>_ms_sum``/``_ms_count`` pairs. The file is rewritten
+        atomically on every flush, so the collector never reads a partial file.
+
+        Args:
+            path (str): The ``.prom`` file to write.
+            prefix (str, optional): The metric name prefix. Defaults to 'pptconv'.
+        """
+        self.path = path
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._timers = {}
+
+    @staticmethod
+    def _label_key(labels):
+        return tuple(sorted(labels.items()))
+
+    def emit(self, event):
+        key = (event['name'], self._label_key(event['labels']))
+        with self._lock:
+            if event['type'] == 'counter':
+                self._counters[key] = self._counters.get(key, 0) + event['value']
+            else:
+                total, count = self._timers.get(key, (0.0, 0))
+                self._timers[key] = (total + event['value'], count + 1)
+
+    def _format(self, name, labels, value):
+        label_text = ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+                              for k, v in labels)
+        return f"{self.prefix}_{name}{{{label_text}}} {value}" if label_text else f"{self.prefix}_{name} {value}"
+
+    def flush(self):
+        with self._lock:
+            lines = []
+            typed = set()
+            for (name, labels), value in sorted(self._counters.items()):
+                if name not in typed:
+                    typed.add(name)
+                    lines.append(f"# TYPE {self.prefix}_{name}_total counter")
+                lines.append(self._format(f"{name}_total", labels, value))
+            for (name, labels), (total, count) in sorted(self._timers.items()):
+                if name not in typed:
+                    typed.add(name)
+                    lines.append(f"# TYPE {self.prefix}_{name}_ms summary")
+                lines.append(self._format(f"{name}_ms_sum", labels, round(total, 3)))
+                lines.append(self._format(f"{name}_ms_count", labels, count))
+        tmp_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, self.path)
+
+    def close(self):
+        self.flush()
+
+
+class Metrics:
+    def __init__(self, sinks=()):
+        """
+        Initialize a collector of stage timers and counters.
+
+        Every event is forwarded to each sink as it is recorded; with no
+        sinks, recording is a cheap no-op apart from the in-memory totals.
+
+        Args:
+            sinks (iterable, optional): JsonLinesSink/PrometheusTextfileSink instances. Defaults to ().
+        """
+        self.sinks = list(sinks)
+        self._lock = threading.Lock()
+        self.totals = {}
+
+    def _record(self, event_type, name, value, labels):
+        event = {'ts': time.time(), 'type': event_type, 'name': name, 'value': value, 'labels': labels}
+        with self._lock:
+            self.totals[name] = self.totals.get(name, 0) + value
+        for sink in self.sinks:
+            sink.emit(event)
+
+    def incr(self, name, value=1, **labels):
+        """
+        Add to a counter.
+
+        Args:
+            name (str): The counter name, e.g. 'pages_rendered' or 'cache_hits'.
+            value (int, optional): The amount to add. Defaults to 1.
+            **labels: Labels such as ``deck`` or ``stage``.
+        """
+        self._record('counter', name, value, labels)
+
+    def observe(self, name, ms, **labels):
+        """
+        Record a duration.
+
+        Args:
+            name (str): The timer name, e.g. 'soffice' or 'render'.
+            ms (float): The duration in milliseconds.
+            **labels: Labels such as ``deck`` or ``stage``.
+        """
+        self._record('timer', name, ms, labels)
+
+    @contextlib.contextmanager
+    def timer(self, name, **labels):
+        """
+        Time the enclosed block and record it with ``observe``.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, (time.perf_counter() - start) * 1000.0, **labels)
+
+    def flush(self):
+        for sink in self.sinks:
+            sink.flush()
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+@contextlib.contextmanager
+def profile_to(path):
+    """
+    Run the enclosed block under cProfile and dump the stats to ``path``.
+
+    Args:
+        path (str): The ``.prof`` file to write; inspect it with ``python -m pstats``.
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        print(f"Saved profile {path}")
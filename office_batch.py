@@ -0,0 +1,175 @@
+import os
+import shutil
+import signal
+import subprocess
+import tempfile
+import time
+
+from office_watchdog import QuarantinedError
+
+
+def plan_batches(converters, max_files=20, max_bytes=256 * 1024 * 1024):
+    """
+    Group decks into soffice batches.
+
+    A batch holds decks whose PDFs go to the same directory, since one
+    soffice invocation takes a single ``--outdir``, and stays within both
+    limits; a deck larger than ``max_bytes`` gets a batch of its own. Decks
+    keep their order within each directory.
+
+    Args:
+        converters (iterable): PPTConverter instances.
+        max_files (int, optional): The most decks per batch. Defaults to 20.
+        max_bytes (int, optional): The most PPTX bytes per batch. Defaults to 256 MiB.
+
+    Returns:
+        list: Lists of PPTConverter instances, one per batch.
+    """
+    batches = []
+    open_batches = {}
+    for converter in converters:
+        size = os.path.getsize(converter.ppt_path)
+        pdf_dir = os.path.dirname(os.path.abspath(converter.pdf_path))
+        batch = open_batches.get(pdf_dir)
+        if batch is None or len(batch[0]) >= max_files or batch[1] + size > max_bytes:
+            batch = open_batches[pdf_dir] = [[], 0]
+            batches.append(batch[0])
+        batch[0].append(converter)
+        batch[1] += size
+    return batches
+
+
+class OfficeBatchConverter:
+    def __init__(self, max_files=20, max_bytes=256 * 1024 * 1024, timeout=None, watchdog=None):
+        """
+        Convert many decks to PDF with one soffice process per batch.
+
+        Starting LibreOffice costs far more than converting a small deck, so
+        decks are grouped with ``plan_batches`` and each batch is converted by
+        a single ``soffice --convert-to pdf`` call into a private temporary
+        directory; each PDF found there is then moved to its deck's
+        ``pdf_path``. soffice often exits successfully even when a document
+        fails, so success is judged per deck by its output. Decks without
+        output are retried: as a batch again if the attempt made progress,
+        otherwise split in half, so one corrupt deck costs a few extra
+        invocations instead of failing or serializing the whole batch.
+
+        Args:
+            max_files (int, optional): The most decks per soffice invocation. Defaults to 20.
+            max_bytes (int, optional): The most PPTX bytes per soffice invocation. Defaults to 256 MiB.
+            timeout (float, optional): Seconds before an invocation is killed and its missing decks retried.
+                Defaults to None (no limit).
+            watchdog (SofficeWatchdog, optional): Replaces timeout with one scaled by each batch's size, keeps
+                quarantined decks out of batches and records decks that fail on their own. Defaults to None.
+        """
+        self.max_files = max(1, max_files)
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.watchdog = watchdog
+
+    def _run_soffice(self, converters, outdir):
+        timeout = self.timeout
+        if self.watchdog is not None:
+            timeout = self.watchdog.batch_timeout(converter.ppt_path for converter in converters)
+        # A private profile keeps batches from handing their documents to another soffice already running.
+        with tempfile.TemporaryDirectory(prefix='soffice-profile-') as profile_dir:
+            command = ['soffice', '--headless', f'-env:UserInstallation=file://{os.path.abspath(profile_dir)}',
+                       '--convert-to', 'pdf', *[converter.ppt_path for converter in converters], '--outdir', outdir]
+            # A session of its own lets a timeout kill soffice.bin along with its launcher script.
+            process = subprocess.Popen(command, start_new_session=True)
+            try:
+                returncode = process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                print(f"soffice timed out after {timeout:.0f}s on a batch of {len(converters)} decks; killing it")
+                os.killpg(process.pid, signal.SIGKILL)
+                process.wait()
+                return subprocess.TimeoutExpired(command, timeout)
+            except BaseException:
+                os.killpg(process.pid, signal.SIGKILL)
+                process.wait()
+                raise
+        if returncode != 0:
+            return subprocess.CalledProcessError(returncode, command)
+        return None
+
+    def _convert_batch(self, converters, on_converted, failures):
+        metrics = converters[0].metrics
+        outdir = tempfile.mkdtemp(prefix='.soffice-batch-', dir=os.path.dirname(os.path.abspath(converters[0].pdf_path)))
+        missing = []
+        try:
+            start = time.perf_counter()
+            error = self._run_soffice(converters, outdir)
+            metrics.observe('soffice_batch', (time.perf_counter() - start) * 1000.0, files=len(converters))
+            for converter in converters:
+                produced = os.path.join(outdir, os.path.splitext(os.path.basename(converter.ppt_path))[0] + '.pdf')
+                if os.path.isfile(produced):
+                    os.replace(produced, converter.pdf_path)
+                    if self.watchdog is not None:
+                        self.watchdog.record(converter.ppt_path, None)
+                    converter.store_pdf_in_cache()
+                    if on_converted is not None:
+                        on_converted(converter)
+                else:
+                    if isinstance(error, subprocess.TimeoutExpired):
+                        # Decks written before the hang are not counted against the timeout.
+                        converter.metrics.incr('soffice_timeouts', deck=converter.deck)
+                    missing.append(converter)
+        finally:
+            shutil.rmtree(outdir, ignore_errors=True)
+
+        if not missing:
+            return
+        if len(converters) == 1:
+            print(f"Error occurred while converting {converters[0].ppt_path} to PDF: {error or 'no output produced'}")
+            failures[converters[0].ppt_path] = error or FileNotFoundError(converters[0].pdf_path)
+            if self.watchdog is not None:
+                self.watchdog.record(converters[0].ppt_path, failures[converters[0].ppt_path])
+                if self.watchdog.is_quarantined(converters[0].ppt_path):
+                    print(f"Quarantining {converters[0].ppt_path} after repeated conversion failures")
+            return
+        if len(missing) < len(converters):
+            # The batch made progress; the rest may simply not have been reached before a crash.
+            self._convert_batch(missing, on_converted, failures)
+            return
+        metrics.incr('soffice_bisections', files=len(missing))
+        middle = len(missing) // 2
+        print(f"Batch of {len(missing)} decks failed ({error or 'no output produced'}); splitting it")
+        self._convert_batch(missing[:middle], on_converted, failures)
+        self._convert_batch(missing[middle:], on_converted, failures)
+
+    def convert(self, converters, on_converted=None):
+        """
+        Convert decks to PDF in batches.
+
+        Decks with a cached PDF are served from the cache without starting
+        soffice; decks the watchdog has quarantined fail with
+        QuarantinedError.
+
+        Args:
+            converters (iterable): PPTConverter instances.
+            on_converted (callable, optional): Called with each converter as soon as its PDF is in place.
+                Defaults to None.
+
+        Returns:
+            dict: A mapping of PPTX path to the exception that stopped it, for decks that failed.
+        """
+        failures = {}
+        pending = []
+        for converter in converters:
+            try:
+                if converter.use_cached_pdf():
+                    if on_converted is not None:
+                        on_converted(converter)
+                    continue
+                if self.watchdog is not None and self.watchdog.is_quarantined(converter.ppt_path):
+                    converter.metrics.incr('soffice_quarantined', deck=converter.deck)
+                    raise QuarantinedError(f"{converter.ppt_path} is quarantined after repeated conversion failures")
+            except Exception as e:
+                print(f"An unexpected error occurred: {e}")
+                failures[converter.ppt_path] = e
+                continue
+            pending.append(converter)
+        for batch in plan_batches(pending, self.max_files, self.max_bytes):
+            print(f"Converting {len(batch)} decks to PDF in one soffice invocation")
+            self._convert_batch(batch, on_converted, failures)
+        return failures
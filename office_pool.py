@@ -0,0 +1,264 @@
+import os
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+
+from multiprocessing import cpu_count
+
+
+class OfficeWorker:
+    def __init__(self, base_dir, startup_timeout=60):
+        """
+        Initialize a long-lived headless LibreOffice instance.
+
+        Each worker listens on its own private pipe and uses its own user
+        profile directory, so several workers can run side by side without
+        fighting over the shared ``~/.config/libreoffice`` profile lock.
+
+        Args:
+            base_dir (str): The directory under which the worker's profile directory is created.
+            startup_timeout (float, optional): Seconds to wait for the office process to accept connections. Defaults to 60.
+        """
+        self.worker_id = uuid.uuid4().hex[:12]
+        self.pipe_name = f"ppt_img_conv_{self.worker_id}"
+        self.profile_dir = os.path.join(base_dir, f"profile-{self.worker_id}")
+        self.startup_timeout = startup_timeout
+        self.jobs_done = 0
+        self.process = None
+        self.desktop = None
+
+    def start(self):
+        """
+        Launch the office process and connect to it over UNO.
+
+        Raises:
+            ImportError: If the LibreOffice ``uno`` bindings are not importable.
+            TimeoutError: If the office process does not accept connections in time.
+        """
+        import uno
+
+        os.makedirs(self.profile_dir, exist_ok=True)
+        command = [
+            'soffice', '--headless', '--invisible', '--nologo', '--norestore', '--nodefault',
+            f'-env:UserInstallation={uno.systemPathToFileUrl(self.profile_dir)}',
+            f'--accept=pipe,name={self.pipe_name};urp;StarOffice.ComponentContext',
+        ]
+        self.process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                        start_new_session=True)
+
+        local_context = uno.getComponentContext()
+        resolver = local_context.ServiceManager.createInstanceWithContext(
+            'com.sun.star.bridge.UnoUrlResolver', local_context)
+        deadline = time.monotonic() + self.startup_timeout
+        while True:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Office worker {self.worker_id} exited during startup with code {self.process.returncode}")
+            try:
+                context = resolver.resolve(f"uno:pipe,name={self.pipe_name};urp;StarOffice.ComponentContext")
+                break
+            except Exception:
+                if time.monotonic() > deadline:
+                    self.stop()
+                    raise TimeoutError(f"Office worker {self.worker_id} did not start within {self.startup_timeout}s")
+                time.sleep(0.2)
+        self.desktop = context.ServiceManager.createInstanceWithContext('com.sun.star.frame.Desktop', context)
+
+    def is_alive(self):
+        """
+        Check whether the office process is still running.
+
+        Returns:
+            bool: True if the process is running, False otherwise.
+        """
+        return self.process is not None and self.process.poll() is None
+
+    def convert(self, ppt_path, pdf_path):
+        """
+        Convert a single presentation to PDF on this worker.
+
+        Args:
+            ppt_path (str): The path to the PowerPoint file.
+            pdf_path (str): The path where the PDF will be written.
+        """
+        import uno
+        from com.sun.star.beans import PropertyValue
+
+        def prop(name, value):
+            p = PropertyValue()
+            p.Name = name
+            p.Value = value
+            return p
+
+        document = self.desktop.loadComponentFromURL(
+            uno.systemPathToFileUrl(os.path.abspath(ppt_path)), '_blank', 0, (prop('Hidden', True),))
+        if document is None:
+            raise RuntimeError(f"Office worker {self.worker_id} could not load {ppt_path}")
+        try:
+            document.storeToURL(
+                uno.systemPathToFileUrl(os.path.abspath(pdf_path)), (prop('FilterName', 'impress_pdf_Export'),))
+        finally:
+            document.close(True)
+        self.jobs_done += 1
+
+    def kill(self):
+        """
+        Kill the office process group at once, e.g. when a conversion hangs. The UNO call in progress then fails.
+        """
+        if self.process is not None:
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+    def stop(self):
+        """
+        Shut the office process down and remove its private profile directory.
+        """
+        if self.desktop is not None:
+            try:
+                self.desktop.terminate()
+            except Exception:
+                pass
+            self.desktop = None
+        if self.process is not None:
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                # The whole group, so a soffice.bin still starting up is not left orphaned.
+                self.kill()
+                self.process.wait()
+            self.process = None
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+
+class OfficePool:
+    def __init__(self, size=None, max_jobs_per_worker=200, base_dir=None):
+        """
+        Initialize a pool of long-lived headless LibreOffice workers.
+
+        Workers are started lazily, handed out to one conversion at a time and
+        recycled after ``max_jobs_per_worker`` conversions or whenever a
+        conversion fails, so a leaking or crashed office process never
+        outlives the job that broke it.
+
+        Args:
+            size (int, optional): The number of office workers. Defaults to half the CPU count.
+            max_jobs_per_worker (int, optional): Conversions after which a worker is restarted. Defaults to 200.
+            base_dir (str, optional): The directory holding worker profiles. Defaults to a fresh temp directory.
+        """
+        self.size = size or max(1, cpu_count() // 2)
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self._owns_base_dir = base_dir is None
+        self.base_dir = base_dir or tempfile.mkdtemp(prefix='ppt-img-conv-office-')
+        self._idle = []
+        self._available = threading.Condition()
+        self._started = 0
+        self._closed = False
+
+    @staticmethod
+    def is_available():
+        """
+        Check whether the LibreOffice UNO bindings and ``soffice`` are usable.
+
+        Returns:
+            bool: True if a pool can be started, False otherwise.
+        """
+        if shutil.which('soffice') is None:
+            return False
+        try:
+            import uno  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def _acquire(self):
+        with self._available:
+            while True:
+                if self._closed:
+                    raise RuntimeError("OfficePool is closed")
+                if self._idle:
+                    return self._idle.pop()
+                if self._started < self.size:
+                    self._started += 1
+                    break
+                self._available.wait()
+        worker = OfficeWorker(self.base_dir)
+        try:
+            worker.start()
+        except Exception:
+            worker.stop()
+            with self._available:
+                self._started -= 1
+                self._available.notify()
+            raise
+        return worker
+
+    def _release(self, worker, healthy):
+        recycle = (self._closed or not healthy or worker.jobs_done >= self.max_jobs_per_worker
+                   or not worker.is_alive())
+        if recycle:
+            worker.stop()
+        with self._available:
+            if recycle:
+                self._started -= 1
+            else:
+                self._idle.append(worker)
+            self._available.notify()
+
+    def convert(self, ppt_path, pdf_path, timeout=None):
+        """
+        Convert a presentation to PDF on an idle worker.
+
+        Args:
+            ppt_path (str): The path to the PowerPoint file.
+            pdf_path (str): The path where the PDF will be written.
+            timeout (float, optional): Seconds after which the worker is killed. Defaults to None (no limit).
+
+        Raises:
+            TimeoutError: If the conversion did not finish in time.
+            Exception: For errors during the conversion; the worker that failed is recycled.
+        """
+        worker = self._acquire()
+        healthy = False
+        timer = None
+        if timeout is not None:
+            timer = threading.Timer(timeout, worker.kill)
+            timer.daemon = True
+            timer.start()
+        try:
+            worker.convert(ppt_path, pdf_path)
+            healthy = True
+        except Exception as e:
+            if timer is not None and not timer.is_alive():
+                message = f"Office worker {worker.worker_id} timed out after {timeout:.0f}s on {ppt_path}"
+                print(message)
+                raise TimeoutError(message) from e
+            print(f"Office worker {worker.worker_id} failed on {ppt_path}: {e}")
+            raise
+        finally:
+            if timer is not None:
+                timer.cancel()
+            self._release(worker, healthy)
+
+    def close(self):
+        """
+        Stop all idle workers and remove the pool's profile directory.
+        """
+        with self._available:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._available.notify_all()
+        for worker in idle:
+            worker.stop()
+        if self._owns_base_dir:
+            shutil.rmtree(self.base_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
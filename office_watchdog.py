@@ -0,0 +1,321 @@
+import contextlib
+import fcntl
+import json
+import os
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+
+from journal import RunJournal
+from metrics import Metrics
+
+
+class QuarantinedError(RuntimeError):
+    """Raised for a deck that failed too often to be given to LibreOffice again."""
+
+
+def _group_cpu_ticks(pgid):
+    """
+    Sum the CPU time used by the live processes of a process group.
+
+    Returns:
+        int: Clock ticks of user and system time, or None where ``/proc`` is unavailable.
+    """
+    total, found = 0, False
+    try:
+        entries = os.listdir('/proc')
+    except OSError:
+        return None
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The command name may contain spaces; fields resume after its closing parenthesis.
+                fields = f.read().rsplit(')', 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        if int(fields[2]) == pgid:
+            found = True
+            total += int(fields[11]) + int(fields[12])
+    return total if found else None
+
+
+class _Attempt:
+    def __init__(self, ppt_path, work_dir):
+        self.outdir = tempfile.mkdtemp(prefix='.soffice-', dir=work_dir)
+        self.profile_dir = os.path.join(self.outdir, 'profile')
+        self.output = os.path.join(self.outdir, os.path.splitext(os.path.basename(ppt_path))[0] + '.pdf')
+        command = ['soffice', '--headless', '--norestore',
+                   f'-env:UserInstallation=file://{os.path.abspath(self.profile_dir)}',
+                   '--convert-to', 'pdf', ppt_path, '--outdir', self.outdir]
+        self.started = time.monotonic()
+        # A session of its own lets the whole group, soffice.bin included, be killed at once.
+        self.process = subprocess.Popen(command, start_new_session=True)
+        self.cpu_ticks = None
+        self.cpu_changed = self.started
+
+    def kill(self):
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        self.process.wait()
+
+
+class SofficeWatchdog:
+    def __init__(self, base_timeout=120, seconds_per_mb=20, max_timeout=1800, stall_timeout=None, retries=1,
+                 quarantine_path=None, quarantine_after=2, speculate_after=None, poll_interval=0.5):
+        """
+        Supervise LibreOffice conversions so one malformed deck cannot stall a batch.
+
+        Each one-shot conversion runs in its own process group with a private
+        profile and output directory. It is killed when it exceeds a timeout
+        that grows with the deck's size, or when the group stops using CPU
+        for ``stall_timeout`` seconds, and its group is always killed once it
+        is done so no orphaned ``soffice.bin`` survives. Failed conversions
+        are retried a bounded number of times; decks that keep failing are
+        recorded in a quarantine and refused afterwards until they change.
+        With ``speculate_after``, a conversion still running after that many
+        seconds gets a second soffice on the same deck and the first PDF wins.
+        Office pool conversions get the timeout, retries and quarantine;
+        ``OfficeBatchConverter`` uses ``batch_timeout``, ``is_quarantined`` and
+        ``record`` for batched invocations.
+
+        Args:
+            base_timeout (float, optional): Seconds allowed for any deck. Defaults to 120.
+            seconds_per_mb (float, optional): Extra seconds per MiB of PPTX. Defaults to 20.
+            max_timeout (float, optional): The cap on the scaled timeout. Defaults to 1800.
+            stall_timeout (float, optional): Seconds without CPU progress after which soffice counts as hung.
+                Defaults to None (off).
+            retries (int, optional): Further attempts after a failed one. Defaults to 1.
+            quarantine_path (str, optional): A JSON file keeping quarantine records across runs and processes that
+                share it, updated under a lock file beside it. Defaults to None,
+                which keeps them in memory.
+            quarantine_after (int, optional): Failed conversions, each after all retries, before a deck is
+                quarantined. Defaults to 2.
+            speculate_after (float, optional): Seconds after which a straggler is launched a second time.
+                Defaults to None (off).
+            poll_interval (float, optional): Seconds between checks on running conversions. Defaults to 0.5.
+        """
+        self.base_timeout = base_timeout
+        self.seconds_per_mb = seconds_per_mb
+        self.max_timeout = max_timeout
+        self.stall_timeout = stall_timeout
+        self.retries = max(0, retries)
+        self.quarantine_path = quarantine_path
+        self.quarantine_after = max(1, quarantine_after)
+        self.speculate_after = speculate_after
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._quarantine = {}
+
+    @contextlib.contextmanager
+    def _locked(self, shared=False):
+        """
+        Hold the quarantine lock of this process and, with a quarantine file, of every process sharing it.
+
+        Yields:
+            dict: The current quarantine records, re-read from the file when there is one.
+        """
+        with self._lock:
+            if self.quarantine_path is None:
+                yield self._quarantine
+                return
+            with open(f"{self.quarantine_path}.lock", 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+                try:
+                    with open(self.quarantine_path) as f:
+                        self._quarantine = json.load(f)
+                except (OSError, ValueError):
+                    self._quarantine = {}
+                try:
+                    yield self._quarantine
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def timeout_for(self, ppt_path):
+        """
+        Get the time a deck may take to convert.
+
+        Args:
+            ppt_path (str): The path to the PowerPoint file.
+
+        Returns:
+            float: The timeout in seconds.
+        """
+        return self.batch_timeout([ppt_path])
+
+    def batch_timeout(self, ppt_paths):
+        """
+        Get the time one soffice invocation converting several decks may take.
+
+        Args:
+            ppt_paths (iterable): The paths to the PowerPoint files.
+
+        Returns:
+            float: The timeout in seconds, scaled by the decks' combined size.
+        """
+        size_mb = sum(os.path.getsize(ppt_path) for ppt_path in ppt_paths) / (1024 * 1024)
+        return min(self.max_timeout, self.base_timeout + self.seconds_per_mb * size_mb)
+
+    def is_quarantined(self, ppt_path):
+        """
+        Check whether a deck, in its current state, failed too often to be tried again.
+
+        Args:
+            ppt_path (str): The path to the PowerPoint file.
+
+        Returns:
+            bool: True if the deck is quarantined.
+        """
+        with self._locked(shared=True) as quarantine:
+            record = quarantine.get(os.path.abspath(ppt_path))
+        return (record is not None and record['failures'] >= self.quarantine_after
+                and record['source'] == RunJournal.source_state(ppt_path))
+
+    def record(self, ppt_path, error):
+        """
+        Record the outcome of converting a deck outside ``convert``, e.g. in a batched soffice invocation.
+
+        Args:
+            ppt_path (str): The path to the PowerPoint file.
+            error (Exception): Why the deck failed after all attempts, or None if it converted, which clears
+                its quarantine record.
+        """
+        key = os.path.abspath(ppt_path)
+        source = RunJournal.source_state(ppt_path)
+        # The file is re-read under the lock, so records other processes wrote meanwhile are kept.
+        with self._locked() as quarantine:
+            if error is None:
+                if quarantine.pop(key, None) is None:
+                    return
+            else:
+                record = quarantine.get(key)
+                if record is None or record['source'] != source:
+                    record = quarantine[key] = {'source': source, 'failures': 0}
+                record['failures'] += 1
+                record['error'] = str(error)
+            if self.quarantine_path is not None:
+                tmp_path = f"{self.quarantine_path}.{uuid.uuid4().hex}.tmp"
+                with open(tmp_path, 'w') as f:
+                    json.dump(quarantine, f, indent=1)
+                os.replace(tmp_path, self.quarantine_path)
+
+    @staticmethod
+    def _remove_stale_lock(ppt_path):
+        # LibreOffice leaves ``.~lock.<name>#`` beside a document it had open when it was killed.
+        directory, name = os.path.split(os.path.abspath(ppt_path))
+        lock_path = os.path.join(directory, f".~lock.{name}#")
+        if os.path.exists(lock_path):
+            os.remove(lock_path)
+
+    def _check_stall(self, attempt, now):
+        if self.stall_timeout is None:
+            return False
+        ticks = _group_cpu_ticks(attempt.process.pid)
+        if ticks is None or ticks != attempt.cpu_ticks:
+            attempt.cpu_ticks, attempt.cpu_changed = ticks, now
+            return False
+        return now - attempt.cpu_changed > self.stall_timeout
+
+    def _run_once(self, ppt_path, pdf_path, metrics, deck):
+        """
+        Make one supervised attempt at converting a deck, speculating on a straggler if enabled.
+
+        Returns:
+            Exception: Why the attempt failed, or None if the PDF is in place.
+        """
+        timeout = self.timeout_for(ppt_path)
+        work_dir = os.path.dirname(os.path.abspath(pdf_path))
+        attempts = [_Attempt(ppt_path, work_dir)]
+        running = list(attempts)
+        error = None
+        try:
+            while running:
+                now = time.monotonic()
+                for attempt in list(running):
+                    returncode = attempt.process.poll()
+                    if returncode is not None:
+                        running.remove(attempt)
+                        if os.path.isfile(attempt.output):
+                            os.replace(attempt.output, pdf_path)
+                            if attempt is not attempts[0]:
+                                metrics.incr('soffice_speculative_wins', deck=deck)
+                            return None
+                        error = (subprocess.CalledProcessError(returncode, attempt.process.args) if returncode
+                                 else RuntimeError(f"soffice produced no PDF for {ppt_path}"))
+                    elif now - attempt.started > timeout:
+                        print(f"soffice timed out after {timeout:.0f}s on {ppt_path}; killing it")
+                        metrics.incr('soffice_timeouts', deck=deck)
+                        attempt.kill()
+                        running.remove(attempt)
+                        error = subprocess.TimeoutExpired(attempt.process.args, timeout)
+                    elif self._check_stall(attempt, now):
+                        print(f"soffice made no progress for {self.stall_timeout:.0f}s on {ppt_path}; killing it")
+                        metrics.incr('soffice_hangs', deck=deck)
+                        attempt.kill()
+                        running.remove(attempt)
+                        error = TimeoutError(f"soffice hung on {ppt_path}")
+                if (self.speculate_after is not None and len(attempts) == 1 and running
+                        and now - attempts[0].started > self.speculate_after):
+                    print(f"soffice is slow on {ppt_path}; launching a speculative second conversion")
+                    metrics.incr('soffice_speculative', deck=deck)
+                    attempts.append(_Attempt(ppt_path, work_dir))
+                    running.append(attempts[-1])
+                if running:
+                    time.sleep(self.poll_interval)
+            return error
+        finally:
+            for attempt in attempts:
+                # Also reaps anything the launcher left running in its group after it exited.
+                attempt.kill()
+                shutil.rmtree(attempt.outdir, ignore_errors=True)
+            self._remove_stale_lock(ppt_path)
+
+    def convert(self, ppt_path, pdf_path, office_pool=None, metrics=None, deck=None):
+        """
+        Convert a deck to PDF under supervision.
+
+        Args:
+            ppt_path (str): The path to the PowerPoint file.
+            pdf_path (str): The path where the PDF will be written; its directory holds the attempts' scratch
+                directories.
+            office_pool (OfficePool, optional): Convert on warm workers instead of one-shot soffice processes.
+                Defaults to None.
+            metrics (Metrics, optional): Receives retry, timeout, hang, speculation and quarantine counters.
+                Defaults to a Metrics without sinks.
+            deck (str, optional): The deck label for metrics. Defaults to None.
+
+        Raises:
+            QuarantinedError: If the deck is quarantined.
+            Exception: The error of the last attempt when every attempt failed.
+        """
+        metrics = metrics or Metrics()
+        if self.is_quarantined(ppt_path):
+            metrics.incr('soffice_quarantined', deck=deck)
+            raise QuarantinedError(f"{ppt_path} is quarantined after repeated conversion failures")
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                print(f"Retrying conversion of {ppt_path} ({attempt}/{self.retries}) after: {error}")
+                metrics.incr('soffice_retries', deck=deck)
+            if office_pool is not None:
+                try:
+                    office_pool.convert(ppt_path, pdf_path, timeout=self.timeout_for(ppt_path))
+                    error = None
+                except Exception as e:
+                    error = e
+            else:
+                error = self._run_once(ppt_path, pdf_path, metrics, deck)
+            if error is None:
+                self.record(ppt_path, None)
+                return
+        self.record(ppt_path, error)
+        if self.is_quarantined(ppt_path):
+            print(f"Quarantining {ppt_path} after repeated conversion failures")
+        raise error
@@ -0,0 +1,135 @@
+import queue
+import threading
+
+from utils import FileUtils
+
+_DONE = object()
+
+
+class DeckPipeline:
+    def __init__(self, office_concurrency=1, render_concurrency=1, queue_size=4, office_batcher=None):
+        """
+        Initialize a two-stage producer/consumer pipeline over many decks.
+
+        The office stage converts PPTX files to PDF while the render stage
+        rasterizes decks that are already converted, so neither stage waits
+        for the other to finish a deck. Bounded queues between the stages keep
+        the office stage from running arbitrarily far ahead of rendering.
+
+        Args:
+            office_concurrency (int, optional): Decks converted to PDF at once. One-shot soffice processes
+                each get a private user profile, which they set up on every start, so more than 1 mainly pays
+                off with an OfficePool of at least this size. Defaults to 1.
+            render_concurrency (int, optional): Decks rasterized at once. Defaults to 1.
+            queue_size (int, optional): The capacity of each queue between stages. Defaults to 4.
+            office_batcher (OfficeBatchConverter, optional): Convert the decks waiting for the office stage
+                together in batched soffice invocations instead of one at a time. Defaults to None.
+        """
+        self.office_concurrency = max(1, office_concurrency)
+        self.render_concurrency = max(1, render_concurrency)
+        self.queue_size = queue_size
+        self.office_batcher = office_batcher
+
+    def _next_batch(self, office_queue):
+        batch = [office_queue.get()]
+        while batch[-1] is not _DONE and len(batch) < self.office_batcher.max_files:
+            try:
+                batch.append(office_queue.get_nowait())
+            except queue.Empty:
+                break
+        done = batch[-1] is _DONE
+        return (batch[:-1] if done else batch), done
+
+    def _office_batch_stage(self, office_queue, render_queue, failures):
+        done = False
+        while not done:
+            batch, done = self._next_batch(office_queue)
+            if not batch:
+                continue
+            converted = set()
+
+            def on_converted(converter):
+                converted.add(converter.ppt_path)
+                render_queue.put(converter)
+
+            try:
+                failures.update(self.office_batcher.convert(batch, on_converted=on_converted))
+            except Exception as e:
+                print(f"Error occurred while converting a batch of {len(batch)} decks: {e}")
+                failures.update({converter.ppt_path: e for converter in batch
+                                 if converter.ppt_path not in converted})
+
+    def _office_single_stage(self, office_queue, render_queue, failures):
+        while True:
+            converter = office_queue.get()
+            if converter is _DONE:
+                break
+            try:
+                converter.ppt_to_pdf()
+                if FileUtils.check_file_exists(converter.pdf_path):
+                    render_queue.put(converter)
+                else:
+                    print(f"PDF file {converter.pdf_path} does not exist.")
+                    failures[converter.ppt_path] = FileNotFoundError(converter.pdf_path)
+            except Exception as e:
+                print(f"Error occurred while converting {converter.ppt_path}: {e}")
+                failures[converter.ppt_path] = e
+
+    def _office_stage(self, office_queue, render_queue, failures, remaining, lock):
+        if self.office_batcher is not None:
+            self._office_batch_stage(office_queue, render_queue, failures)
+        else:
+            self._office_single_stage(office_queue, render_queue, failures)
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            for _ in range(self.render_concurrency):
+                render_queue.put(_DONE)
+
+    def _render_stage(self, render_queue, failures):
+        while True:
+            converter = render_queue.get()
+            if converter is _DONE:
+                break
+            try:
+                converter.process_pdf_pages()
+            except Exception as e:
+                print(f"Error occurred while rendering {converter.pdf_path}: {e}")
+                failures[converter.ppt_path] = e
+            finally:
+                converter.metrics.flush()
+
+    def run(self, converters):
+        """
+        Run every converter through both stages.
+
+        Args:
+            converters (iterable): PPTConverter instances, consumed lazily as the office stage has room.
+
+        Returns:
+            dict: A mapping of PPTX path to the exception that stopped it, for decks that failed.
+        """
+        office_queue = queue.Queue(maxsize=max(self.queue_size, self.office_batcher.max_files
+                                               if self.office_batcher is not None else 0))
+        render_queue = queue.Queue(maxsize=self.queue_size)
+        failures = {}
+        remaining = [self.office_concurrency]
+        lock = threading.Lock()
+
+        threads = [threading.Thread(target=self._office_stage,
+                                    args=(office_queue, render_queue, failures, remaining, lock), daemon=True)
+                   for _ in range(self.office_concurrency)]
+        threads += [threading.Thread(target=self._render_stage, args=(render_queue, failures), daemon=True)
+                    for _ in range(self.render_concurrency)]
+        for thread in threads:
+            thread.start()
+        try:
+            for converter in converters:
+                office_queue.put(converter)
+        finally:
+            for _ in range(self.office_concurrency):
+                office_queue.put(_DONE)
+            for thread in threads:
+                thread.join()
+        return failures
@@ -0,0 +1,159 @@
+import os
+import posixpath
+import uuid
+import zipfile
+
+from collections import namedtuple
+from xml.etree import ElementTree
+from utils import FileUtils
+
+_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+_PRESENTATION_NS = '{http://schemas.openxmlformats.org/presentationml/2006/main}'
+_R_ID = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id'
+
+DeckPreview = namedtuple('DeckPreview', ['slide_count', 'thumbnail', 'media'])
+DeckPreview.__doc__ = """What a PPTX shows without rendering: slide count, thumbnail member name (or None) and media."""
+
+MediaEntry = namedtuple('MediaEntry', ['name', 'size', 'slides'])
+MediaEntry.__doc__ = """An embedded media member, its uncompressed size and the 1-based slides referencing it directly."""
+
+
+def _rels_path(part):
+    directory, name = posixpath.split(part)
+    return posixpath.join(directory, '_rels', f"{name}.rels")
+
+
+def _relationships(archive, part):
+    """
+    Read the relationships of a package part.
+
+    Returns:
+        list: ``(id, type, target)`` tuples with targets resolved to member names.
+    """
+    try:
+        root = ElementTree.fromstring(archive.read(_rels_path(part)))
+    except KeyError:
+        return []
+    base = posixpath.dirname(part)
+    relationships = []
+    for rel in root.iter(f'{_REL_NS}Relationship'):
+        if rel.get('TargetMode') == 'External':
+            continue
+        target = rel.get('Target', '')
+        target = target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join(base, target))
+        relationships.append((rel.get('Id'), rel.get('Type', ''), target))
+    return relationships
+
+
+def read_deck_preview(ppt_path, with_media=True):
+    """
+    Read a deck's thumbnail, slide count and embedded media straight from the PPTX zip.
+
+    Only the zip directory and a few small XML parts are read; images are
+    not decompressed. Slides are counted and ordered from the
+    presentation's slide list, falling back to the slide parts in the
+    archive when it cannot be read.
+
+    Args:
+        ppt_path (str): The path to the PowerPoint file.
+        with_media (bool, optional): Also list media under ``ppt/media/`` and the slides using them. Defaults to True.
+
+    Returns:
+        DeckPreview: The preview.
+
+    Raises:
+        zipfile.BadZipFile: If the file is not a zip container.
+    """
+    with zipfile.ZipFile(ppt_path) as archive:
+        names = set(archive.namelist())
+
+        thumbnail = None
+        for _, rel_type, target in _relationships(archive, ''):
+            if rel_type.endswith('/metadata/thumbnail') and target in names:
+                thumbnail = target
+        if thumbnail is None and 'docProps/thumbnail.jpeg' in names:
+            thumbnail = 'docProps/thumbnail.jpeg'
+
+        presentation = 'ppt/presentation.xml'
+        for _, rel_type, target in _relationships(archive, ''):
+            if rel_type.endswith('/officeDocument'):
+                presentation = target
+        slide_parts = []
+        try:
+            targets = {rel_id: target for rel_id, _, target in _relationships(archive, presentation)}
+            root = ElementTree.fromstring(archive.read(presentation))
+            slide_parts = [targets[slide.get(_R_ID)] for slide in root.iter(f'{_PRESENTATION_NS}sldId')
+                           if slide.get(_R_ID) in targets]
+        except (KeyError, ElementTree.ParseError):
+            pass
+        if not slide_parts:
+            slide_parts = sorted((name for name in names
+                                  if posixpath.dirname(name) == 'ppt/slides' and name.endswith('.xml')),
+                                 key=lambda name: int(''.join(filter(str.isdigit, posixpath.basename(name))) or 0))
+
+        media = []
+        if with_media:
+            used_by = {}
+            for number, part in enumerate(slide_parts, start=1):
+                for _, _, target in _relationships(archive, part):
+                    if target.startswith('ppt/media/'):
+                        used_by.setdefault(target, []).append(number)
+            media = [MediaEntry(info.filename, info.file_size, tuple(sorted(set(used_by.get(info.filename, ())))))
+                     for info in archive.infolist()
+                     if info.filename.startswith('ppt/media/') and not info.is_dir()]
+    return DeckPreview(len(slide_parts), thumbnail, media)
+
+
+def read_member(ppt_path, name):
+    """
+    Read one member of a PPTX without extracting the rest.
+
+    Args:
+        ppt_path (str): The path to the PowerPoint file.
+        name (str): The member name, e.g. a thumbnail or media name from ``read_deck_preview``.
+
+    Returns:
+        bytes: The member's contents.
+    """
+    with zipfile.ZipFile(ppt_path) as archive:
+        return archive.read(name)
+
+
+def extract_preview(ppt_path, output_dir, preview=None, with_media=True):
+    """
+    Write a deck's thumbnail and embedded media into a directory.
+
+    Files are written to a temporary name and renamed into place, so
+    readers never see partial files.
+
+    Args:
+        ppt_path (str): The path to the PowerPoint file.
+        output_dir (str): The destination directory.
+        preview (DeckPreview, optional): A preview already read from ppt_path. Defaults to None.
+        with_media (bool, optional): Also write the media files. Defaults to True.
+
+    Returns:
+        list: The paths written.
+    """
+    preview = preview or read_deck_preview(ppt_path, with_media=with_media)
+    members = []
+    if preview.thumbnail:
+        members.append((preview.thumbnail, 'thumbnail' + posixpath.splitext(preview.thumbnail)[1]))
+    if with_media:
+        members.extend((entry.name, posixpath.join('media', posixpath.basename(entry.name)))
+                       for entry in preview.media)
+    paths = []
+    with zipfile.ZipFile(ppt_path) as archive:
+        for name, relative in members:
+            path = os.path.join(output_dir, *relative.split('/'))
+            FileUtils.create_directory_if_not_exists(os.path.dirname(path))
+            tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            with archive.open(name) as source, open(tmp_path, 'wb') as target:
+                while True:
+                    block = source.read(1024 * 1024)
+                    if not block:
+                        break
+                    target.write(block)
+            os.replace(tmp_path, path)
+            paths.append(path)
+    return paths
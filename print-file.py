@@ -11,10 +11,50 @@ def print_file(file_path):
         print(f"Error printing file: {e}")
         exit(1)
 
+def print_batch(file_paths, max_in_flight=4, job_timeout=300, outfile_dir=None, output_root=None, dpi=200):
+    """
+    Print files to CUPS-PDF in a batch and render each PDF as soon as it lands.
+
+    Args:
+        file_paths (list): The files to print.
+        max_in_flight (int, optional): Jobs queued in CUPS at once. Defaults to 4.
+        job_timeout (float, optional): Seconds a job may take to produce its PDF. Defaults to 300.
+        outfile_dir (str, optional): The cups-pdf output directory. Defaults to the one in cups-pdf.conf.
+        output_root (str, optional): Where ``<name>/slide-NNNN.png`` are written. Defaults to ``images`` beside
+            each file.
+        dpi (int, optional): The rendering resolution. Defaults to 200.
+
+    Returns:
+        bool: True if every file was printed and rendered.
+    """
+    from cups.print_queue import PrintQueue
+
+    queue = PrintQueue(outfile_dir=outfile_dir, max_in_flight=max_in_flight, job_timeout=job_timeout)
+    results = queue.run(file_paths, output_root=output_root, dpi=dpi)
+    failed = [path for path, result in results.items() if isinstance(result, Exception)]
+    for path in failed:
+        print(f"Failed: {path}: {results[path]}")
+    print(f"Printed and rendered {len(results) - len(failed)} of {len(results)} files.")
+    return not failed
+
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python print_file.py <file_path>")
-        sys.exit(1)
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Print files to the CUPS-PDF printer.")
+    parser.add_argument("files", nargs="+", help="Files to print")
+    parser.add_argument("--batch", action="store_true",
+                        help="Track the jobs, wait for their PDFs in the cups-pdf output directory and render them "
+                             "to images (implied by several files)")
+    parser.add_argument("--max-in-flight", type=int, default=4, help="Jobs queued in CUPS at once (default: 4)")
+    parser.add_argument("--job-timeout", type=float, default=300,
+                        help="Seconds a job may take to produce its PDF before it is cancelled (default: 300)")
+    parser.add_argument("--outfile-dir", help="The cups-pdf output directory (default: Out in cups-pdf.conf)")
+    parser.add_argument("--output-root", help="Directory for rendered images (default: images beside each file)")
+    parser.add_argument("--dpi", type=int, default=200, help="Rendering resolution in DPI (default: 200)")
+    args = parser.parse_args()
 
-    file_path = sys.argv[1]
-    print_file(file_path)
\ No newline at end of file
+    if len(args.files) == 1 and not args.batch:
+        print_file(args.files[0])
+    elif not print_batch(args.files, max_in_flight=args.max_in_flight, job_timeout=args.job_timeout,
+                         outfile_dir=args.outfile_dir, output_root=args.output_root, dpi=args.dpi):
+        sys.exit(1)
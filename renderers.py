@@ -0,0 +1,256 @@
+import fitz
+
+from PIL import Image
+
+from document import page_text
+
+
+class PyMuPDFRenderer:
+    name = 'pymupdf'
+
+    def __init__(self, pdf_path, dpi=200, zoom=None):
+        """
+        Open a PDF once and rasterize its pages in-process with PyMuPDF.
+
+        Rendering is pinned to an RGB pixmap without alpha at a fixed
+        anti-aliasing level, so the same page at the same settings produces
+        the same pixels regardless of which worker renders it.
+
+        Args:
+            pdf_path (str): The path to the PDF file.
+            dpi (int, optional): The target resolution. Defaults to 200.
+            zoom (float, optional): A scale factor relative to 72 DPI. Overrides dpi when given. Defaults to None.
+        """
+        self.pdf_path = pdf_path
+        self.zoom = zoom if zoom is not None else dpi / 72.0
+        self.matrix = fitz.Matrix(self.zoom, self.zoom)
+        fitz.TOOLS.set_aa_level(8)
+        self.document = fitz.open(pdf_path)
+
+    @property
+    def page_count(self):
+        return self.document.page_count
+
+    def render_pixmap(self, page_number, clip=None):
+        """
+        Render a single page to a PyMuPDF pixmap.
+
+        Args:
+            page_number (int): The 1-based page number.
+            clip (fitz.Rect, optional): The region of the page to render, in page coordinates. Defaults to None.
+
+        Returns:
+            fitz.Pixmap: The rendered RGB pixmap.
+        """
+        page = self.document.load_page(page_number - 1)
+        return page.get_pixmap(matrix=self.matrix, colorspace=fitz.csRGB, alpha=False, clip=clip)
+
+    def render_page(self, page_number, zoom=None):
+        """
+        Render a single page to a PIL image.
+
+        Args:
+            page_number (int): The 1-based page number.
+            zoom (float, optional): Render at this scale instead of the renderer's own. Defaults to None.
+
+        Returns:
+            PIL.Image.Image: The rendered page.
+        """
+        if zoom is None:
+            pixmap = self.render_pixmap(page_number)
+        else:
+            page = self.document.load_page(page_number - 1)
+            pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csRGB, alpha=False)
+        return Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples)
+
+    def render_page_with_text(self, page_number):
+        """
+        Render a page and extract its text from a single interpretation of its content.
+
+        The page is recorded to a display list once; the pixmap and the text
+        are both produced by replaying it, so text extraction does not parse
+        the content stream a second time.
+
+        Args:
+            page_number (int): The 1-based page number.
+
+        Returns:
+            tuple: ``(PIL.Image.Image, {'title': str, 'text': str})``.
+        """
+        display_list = self.document.load_page(page_number - 1).get_displaylist()
+        pixmap = display_list.get_pixmap(matrix=self.matrix, colorspace=fitz.csRGB, alpha=False)
+        textpage = display_list.get_textpage()
+        if not isinstance(textpage, fitz.TextPage):
+            textpage = fitz.TextPage(textpage)
+        return Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples), page_text(textpage)
+
+    def page_text(self, page_number):
+        """
+        Extract a page's text and title without rendering it.
+
+        Args:
+            page_number (int): The 1-based page number.
+
+        Returns:
+            dict: ``{'title': str, 'text': str}``.
+        """
+        return page_text(self.document.load_page(page_number - 1).get_textpage())
+
+    def page_pixel_size(self, page_number):
+        """
+        Get the size of a page's full rendering without rendering it.
+
+        Args:
+            page_number (int): The 1-based page number.
+
+        Returns:
+            tuple: ``(width, height)`` in pixels.
+        """
+        irect = (self.document.load_page(page_number - 1).rect * self.matrix).irect
+        return irect.width, irect.height
+
+    def render_bands(self, page_number, band_rows):
+        """
+        Render a page as a sequence of horizontal bands.
+
+        Only one band's pixmap exists at a time, so peak memory is bounded by
+        ``band_rows`` rather than by the page size. Concatenating the bands
+        gives the same rows as a full rendering of the page.
+
+        Args:
+            page_number (int): The 1-based page number.
+            band_rows (int): The number of pixel rows per band.
+
+        Yields:
+            bytes: Packed RGB rows, ``width * 3`` bytes per row, top to bottom.
+        """
+        page = self.document.load_page(page_number - 1)
+        full = (page.rect * self.matrix).irect
+        width, height = full.width, full.height
+        row_bytes = width * 3
+        for top in range(0, height, band_rows):
+            bottom = min(top + band_rows, height)
+            # Pad the clip by a pixel so rounding never leaves a gap; surplus rows are trimmed below.
+            clip = fitz.Rect(page.rect.x0, page.rect.y0 + (top - 1) / self.zoom,
+                             page.rect.x1, page.rect.y0 + (bottom + 1) / self.zoom) & page.rect
+            pixmap = page.get_pixmap(matrix=self.matrix, colorspace=fitz.csRGB, alpha=False, clip=clip)
+            samples, stride = pixmap.samples, pixmap.stride
+            offset = pixmap.y - full.y0
+            copy_bytes = min(row_bytes, pixmap.width * 3)
+            rows = []
+            for row in range(top, bottom):
+                data = b''
+                if 0 <= row - offset < pixmap.height:
+                    start = (row - offset) * stride
+                    data = samples[start:start + copy_bytes]
+                rows.append(data.ljust(row_bytes, b'\xff'))
+            del pixmap, samples
+            yield b''.join(rows)
+
+    def render_range(self, first_page, last_page):
+        """
+        Render a contiguous range of pages.
+
+        Args:
+            first_page (int): The first 1-based page number.
+            last_page (int): The last 1-based page number, inclusive.
+
+        Yields:
+            tuple: ``(page_number, PIL.Image.Image)`` for each page in the range.
+        """
+        for page_number in range(first_page, last_page + 1):
+            yield page_number, self.render_page(page_number)
+
+    def close(self):
+        self.document.close()
+
+
+class Pdf2ImageRenderer:
+    name = 'pdf2image'
+
+    def __init__(self, pdf_path, dpi=200, zoom=None):
+        """
+        Rasterize pages through pdf2image and poppler's ``pdftoppm``.
+
+        Kept as a fallback for PDFs that PyMuPDF renders incorrectly. Each
+        call spawns a ``pdftoppm`` process, so prefer ``render_range`` over
+        repeated ``render_page`` calls.
+
+        Args:
+            pdf_path (str): The path to the PDF file.
+            dpi (int, optional): The target resolution. Defaults to 200.
+            zoom (float, optional): A scale factor relative to 72 DPI. Overrides dpi when given. Defaults to None.
+        """
+        self.pdf_path = pdf_path
+        self.dpi = zoom * 72.0 if zoom is not None else dpi
+
+    @property
+    def page_count(self):
+        from pdf2image import pdfinfo_from_path
+
+        return pdfinfo_from_path(self.pdf_path)['Pages']
+
+    def render_page(self, page_number, zoom=None):
+        """
+        Render a single page to a PIL image.
+
+        Args:
+            page_number (int): The 1-based page number.
+            zoom (float, optional): Render at this scale instead of the renderer's own. Defaults to None.
+
+        Returns:
+            PIL.Image.Image: The rendered page.
+        """
+        from pdf2image import convert_from_path
+
+        dpi = zoom * 72.0 if zoom is not None else self.dpi
+        return convert_from_path(self.pdf_path, dpi=dpi, first_page=page_number, last_page=page_number)[0]
+
+    def render_range(self, first_page, last_page):
+        """
+        Render a contiguous range of pages with a single ``pdftoppm`` call.
+
+        Args:
+            first_page (int): The first 1-based page number.
+            last_page (int): The last 1-based page number, inclusive.
+
+        Yields:
+            tuple: ``(page_number, PIL.Image.Image)`` for each page in the range.
+        """
+        from pdf2image import convert_from_path
+
+        images = convert_from_path(self.pdf_path, dpi=self.dpi, first_page=first_page, last_page=last_page)
+        for offset, image in enumerate(images):
+            yield first_page + offset, image
+
+    def close(self):
+        pass
+
+
+RENDERERS = {
+    PyMuPDFRenderer.name: PyMuPDFRenderer,
+    Pdf2ImageRenderer.name: Pdf2ImageRenderer,
+}
+
+
+def get_renderer(backend, pdf_path, dpi=200, zoom=None):
+    """
+    Create a renderer for the named backend.
+
+    Args:
+        backend (str): The backend name, ``'pymupdf'`` or ``'pdf2image'``.
+        pdf_path (str): The path to the PDF file.
+        dpi (int, optional): The target resolution. Defaults to 200.
+        zoom (float, optional): A scale factor relative to 72 DPI. Overrides dpi when given. Defaults to None.
+
+    Returns:
+        PyMuPDFRenderer | Pdf2ImageRenderer: The renderer.
+
+    Raises:
+        ValueError: If the backend name is unknown.
+    """
+    try:
+        renderer_class = RENDERERS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown rendering backend {backend!r}; expected one of {sorted(RENDERERS)}")
+    return renderer_class(pdf_path, dpi=dpi, zoom=zoom)
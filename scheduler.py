@@ -0,0 +1,127 @@
+import math
+
+from multiprocessing import cpu_count
+
+# Rough cost model for rasterizing and encoding one page, calibrated on 16:9
+# slides with PyMuPDF: about 25 ms per output megapixel.
+SECONDS_PER_MEGAPIXEL = 0.025
+# Starting a pool worker and opening the document in it costs about this much.
+WORKER_STARTUP_SECONDS = 0.15
+# Do not start a worker unless it gets at least this much estimated work.
+MIN_SECONDS_PER_WORKER = 4 * WORKER_STARTUP_SECONDS
+# Target chunks per worker, so uneven pages still balance across the pool.
+CHUNKS_PER_WORKER = 4
+# Keep chunks large enough that per-task overhead stays negligible.
+MIN_SECONDS_PER_CHUNK = 0.25
+
+
+def estimate_page_seconds(page_width, page_height, zoom):
+    """
+    Estimate the time needed to render and encode one page.
+
+    Args:
+        page_width (float): The page width in PDF points.
+        page_height (float): The page height in PDF points.
+        zoom (float): The scale factor relative to 72 DPI.
+
+    Returns:
+        float: The estimated seconds per page.
+    """
+    megapixels = (page_width * zoom) * (page_height * zoom) / 1e6
+    return max(megapixels, 0.01) * SECONDS_PER_MEGAPIXEL
+
+
+def plan_page_chunks(num_pages, page_width, page_height, zoom, cores=None, pages=None):
+    """
+    Split a document into contiguous page ranges for the render pool.
+
+    The number of workers is chosen so each one gets enough estimated work to
+    pay for its startup, and the chunk size so there are a few chunks per
+    worker for load balancing. A single returned chunk means the document
+    should be rendered serially.
+
+    Args:
+        num_pages (int): The number of pages in the document.
+        page_width (float): The page width in PDF points.
+        page_height (float): The page height in PDF points.
+        zoom (float): The scale factor relative to 72 DPI.
+        cores (int, optional): The number of available processes. Defaults to the CPU count.
+        pages (list, optional): Sorted 1-based page numbers to render, when only some pages are needed.
+            Defaults to every page.
+
+    Returns:
+        tuple: ``(workers, chunks)`` where chunks is a list of ``(first_page, last_page)`` 1-based inclusive ranges.
+    """
+    if pages is None:
+        pages = range(1, num_pages + 1)
+    if not pages:
+        return 0, []
+    cores = cores or cpu_count()
+    page_seconds = estimate_page_seconds(page_width, page_height, zoom)
+    total_seconds = page_seconds * len(pages)
+
+    workers = min(cores, len(pages), int(total_seconds // MIN_SECONDS_PER_WORKER))
+    if workers <= 1:
+        chunk_size = len(pages)
+    else:
+        chunk_size = max(math.ceil(len(pages) / (workers * CHUNKS_PER_WORKER)),
+                         math.ceil(MIN_SECONDS_PER_CHUNK / page_seconds))
+        chunk_size = min(chunk_size, math.ceil(len(pages) / workers))
+
+    chunks = []
+    first = last = None
+    for page_number in pages:
+        if first is not None and page_number == last + 1 and page_number - first < chunk_size:
+            last = page_number
+            continue
+        if first is not None:
+            chunks.append((first, last))
+        first = last = page_number
+    chunks.append((first, last))
+    return max(1, min(workers, len(chunks))), chunks
+
+
+# A rendered page is held twice: as the renderer's pixmap and as the PIL image copied from it.
+COPIES_PER_PAGE = 2
+# Bands thinner than this spend more time in per-band setup than they save in memory.
+MIN_BAND_ROWS = 16
+
+
+def plan_memory(page_width_px, page_height_px, workers, max_pending, memory_budget=None):
+    """
+    Fit the number of pages in flight to a memory budget.
+
+    Each worker holds the page it is rendering plus up to ``max_pending``
+    pages waiting for or undergoing encoding. When even two whole pages per
+    worker do not fit, pages are rendered in horizontal bands instead, sized
+    so every worker's band buffers fit in its share of the budget.
+
+    Args:
+        page_width_px (int): The widest rendered page in pixels.
+        page_height_px (int): The tallest rendered page in pixels.
+        workers (int): The number of render processes planned.
+        max_pending (int): The number of pages each worker may queue for encoding.
+        memory_budget (int, optional): The budget in bytes for rendered pages across all workers. Defaults to None,
+            which leaves the plan unchanged.
+
+    Returns:
+        tuple: ``(workers, max_pending, page_budget, band_rows)``. page_budget is the per-worker byte budget and
+        band_rows the band height for pages exceeding it; both are None when the budget is unlimited or whole
+        pages fit.
+    """
+    if not memory_budget:
+        return workers, max_pending, None, None
+    workers = max(1, workers)
+    page_bytes = page_width_px * page_height_px * 3 * COPIES_PER_PAGE
+    pages_fit = memory_budget // max(1, page_bytes)
+    if pages_fit >= 2:
+        workers = max(1, min(workers, pages_fit // 2))
+        max_pending = max(1, min(max_pending, pages_fit // workers - 1))
+        return workers, max_pending, None, None
+
+    # A band exists as a pixmap, as packed rows and inside the compressor's buffers.
+    band_row_bytes = page_width_px * 3 * 3
+    workers = max(1, min(workers, memory_budget // (MIN_BAND_ROWS * band_row_bytes)))
+    page_budget = memory_budget // workers
+    band_rows = max(MIN_BAND_ROWS, page_budget // band_row_bytes)
+    return workers, 1, page_budget, band_rows
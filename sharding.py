@@ -0,0 +1,160 @@
+import os
+import re
+import shutil
+import time
+import uuid
+import zlib
+
+from journal import RunJournal
+from leases import LeaseManager
+
+
+def _link_tree(source_dir, target_dir):
+    """
+    Mirror a directory tree with hard links, copying where links are not possible.
+
+    The converter replaces files instead of writing into them, so the mirror
+    can be updated without touching the original.
+    """
+    for root, dirs, files in os.walk(source_dir):
+        target_root = os.path.join(target_dir, os.path.relpath(root, source_dir))
+        os.makedirs(target_root, exist_ok=True)
+        for name in files:
+            source, target = os.path.join(root, name), os.path.join(target_root, name)
+            try:
+                os.link(source, target)
+            except OSError:
+                shutil.copy2(source, target)
+
+
+def _remove_leftovers(directory, name):
+    """
+    Remove staging directories a dead worker left for an output or PDF name.
+    """
+    pattern = re.compile(rf"\.{re.escape(name)}\.[0-9a-f]{{12}}\.(staging|old|pdf)")
+    try:
+        entries = os.listdir(directory)
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        if pattern.fullmatch(entry):
+            print(f"Removing leftover {os.path.join(directory, entry)}")
+            shutil.rmtree(os.path.join(directory, entry), ignore_errors=True)
+
+
+class ShardedRun:
+    def __init__(self, directory, lease_dir=None, ttl=120, owner=None, poll_interval=None):
+        """
+        Share the decks of one input directory between worker processes on any number of hosts.
+
+        Every worker scans the same tree and claims decks through lease files
+        in ``lease_dir`` (see ``LeaseManager``), starting at a different
+        position per worker so they rarely contend. A claimed deck is
+        converted and rendered into private staging locations, which are
+        renamed into place only while the lease is still held; two workers
+        therefore never write the same output directory, and a worker that
+        lost its lease discards its work. Decks held by other workers are
+        retried until they are finished or their lease expires, so work of a
+        dead worker is picked up after ``ttl`` seconds.
+
+        Args:
+            directory (str): The input directory shared by all workers.
+            lease_dir (str, optional): The lease directory, which must be shared too.
+                Defaults to ``<directory>/images/.leases``.
+            ttl (float, optional): Seconds without a heartbeat after which a lease expires. Defaults to 120.
+            owner (str, optional): This worker's name in lease files. Defaults to ``<host>:<pid>``.
+            poll_interval (float, optional): Seconds between passes over decks held by other workers.
+                Defaults to a quarter of ttl, capped at 5 seconds.
+        """
+        self.directory = directory
+        self.lease_dir = lease_dir or os.path.join(directory, 'images', '.leases')
+        self.ttl = ttl
+        self.owner = owner
+        self.poll_interval = poll_interval if poll_interval is not None else min(5.0, ttl / 4)
+
+    def _key(self, converter):
+        return os.path.relpath(converter.ppt_path, self.directory).replace(os.sep, '/')
+
+    @staticmethod
+    def _state(converter):
+        return {'source': RunJournal.source_state(converter.ppt_path), 'settings': converter.output_settings}
+
+    def _process(self, converter, lease):
+        output_dir, pdf_path = converter.output_dir, converter.pdf_path
+        token = uuid.uuid4().hex[:12]
+        parent, name = os.path.split(os.path.abspath(output_dir))
+        pdf_parent, pdf_name = os.path.split(os.path.abspath(pdf_path))
+        # Holding the lease, anything staged for this deck belongs to a worker that lost it.
+        _remove_leftovers(parent, name)
+        _remove_leftovers(pdf_parent, pdf_name)
+        staging_dir = os.path.join(parent, f".{name}.{token}.staging")
+        pdf_dir = os.path.join(pdf_parent, f".{pdf_name}.{token}.pdf")
+        os.makedirs(pdf_dir)
+        try:
+            # Start from the committed slides so incremental rendering and deduplication keep working.
+            _link_tree(output_dir, staging_dir)
+            converter.output_dir = staging_dir
+            converter.pdf_path = os.path.join(pdf_dir, os.path.basename(pdf_path))
+            converter.ppt_to_pdf()
+            converter.process_pdf_pages()
+            if not lease.is_held():
+                raise RuntimeError(f"Lease on {lease.key} was lost; discarding its output")
+            os.replace(converter.pdf_path, pdf_path)
+            old_dir = os.path.join(parent, f".{name}.{token}.old")
+            if os.path.isdir(output_dir):
+                os.rename(output_dir, old_dir)
+            os.rename(staging_dir, output_dir)
+            shutil.rmtree(old_dir, ignore_errors=True)
+        finally:
+            converter.output_dir, converter.pdf_path = output_dir, pdf_path
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            shutil.rmtree(pdf_dir, ignore_errors=True)
+
+    def run(self, converters):
+        """
+        Process this worker's share of the decks.
+
+        Args:
+            converters (iterable): PPTConverter instances for every deck in the directory.
+
+        Returns:
+            dict: A mapping of PPTX path to the exception that stopped it, for decks that failed on this worker.
+        """
+        pending = list(converters)
+        failures = {}
+        leases = LeaseManager(self.lease_dir, ttl=self.ttl, owner=self.owner)
+        try:
+            if pending:
+                start = zlib.crc32(leases.owner.encode()) % len(pending)
+                pending = pending[start:] + pending[:start]
+            while pending:
+                held_elsewhere = []
+                for converter in pending:
+                    key, state = self._key(converter), self._state(converter)
+                    if leases.is_done(key, state):
+                        print(f"Skipping {key}, finished by another worker or an earlier run")
+                        continue
+                    lease = leases.claim(key)
+                    if lease is None:
+                        held_elsewhere.append(converter)
+                        continue
+                    finished = False
+                    try:
+                        # Another worker may have finished it between the check and the claim.
+                        if not leases.is_done(key, state):
+                            print(f"Claimed {key}")
+                            self._process(converter, lease)
+                        finished = True
+                    except Exception as e:
+                        print(f"Error occurred while processing {converter.ppt_path}: {e}")
+                        failures[converter.ppt_path] = e
+                    finally:
+                        leases.release(lease, state if finished else None)
+                if held_elsewhere:
+                    print(f"{len(held_elsewhere)} decks held by other workers; checking again "
+                          f"in {self.poll_interval:g}s")
+                    time.sleep(self.poll_interval)
+                pending = held_elsewhere
+        finally:
+            leases.close()
+        return failures
@@ -0,0 +1,114 @@
+from multiprocessing import shared_memory
+
+from PIL import Image
+
+
+class SharedPixmap:
+    def __init__(self, page_number, width, height, pixels, on_release=None):
+        """
+        A rendered page whose packed RGB rows live in memory owned by someone else.
+
+        Args:
+            page_number (int): The 1-based page number.
+            width (int): The width in pixels.
+            height (int): The height in pixels.
+            pixels (memoryview): ``width * height * 3`` bytes, row by row.
+            on_release (callable, optional): Called once when the pixels are released. Defaults to None.
+        """
+        self.page_number = page_number
+        self.width = width
+        self.height = height
+        self.pixels = pixels
+        self._on_release = on_release
+
+    def image(self):
+        """
+        Copy the page into a PIL image that stays valid after release.
+
+        Returns:
+            PIL.Image.Image: The page.
+        """
+        return Image.frombuffer('RGB', (self.width, self.height), self.pixels, 'raw', 'RGB', 0, 1)
+
+    def release(self):
+        """
+        Give the memory back. Reading ``pixels`` afterwards raises ValueError instead of seeing another page.
+        """
+        if self._on_release is not None:
+            self.pixels.release()
+            on_release, self._on_release = self._on_release, None
+            on_release()
+
+
+class PixmapRing:
+    def __init__(self, slots, slot_bytes, name=None):
+        """
+        Fixed-size slots in one shared memory block, for handing pixmaps between processes without pickling.
+
+        The parent creates the ring and decides which slot each render task
+        writes to; a slot is only handed out again once the consumer has
+        released the page in it, so the number of slots bounds the pages in
+        flight. Workers attach to the ring by name.
+
+        Args:
+            slots (int): The number of slots.
+            slot_bytes (int): The size of each slot; large enough for the largest page's pixmap.
+            name (str, optional): Attach to the existing ring with this name instead of creating one.
+                Defaults to None.
+        """
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        if name is None:
+            self.memory = shared_memory.SharedMemory(create=True, size=max(1, slots * slot_bytes))
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+        self.name = self.memory.name
+        self.owner = name is None
+
+    def _bounds(self, slot, size):
+        if not 0 <= slot < self.slots:
+            raise IndexError(f"Slot {slot} out of range for a ring of {self.slots}")
+        if size > self.slot_bytes:
+            raise ValueError(f"{size} bytes do not fit a slot of {self.slot_bytes}")
+        return slot * self.slot_bytes, slot * self.slot_bytes + size
+
+    def write(self, slot, data):
+        """
+        Copy a pixmap into a slot.
+
+        Args:
+            slot (int): The slot index.
+            data (bytes-like): The pixels.
+
+        Raises:
+            ValueError: If the data is larger than a slot.
+        """
+        start, end = self._bounds(slot, len(data))
+        self.memory.buf[start:end] = data
+
+    def view(self, slot, size):
+        """
+        Get a read-only view of the start of a slot, without copying.
+
+        Args:
+            slot (int): The slot index.
+            size (int): The number of bytes to view.
+
+        Returns:
+            memoryview: The view; release it before closing the ring.
+        """
+        start, end = self._bounds(slot, size)
+        return self.memory.buf[start:end].toreadonly()
+
+    def close(self):
+        """
+        Detach from the ring, and destroy it if this process created it.
+        """
+        try:
+            self.memory.close()
+        except BufferError:
+            # A consumer still holds a view; the mapping goes away with the last reference.
+            pass
+        if self.owner:
+            self.memory.unlink()
+            self.owner = False
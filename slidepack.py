@@ -0,0 +1,187 @@
+import json
+import mmap
+import os
+import struct
+import uuid
+
+PACK_NAME = 'slides.pack'
+
+# Layout: MAGIC, the entry blobs back to back, a JSON index mapping each name
+# to ``[offset, size]``, then a footer with the index's offset and size and
+# MAGIC again. Several names may point at the same blob.
+MAGIC = b'SLDPACK1'
+_FOOTER = struct.Struct('<QQ8s')
+
+
+class PackWriter:
+    def __init__(self, path):
+        """
+        Write a slide pack sequentially, one entry at a time.
+
+        The pack is written beside its final path and renamed into place on
+        close, so readers only ever see a complete pack.
+
+        Args:
+            path (str): The destination path.
+        """
+        self.path = path
+        self.entries = {}
+        self._tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        self._file = open(self._tmp_path, 'wb')
+        self._file.write(MAGIC)
+        self._offset = len(MAGIC)
+
+    def add(self, name, data):
+        """
+        Append an entry.
+
+        Args:
+            name (str): The entry name, e.g. ``slide-0001.png`` or ``thumb/slide-0001.webp``.
+            data (bytes-like): The entry's contents.
+        """
+        self._file.write(data)
+        self.entries[name] = [self._offset, len(data)]
+        self._offset += len(data)
+
+    def alias(self, name, existing):
+        """
+        Add an entry sharing the contents of one already written.
+
+        Args:
+            name (str): The new entry name.
+            existing (str): The name of an entry in this pack.
+        """
+        self.entries[name] = list(self.entries[existing])
+
+    def close(self):
+        """
+        Write the index and move the pack into place.
+
+        Returns:
+            int: The size of the pack in bytes.
+        """
+        index = json.dumps({'entries': self.entries}, separators=(',', ':')).encode()
+        self._file.write(index)
+        self._file.write(_FOOTER.pack(self._offset, len(index), MAGIC))
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+        return self._offset + len(index) + _FOOTER.size
+
+    def abort(self):
+        """
+        Discard the pack being written.
+        """
+        self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+
+class PackReader:
+    def __init__(self, path):
+        """
+        Open a slide pack for random access.
+
+        The file is memory-mapped; only the footer and index are read up
+        front, and each entry is read from its own offset when asked for.
+
+        Args:
+            path (str): The pack file.
+
+        Raises:
+            ValueError: If the file is not a complete slide pack.
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < len(MAGIC) + _FOOTER.size:
+                raise ValueError(f"{path} is too short to be a slide pack")
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        index_offset, index_size, magic = _FOOTER.unpack_from(self._map, size - _FOOTER.size)
+        if self._map[:len(MAGIC)] != MAGIC or magic != MAGIC or index_offset + index_size + _FOOTER.size != size:
+            self._map.close()
+            raise ValueError(f"{path} is not a complete slide pack")
+        self.entries = json.loads(self._map[index_offset:index_offset + index_size])['entries']
+
+    def names(self):
+        """
+        Returns:
+            list: The entry names, sorted.
+        """
+        return sorted(self.entries)
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def view(self, name):
+        """
+        Get an entry without copying it.
+
+        Args:
+            name (str): The entry name.
+
+        Returns:
+            memoryview: The entry's bytes in the mapping; release it before closing the reader.
+
+        Raises:
+            KeyError: If the pack has no such entry.
+        """
+        offset, size = self.entries[name]
+        return memoryview(self._map)[offset:offset + size]
+
+    def read(self, name):
+        """
+        Read an entry.
+
+        Args:
+            name (str): The entry name.
+
+        Returns:
+            bytes: The entry's contents.
+
+        Raises:
+            KeyError: If the pack has no such entry.
+        """
+        offset, size = self.entries[name]
+        return self._map[offset:offset + size]
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def open_pack(output_dir):
+    """
+    Open the slide pack of a deck's output directory, if it has a valid one.
+
+    Args:
+        output_dir (str): The directory the deck was rendered to.
+
+    Returns:
+        PackReader: The reader, or None.
+    """
+    try:
+        return PackReader(os.path.join(output_dir, PACK_NAME))
+    except (OSError, ValueError):
+        return None
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="List a slide pack or extract one entry to stdout.")
+    parser.add_argument("pack", help="Path to a slides.pack file")
+    parser.add_argument("name", nargs="?", help="Entry to extract, e.g. slide-0003.png")
+    args = parser.parse_args()
+
+    with PackReader(args.pack) as reader:
+        if args.name is None:
+            for name in reader.names():
+                print(f"{reader.entries[name][1]:>12}  {name}")
+        else:
+            sys.stdout.buffer.write(reader.read(args.name))
@@ -0,0 +1,50 @@
+import os
+
+import fitz
+import pytest
+
+import converter
+from converter import PPTConverter
+
+
+def _write_deck(path, labels):
+    document = fitz.open()
+    for label in labels:
+        page = document.new_page(width=320, height=240)
+        page.insert_text((40, 120), label, fontsize=48)
+    document.save(path)
+    document.close()
+
+
+def _render(tmp_path, name, labels):
+    ppt_path = str(tmp_path / f"{name}.pptx")
+    _write_deck(ppt_path.rsplit('.', 1)[0] + '.pdf', labels)
+    return PPTConverter(ppt_path, str(tmp_path / 'out'), num_processes=1, dpi=36, incremental=True)
+
+
+def _slides(output_dir):
+    slides = {}
+    for name in sorted(os.listdir(output_dir)):
+        if name.startswith('slide-'):
+            with open(os.path.join(output_dir, name), 'rb') as f:
+                slides[name] = f.read()
+    return slides
+
+
+def test_rerun_after_failed_render_reuses_only_matching_slides(tmp_path, monkeypatch):
+    _render(tmp_path, 'deck', ['A', 'B', 'C']).process_pdf_pages()
+
+    def fail(task):
+        raise RuntimeError("render failed")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(converter, '_render_chunk', fail)
+        with pytest.raises(RuntimeError):
+            _render(tmp_path, 'deck', ['X', 'A', 'B', 'C']).process_pdf_pages()
+
+    _render(tmp_path, 'deck', ['X', 'A', 'B', 'C']).process_pdf_pages()
+
+    fresh = tmp_path / 'fresh'
+    fresh.mkdir()
+    _render(fresh, 'deck', ['X', 'A', 'B', 'C']).process_pdf_pages()
+    assert _slides(str(tmp_path / 'out')) == _slides(str(fresh / 'out'))
@@ -1,5 +1,6 @@
 import fitz
 import os
+import shutil
 
 class FileUtils:
     @staticmethod
@@ -25,6 +26,31 @@ class FileUtils:
             print(f"Error occurred while counting pages: {e}")
             raise
 
+    @staticmethod
+    def get_pdf_layout(pdf_path):
+        """
+        Get the number of pages and the largest page size of a PDF in one open.
+
+        Args:
+            pdf_path (str): The path to the PDF file.
+
+        Returns:
+            tuple: ``(page_count, width, height)`` with sizes in PDF points.
+
+        Raises:
+            Exception: For errors while reading the PDF.
+        """
+        try:
+            with fitz.open(pdf_path) as pdf_document:
+                width = height = 0.0
+                for page in pdf_document:
+                    width = max(width, page.rect.width)
+                    height = max(height, page.rect.height)
+                return pdf_document.page_count, width, height
+        except Exception as e:
+            print(f"Error occurred while reading PDF layout: {e}")
+            raise
+
     @staticmethod
     def check_file_exists(file_path):
         """
@@ -38,6 +64,22 @@ class FileUtils:
         """
         return os.path.isfile(file_path)
 
+    @staticmethod
+    def link_or_copy(src, dst):
+        """
+        Hard-link a file into place, falling back to a copy across filesystems.
+
+        Args:
+            src (str): The existing file.
+            dst (str): The destination path; an existing file there is replaced.
+        """
+        if os.path.lexists(dst):
+            os.remove(dst)
+        try:
+            os.link(src, dst)
+        except OSError:
+            shutil.copy2(src, dst)
+
     @staticmethod
     def create_directory_if_not_exists(directory):
         """
@@ -54,4 +96,38 @@ class FileUtils:
                 os.makedirs(directory)
         except Exception as e:
             print(f"Error occurred while creating directory {directory}: {e}")
-            raise
\ No newline at end of file
+            raise
+    @staticmethod
+    def scan_files(directory, extensions, exclude_dirs=()):
+        """
+        Find files by extension in a directory tree without stat-ing every entry.
+
+        Uses ``os.scandir``, whose directory entries already carry the file
+        type on most platforms. Hidden entries and symlinked directories are
+        skipped, and each directory's entries are visited in name order so
+        runs over the same tree are repeatable.
+
+        Args:
+            directory (str): The root of the tree.
+            extensions (tuple): Lower-case extensions to match, including the dot.
+            exclude_dirs (iterable, optional): Directory paths not to descend into. Defaults to ().
+
+        Yields:
+            str: The path of each matching file.
+        """
+        excluded = {os.path.abspath(path) for path in exclude_dirs}
+        pending = [directory]
+        while pending:
+            current = pending.pop()
+            with os.scandir(current) as entries:
+                entries = sorted(entries, key=lambda entry: entry.name)
+            subdirectories = []
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    if os.path.abspath(entry.path) not in excluded:
+                        subdirectories.append(entry.path)
+                elif entry.name.lower().endswith(extensions) and entry.is_file():
+                    yield entry.path
+            pending.extend(reversed(subdirectories))